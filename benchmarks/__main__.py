@@ -0,0 +1,59 @@
+"""Run the benchmarks and optionally compare them to a previous run.
+
+    python -m benchmarks --output before.json
+    python -m benchmarks --compare before.json
+"""
+import sys
+import json
+import argparse
+
+from . import runner
+# Importing the modules registers their benchmarks
+from . import (
+    bench_parsing,
+    bench_ffmpeg,
+    bench_hls,
+    bench_network,
+    bench_startup,
+)
+
+
+
+def main(argv=None, /):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+        description="Benchmark the hot paths of kamyroll_gui.")
+    parser.add_argument("-k", dest="patterns", action="append",
+        help="only run benchmarks matching the glob pattern")
+    parser.add_argument("--repeat", type=int, default=5,
+        help="timing runs per benchmark (default: %(default)s)")
+    parser.add_argument("--output",
+        help="write the results as json to this file")
+    parser.add_argument("--compare",
+        help="compare against the results of a previous --output")
+    parser.add_argument("--threshold", type=float,
+        default=runner.DEFAULT_THRESHOLD,
+        help="relative slowdown that fails --compare (default: %(default)s)")
+    args = parser.parse_args(argv)
+
+    report = runner.run(args.patterns, args.repeat)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+
+    failed = False
+    over_budget = runner.check_budgets(report)
+    for name in over_budget:
+        print(f"Over budget: {name}", file=sys.stderr)
+        failed = True
+
+    if args.compare:
+        previous = runner.load_report(args.compare)
+        if runner.compare(previous, report, args.threshold):
+            failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
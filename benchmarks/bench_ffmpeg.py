@@ -0,0 +1,138 @@
+import tempfile
+
+from datetime import timedelta
+from pathlib import Path
+
+from kamyroll_gui.data_types import Locale
+from kamyroll_gui.settings import Settings
+from kamyroll_gui.utils import api
+
+from . import fixtures
+from .runner import benchmark, get_application
+
+
+
+CAPTURE_SIZE = 4 * 1024 * 1024
+# Parallel jobs writing to the console
+CONSOLE_JOBS = 16
+# The download dialog flushes every 100 ms
+CONSOLE_FLUSHES_PER_SECOND = 10
+
+
+class _Frontend:
+    def append_output(self, text, /):
+        pass
+
+    def show_info(self, title, message, /):
+        pass
+
+    def show_error(self, title, message, /):
+        pass
+
+
+class _Progress:
+    def setMaximum(self, maximum, /):
+        pass
+
+    def setValue(self, value, /):
+        pass
+
+
+def _ignore(*args):
+    pass
+
+
+def _get_ffmpeg(frontend, progress, /):
+    from kamyroll_gui.download_dialog.ffmpeg import FFmpeg
+
+    get_application()
+    # Module lines of the recording stop the process like an error would
+    ffmpeg = FFmpeg(frontend, progress, _ignore, _ignore)
+    ffmpeg.is_stopped = False
+    ffmpeg.max_time = timedelta(minutes=24)
+    return ffmpeg
+
+
+@benchmark("argument_helper.get_arguments")
+def _():
+    from kamyroll_gui.download_dialog import argument_helper
+    from kamyroll_gui.download_dialog.download_selector import (
+        DownloadSelection,
+        HardsubInfo,
+    )
+
+    stream_response = api._stream_response_from_response_dict(
+        fixtures.read_json("episode.json"))
+    subtitles = stream_response.subtitles
+    settings = Settings(download_path=Path(tempfile.mkdtemp()),
+        write_metadata=True, subtitle_locales=[subtitle.locale for subtitle in subtitles])
+    selection = DownloadSelection(url=stream_response.streams[0].url,
+        audio_locale=Locale.JAPANESE_JP, program_ids=[0],
+        hardsub_info=HardsubInfo(is_native=False, locale=Locale.GERMAN_DE,
+            url=subtitles[0].url),
+        subtitles=subtitles)
+
+    # Without a poster, so no image is linked
+    return lambda: argument_helper.get_arguments(settings, selection,
+        stream_response.metadata, None, False)
+
+
+@benchmark("ffmpeg.process_data[4 MiB stderr]")
+def _():
+    data = fixtures.get_repeated_bytes("ffmpeg_stderr.txt", CAPTURE_SIZE)
+
+    from kamyroll_gui.download_dialog.ffmpeg import FFmpeg
+
+    # Every run logs the first module line of the recording as an error
+    FFmpeg._logger.disabled = True
+
+    def process():
+        ffmpeg = _get_ffmpeg(_Frontend(), _Progress())
+        ffmpeg._process_data(data)
+    return process
+
+
+@benchmark("ffmpeg.process_progress_data[4 MiB progress]")
+def _():
+    data = fixtures.get_repeated_bytes("ffmpeg_progress.txt", CAPTURE_SIZE)
+    chunks = [
+        data[start:start + 4096]
+        for start in range(0, len(data), 4096)
+    ]
+
+    def process():
+        ffmpeg = _get_ffmpeg(_Frontend(), _Progress())
+        for chunk in chunks:
+            ffmpeg._process_progress_data(chunk)
+    return process
+
+
+@benchmark(f"ui.console[{CONSOLE_JOBS} jobs, 1 s of output]")
+def _():
+    """UI time spent per second of ffmpeg output of parallel jobs."""
+    from kamyroll_gui.download_dialog.job_row import JobRow
+    from kamyroll_gui.download_dialog.output_console import OutputConsole
+
+    application = get_application()
+    console = OutputConsole()
+    console.show()
+    rows = [JobRow() for _ in range(CONSOLE_JOBS)]
+    ffmpegs = [_get_ffmpeg(console, row.progress) for row in rows]
+
+    # ffmpeg writes two progress blocks per second, like the recording
+    blocks = fixtures.read_text("ffmpeg_progress.txt").encode()
+    first_block, second_block = blocks.split(b"progress=continue\n", 1)
+    first_block += b"progress=continue\n"
+    half = CONSOLE_FLUSHES_PER_SECOND // 2
+
+    def one_second():
+        for flush in range(CONSOLE_FLUSHES_PER_SECOND):
+            if flush in (0, half):
+                block = first_block if flush == 0 else second_block
+                for ffmpeg in ffmpegs:
+                    ffmpeg._process_progress_data(block)
+            for row in rows:
+                row.flush()
+            console.flush()
+            application.processEvents()
+    return one_second
@@ -0,0 +1,122 @@
+"""Download a stream from `LocalOrigin` with the real ffmpeg.
+
+Both download paths are timed: ffmpeg reading the remote playlist
+itself and the native segment download followed by a local remux.
+"""
+import time
+import shutil
+import tempfile
+import subprocess
+
+from functools import cache
+from pathlib import Path
+
+from kamyroll_gui.data_types import Locale
+from kamyroll_gui.settings import Settings
+from kamyroll_gui.utils import api
+from kamyroll_gui.utils.hls_downloader import HlsDownloader
+
+from . import fixtures
+from .harness.origin import LocalOrigin, OriginConfig
+from .runner import BenchmarkSkipped, get_application, measurement
+
+
+
+SEGMENT_COUNT = 40
+SEGMENT_DURATION = 6.0
+SEGMENT_SIZE = 1024 * 1024
+STREAM_SIZE = SEGMENT_COUNT * SEGMENT_SIZE
+# Padding the encoded segment to `SEGMENT_SIZE` keeps it a valid stream
+NULL_PACKET = b"\x47\x1f\xff\x10" + b"\xff" * 184
+FFMPEG_ARGS = ["-hide_banner", "-nostats", "-loglevel", "error", "-y"]
+# Seconds the native download may take at most
+DOWNLOAD_TIMEOUT = 120
+
+
+def _get_ffmpeg():
+    path = shutil.which("ffmpeg")
+    if path is None:
+        raise BenchmarkSkipped("ffmpeg is not on the PATH")
+    return path
+
+
+@cache
+def _get_segment():
+    """Encode a short test clip and pad it with null packets."""
+    result = subprocess.run([_get_ffmpeg(), *FFMPEG_ARGS,
+        "-f", "lavfi", "-i", f"testsrc=size=320x180:rate=24:duration={SEGMENT_DURATION}",
+        "-f", "lavfi", "-i", f"sine=duration={SEGMENT_DURATION}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac",
+        "-f", "mpegts", "pipe:1"], capture_output=True, check=True)
+    data = result.stdout
+    return data + NULL_PACKET * ((SEGMENT_SIZE - len(data)) // len(NULL_PACKET))
+
+
+@cache
+def _get_origin():
+    bandwidth = int(SEGMENT_SIZE * 8 / SEGMENT_DURATION)
+    config = OriginConfig(segment_count=SEGMENT_COUNT,
+        segment_duration=SEGMENT_DURATION, segment_size=SEGMENT_SIZE,
+        segment_data=_get_segment(), variants=[(320, 180, bandwidth)])
+    return LocalOrigin(config).start()
+
+
+def _run_ffmpeg(url, program_ids, directory, /, is_local=False):
+    from kamyroll_gui.download_dialog.argument_helper import get_arguments
+    from kamyroll_gui.download_dialog.download_selector import (
+        DownloadSelection,
+        HardsubInfo,
+    )
+
+    stream_response = api._stream_response_from_response_dict(
+        fixtures.read_json("episode.json"))
+    settings = Settings(download_path=directory.joinpath("downloads"),
+        write_metadata=False)
+    selection = DownloadSelection(url=url, audio_locale=Locale.JAPANESE_JP,
+        program_ids=program_ids,
+        hardsub_info=HardsubInfo(is_native=True, locale=Locale.NONE, url=""),
+        subtitles=[], height=180, is_local=is_local)
+    arguments = get_arguments(settings, selection, stream_response.metadata,
+        None, False, temp_directory=directory)
+    subprocess.run([_get_ffmpeg(), *FFMPEG_ARGS, *arguments],
+        capture_output=True, check=True)
+
+
+def _download_segments(url, spool_path, /):
+    """Return the local master playlist and its program ids."""
+    application = get_application()
+    results = []
+    errors = []
+    downloader = HlsDownloader(spool_path,
+        lambda *result: results.append(result), errors.append,
+        connections=Settings().segment_connections)
+    downloader.start(url, [0])
+
+    deadline = time.monotonic() + DOWNLOAD_TIMEOUT
+    while not results and not errors and time.monotonic() < deadline:
+        application.processEvents()
+    downloader.stop()
+    if not results:
+        raise RuntimeError(f"Segment download failed: {errors or 'timeout'}")
+    return results[0]
+
+
+@measurement("hls.download[ffmpeg]", size=STREAM_SIZE)
+def bench_ffmpeg_download():
+    url = f"{_get_origin().url}/hls/G00000001/master.m3u8"
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        _run_ffmpeg(url, [0], Path(directory))
+        return time.perf_counter() - start
+
+
+@measurement("hls.download[native + remux]", size=STREAM_SIZE)
+def bench_native_download():
+    url = f"{_get_origin().url}/hls/G00000001/master.m3u8"
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        start = time.perf_counter()
+        master_path, program_ids = _download_segments(url,
+            directory.joinpath("spool"))
+        _run_ffmpeg(str(master_path), program_ids, directory, is_local=True)
+        return time.perf_counter() - start
@@ -0,0 +1,53 @@
+import time
+
+from functools import cache
+
+from kamyroll_gui.utils.web_manager import TransportProfile, WebManager
+
+from .harness.origin import LocalOrigin
+from .runner import benchmark, get_application, measurement
+
+
+
+# Requests per cold measurement, each one on a new connection
+COLD_REQUESTS = 10
+
+
+@cache
+def _get_api_url():
+    origin = LocalOrigin().start()
+    return f"{origin.url}/v1/streams?channel_id=crunchyroll&id=G00000001"
+
+
+def _get_warm_request(profile, /):
+    get_application()
+    url = _get_api_url()
+    manager = WebManager(profile=profile)
+    # Open the connection before timing
+    manager.get(url)
+    return lambda: manager.get(url)
+
+
+@measurement("web.get.cold")
+def bench_cold_request():
+    get_application()
+    url = _get_api_url()
+
+    elapsed = 0.0
+    for _ in range(COLD_REQUESTS):
+        # A new manager does not share the connections of the previous one
+        manager = WebManager()
+        start = time.perf_counter()
+        manager.get(url)
+        elapsed += time.perf_counter() - start
+    return elapsed / COLD_REQUESTS
+
+
+@benchmark("web.get.warm")
+def bench_warm_request():
+    return _get_warm_request(TransportProfile())
+
+
+@benchmark("web.get.warm.uncompressed")
+def bench_warm_request_uncompressed():
+    return _get_warm_request(TransportProfile(compression=False))
@@ -0,0 +1,97 @@
+from dataclasses import asdict
+
+from kamyroll_gui.settings import Settings, SettingsManager
+from kamyroll_gui.utils import api, filename, m3u8
+
+from . import fixtures
+from .runner import benchmark
+
+
+
+BASE_URL = "https://pl.example.com/evs3/assets/master.m3u8"
+MULTI_AUDIO_LANGUAGES = ["ja-JP", "en-US", "de-DE", "fr-FR", "es-419",
+    "pt-BR", "it-IT", "ru-RU"]
+
+
+@benchmark("m3u8.get_resolutions[recorded]")
+def _():
+    data = fixtures.read_text("master.m3u8")
+    return lambda: m3u8.get_resolutions(data)
+
+
+@benchmark("m3u8.get_resolutions[500 variants]")
+def _():
+    data = fixtures.get_oversized_master(500)
+    return lambda: m3u8.get_resolutions(data)
+
+
+@benchmark("m3u8.parse_master[500 variants, 8 dubs]")
+def _():
+    data = fixtures.get_multi_audio_master(500, MULTI_AUDIO_LANGUAGES)
+    return lambda: m3u8.parse_master(data)
+
+
+@benchmark("m3u8.localize_master[500 variants, 8 dubs]")
+def _():
+    data = fixtures.get_multi_audio_master(500, MULTI_AUDIO_LANGUAGES)
+    return lambda: m3u8.localize_master(data, BASE_URL, [0])
+
+
+@benchmark("m3u8.parse_media[5000 segments]")
+def _():
+    data = fixtures.get_media_playlist(5000)
+    return lambda: m3u8.parse_media(data, BASE_URL)
+
+
+@benchmark("m3u8.localize_media_playlist[5000 segments]")
+def _():
+    data = fixtures.get_media_playlist(5000)
+    return lambda: m3u8.localize_media_playlist(data, BASE_URL, "video")
+
+
+@benchmark("api.stream_response_from_response_dict[recorded]")
+def _():
+    data = fixtures.read_json("episode.json")
+    return lambda: api._stream_response_from_response_dict(data)
+
+
+@benchmark("api.stream_response_from_response_dict[2000 streams]")
+def _():
+    data = fixtures.get_oversized_response(2000, 500)
+    return lambda: api._stream_response_from_response_dict(data)
+
+
+@benchmark("filename.escape_name")
+def _():
+    name = "I'm Luffy! The Man Who's Gonna Be King of the Pirates: Part 1/2?"
+    return lambda: filename.escape_name(name)
+
+
+@benchmark("filename.format_name")
+def _():
+    stream_response = api._stream_response_from_response_dict(
+        fixtures.read_json("episode.json"))
+    data = asdict(stream_response.metadata)
+    fmt = Settings().episode_format
+    return lambda: filename.format_name(fmt, data)
+
+
+@benchmark("settings.parse_value")
+def _():
+    data = SettingsManager._dump_value(Settings())
+    return lambda: SettingsManager._parse_value(data, Settings)
+
+
+@benchmark("settings.dump_value")
+def _():
+    settings = Settings()
+    return lambda: SettingsManager._dump_value(settings)
+
+
+@benchmark("m3u8.select_variant[500 variants]")
+def _():
+    from kamyroll_gui.download_dialog.download_selector import select_variant
+
+    variants = m3u8.parse_master(fixtures.get_oversized_master(500)).variants
+    settings = Settings()
+    return lambda: select_variant(variants, settings)
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import tempfile
+import subprocess
+
+from .runner import ROOT_PATH, measurement
+
+
+
+IMPORT_BUDGET = 1.0
+FIRST_PAINT_BUDGET = 2.0
+
+STARTUP_SCRIPT = """
+import json
+import time
+
+start = time.perf_counter()
+from kamyroll_gui.main_widget import MainWidget
+imported = time.perf_counter()
+
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+
+class PaintWatcher(QObject):
+    painted = None
+
+    def eventFilter(self, watched, event):
+        if event.type() == QEvent.Paint and self.painted is None:
+            self.painted = time.perf_counter()
+            QTimer.singleShot(0, app.quit)
+        return False
+
+app = QApplication([])
+watcher = PaintWatcher()
+widget = MainWidget()
+widget.installEventFilter(watcher)
+widget.show()
+QTimer.singleShot(10000, app.quit)
+app.exec()
+
+print(json.dumps({
+    "import": imported - start,
+    "first_paint": watcher.painted and watcher.painted - start,
+}))
+"""
+
+
+def _run_startup():
+    """Start a fresh interpreter, imports are cached otherwise."""
+    environment = dict(os.environ, QT_QPA_PLATFORM="offscreen",
+        PYTHONPATH=str(ROOT_PATH))
+    # Startup must not depend on files in the working directory
+    with tempfile.TemporaryDirectory() as directory:
+        result = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT],
+            cwd=directory, env=environment, capture_output=True, text=True,
+            check=True)
+
+    timings = json.loads(result.stdout.splitlines()[-1])
+    if timings["first_paint"] is None:
+        raise RuntimeError("The main widget was never painted")
+    return timings
+
+
+@measurement("startup.import_main_widget", budget=IMPORT_BUDGET)
+def _():
+    return _run_startup()["import"]
+
+
+@measurement("startup.first_paint", budget=FIRST_PAINT_BUDGET)
+def _():
+    return _run_startup()["first_paint"]
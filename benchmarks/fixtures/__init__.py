@@ -0,0 +1,113 @@
+import re
+import json
+
+from pathlib import Path
+
+
+
+FIXTURE_PATH = Path(__file__).parent
+BANDWIDTH_REGEX = re.compile(r"(\bBANDWIDTH=)(\d+)")
+
+
+def read_text(name, /):
+    return FIXTURE_PATH.joinpath(name).read_text()
+
+
+def read_json(name, /):
+    with FIXTURE_PATH.joinpath(name).open("rb") as file:
+        return json.load(file)
+
+
+def get_oversized_master(variant_count, /):
+    """Repeat the variants of the recorded master playlist."""
+    header, *variants = read_text("master.m3u8").split("#EXT-X-STREAM-INF:")
+
+    lines = [header.rstrip("\n")]
+    for index in range(variant_count):
+        attributes, uri = variants[index % len(variants)].splitlines()[:2]
+        # Every variant gets a different bandwidth
+        attributes = BANDWIDTH_REGEX.sub(
+            lambda match: f"{match[1]}{int(match[2]) + index}", attributes)
+        lines.append(f"#EXT-X-STREAM-INF:{attributes}")
+        lines.append(f"{uri}&variant={index}")
+
+    return "\n".join(lines) + "\n"
+
+
+def get_multi_audio_master(variant_count, languages, /):
+    """A master playlist like the ones with several dubs.
+
+    Every variant references an audio group with one rendition per
+    language and a subtitle group, like the recorded playlist would
+    with all dubs of a series.
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:6", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for group in ("aac", "ac3"):
+        for index, language in enumerate(languages):
+            default = "YES" if index == 0 else "NO"
+            lines.append(f'#EXT-X-MEDIA:TYPE=AUDIO,GROUP-ID="{group}",'
+                f'NAME="{language}",LANGUAGE="{language}",DEFAULT={default},'
+                f'AUTOSELECT=YES,URI="audio/{group}/{language}/index.m3u8"')
+    for language in languages:
+        lines.append(f'#EXT-X-MEDIA:TYPE=SUBTITLES,GROUP-ID="subs",'
+            f'NAME="{language}",LANGUAGE="{language}",'
+            f'URI="subtitles/{language}/index.m3u8"')
+
+    heights = [1080, 720, 480, 360, 240]
+    for index in range(variant_count):
+        height = heights[index % len(heights)]
+        width = height * 16 // 9
+        group = "aac" if index % 2 == 0 else "ac3"
+        lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={height * 7000 + index},"
+            f"AVERAGE-BANDWIDTH={height * 5000 + index},"
+            f'RESOLUTION={width}x{height},FRAME-RATE=23.974,'
+            f'CODECS="avc1.640028,mp4a.40.2",AUDIO="{group}",SUBTITLES="subs"')
+        lines.append(f"video/{index}/index.m3u8")
+
+    return "\n".join(lines) + "\n"
+
+
+def get_media_playlist(segment_count, /):
+    """A fragmented mp4 media playlist with byte ranges and key rotation."""
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:7",
+        "#EXT-X-TARGETDURATION:6",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+        "#EXT-X-PLAYLIST-TYPE:VOD",
+        '#EXT-X-MAP:URI="init.mp4",BYTERANGE="720@0"',
+    ]
+    offset = 720
+    for index in range(segment_count):
+        if index % 100 == 0:
+            lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="keys/{index // 100}.key",'
+                f"IV=0x{index:032x}")
+        length = 500000 + index
+        lines.append("#EXTINF:6.006,")
+        lines.append(f"#EXT-X-BYTERANGE:{length}@{offset}")
+        lines.append(f"media_{index // 100}.mp4")
+        offset += length
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n"
+
+
+def get_oversized_response(stream_count, subtitle_count, /):
+    """Repeat the streams and subtitles of the recorded api response."""
+    data = read_json("episode.json")
+    streams = data["streams"]
+    subtitles = data["subtitles"]
+    data["streams"] = [
+        dict(streams[index % len(streams)], url=f"{streams[0]['url']}&n={index}")
+        for index in range(stream_count)
+    ]
+    data["subtitles"] = [
+        subtitles[index % len(subtitles)]
+        for index in range(subtitle_count)
+    ]
+    return data
+
+
+def get_repeated_bytes(name, size, /):
+    """Repeat a recorded capture until it is at least `size` bytes long."""
+    data = FIXTURE_PATH.joinpath(name).read_bytes()
+    return data * (size // len(data) + 1)
@@ -0,0 +1,189 @@
+"""Download hundreds of generated items from a local origin.
+
+Runs the headless command line against `LocalOrigin` and reports
+the throughput and where the time of every item was spent.
+
+    python -m benchmarks.harness --items 200 --parallel 8
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+from pathlib import Path
+
+from kamyroll_gui.settings import Settings, SettingsManager
+
+from ..runner import ROOT_PATH, get_revision
+from .origin import LocalOrigin, OriginConfig
+
+
+
+FAKE_FFMPEG_PATH = Path(__file__).parent.joinpath("fake_ffmpeg.py")
+LINK_FORMAT = "https://beta.crunchyroll.com/watch/G{index:08}/generated-episode-{index}"
+SERIES_LINK = "https://beta.crunchyroll.com/series/GSERIES/generated-series"
+
+
+def _get_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.harness",
+        description="Load test the download pipeline against a local origin.")
+    parser.add_argument("--items", type=int, default=100,
+        help="amount of generated items (default: %(default)s)")
+    parser.add_argument("--seasons", type=int, default=0,
+        help="queue a single series url with the items split into this many seasons")
+    parser.add_argument("--parallel", type=int, default=4,
+        help="parallel downloads (default: %(default)s)")
+    parser.add_argument("--native-hls", action="store_true",
+        help="download the segments in parallel instead of ffmpeg")
+    parser.add_argument("--latency", type=float, default=0.0,
+        help="seconds every api response is delayed")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+        help="share of api calls that fail")
+    parser.add_argument("--error-code", dest="error_codes", action="append",
+        help="error codes to inject (default: bad_player_connection)")
+    parser.add_argument("--segments", type=int, default=20,
+        help="segments per item (default: %(default)s)")
+    parser.add_argument("--segment-size", type=int, default=64 * 1024,
+        help="bytes per segment (default: %(default)s)")
+    parser.add_argument("--real-ffmpeg", action="store_true",
+        help="use the ffmpeg on the PATH instead of the scripted stand-in")
+    parser.add_argument("--ffmpeg-speed", type=float, default=0.0,
+        help="media seconds per second of the stand-in, 0 is unlimited")
+    parser.add_argument("--output",
+        help="write the results as json to this file")
+    parser.add_argument("--keep", action="store_true",
+        help="keep the working directory")
+    return parser
+
+
+def _install_fake_ffmpeg(directory, /):
+    """Put an `ffmpeg` executable running the stand-in into `directory`."""
+    directory.mkdir(parents=True, exist_ok=True)
+    if os.name == "nt":
+        path = directory.joinpath("ffmpeg.bat")
+        path.write_text(f'@"{sys.executable}" "{FAKE_FFMPEG_PATH}" %*\n')
+    else:
+        path = directory.joinpath("ffmpeg")
+        path.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_FFMPEG_PATH}" "$@"\n')
+        path.chmod(0o755)
+
+
+def _write_settings(path, args, /):
+    settings = Settings(download_path=path.parent.joinpath("downloads"),
+        max_parallel_downloads=args.parallel,
+        native_hls_download=args.native_hls, cache_api_responses=False)
+    with path.open("w") as file:
+        json.dump(SettingsManager._dump_value(settings), file, indent=4)
+
+
+def _summarize(events, wall_time, parallel, /):
+    started = {}
+    durations = []
+    busy_time = 0.0
+    successful = 0
+    for event in events:
+        match event["event"]:
+            case "job_started":
+                started[event["index"]] = event["time"]
+            case "job_suspended":
+                busy_time += event["time"] - started.pop(event["index"])
+            case "job_finished":
+                duration = event["time"] - started.pop(event["index"])
+                durations.append(duration)
+                busy_time += duration
+                successful += event["success"]
+
+    return {
+        "finished": len(durations),
+        "successful": successful,
+        "wall_time": wall_time,
+        "items_per_second": len(durations) / wall_time if wall_time else None,
+        "mean_item_time": sum(durations) / len(durations) if durations else None,
+        # Time the download slots spent without any job
+        "idle_slot_time": max(0.0, wall_time * parallel - busy_time),
+    }
+
+
+def main(argv=None, /):
+    args = _get_parser().parse_args(argv)
+
+    config = OriginConfig(latency=args.latency, error_rate=args.error_rate,
+        segment_count=args.segments, segment_size=args.segment_size,
+        series_episodes=args.items, season_count=max(1, args.seasons))
+    if args.error_codes:
+        config.error_codes = args.error_codes
+    origin = LocalOrigin(config).start()
+
+    directory = Path(tempfile.mkdtemp(prefix="kamyroll_harness_"))
+    try:
+        settings_path = directory.joinpath("settings.json")
+        _write_settings(settings_path, args)
+        links_path = directory.joinpath("links.txt")
+        if args.seasons:
+            links_path.write_text(SERIES_LINK)
+        else:
+            links_path.write_text("\n".join(
+                LINK_FORMAT.format(index=index)
+                for index in range(args.items)
+            ))
+
+        environment = dict(os.environ, KAMYROLL_API_URL=origin.url,
+            PYTHONPATH=str(ROOT_PATH), QT_QPA_PLATFORM="offscreen",
+            FAKE_FFMPEG_SPEED=str(args.ffmpeg_speed))
+        if not args.real_ffmpeg:
+            bin_path = directory.joinpath("bin")
+            _install_fake_ffmpeg(bin_path)
+            environment["PATH"] = os.pathsep.join([str(bin_path),
+                environment.get("PATH", "")])
+
+        start = time.monotonic()
+        result = subprocess.run([sys.executable, "-m", "kamyroll_gui.cli",
+            "--settings", str(settings_path), "--input", str(links_path),
+            "--overwrite"], cwd=directory, env=environment,
+            capture_output=True, text=True)
+        wall_time = time.monotonic() - start
+
+        events = []
+        for line in result.stdout.splitlines():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+
+        report_paths = sorted(directory.joinpath("logs").glob("batch_*.json"))
+        stages = None
+        if report_paths:
+            with report_paths[-1].open("rb") as file:
+                stages = json.load(file)["stages"]
+
+        results = {
+            "revision": get_revision(),
+            "arguments": vars(args),
+            "exit_code": result.returncode,
+            "summary": _summarize(events, wall_time, args.parallel),
+            "origin": origin.get_stats(),
+            "stages": stages,
+        }
+    finally:
+        origin.stop()
+        if args.keep:
+            print(f"Kept working directory {directory}", file=sys.stderr)
+        else:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    if result.returncode not in (0, 1):
+        sys.stderr.write(result.stderr)
+
+    output = json.dumps(results, indent=4)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output)
+    return 0 if result.returncode in (0, 1) else result.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
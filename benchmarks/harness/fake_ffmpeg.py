@@ -0,0 +1,121 @@
+"""A scripted stand-in for ffmpeg.
+
+Reads the HLS inputs like ffmpeg would, writes `-progress` blocks
+to stdout and a small placeholder to the output file.
+Only the standard library is used, so it starts quickly.
+
+Environment variables:
+
+    FAKE_FFMPEG_SPEED  media seconds per second, 0 is as fast as possible
+    FAKE_FFMPEG_FETCH  set to 0 to not download the segments
+"""
+import os
+import re
+import sys
+import time
+
+from pathlib import Path
+from urllib.parse import urljoin
+from urllib.request import urlopen
+
+
+
+PROGRAM_REGEX = re.compile(r"0:p:(?P<program_id>\d+)")
+
+
+def read(location, /):
+    if location.startswith(("http://", "https://")):
+        with urlopen(location) as response:
+            return response.read()
+    return Path(location).read_bytes()
+
+
+def join(base, uri, /):
+    if base.startswith(("http://", "https://")):
+        return urljoin(base, uri)
+    return str(Path(base).parent.joinpath(uri))
+
+
+def get_uris(playlist, /):
+    """Yield `(duration, uri)` of every uri in a playlist."""
+    duration = 0.0
+    for line in playlist.splitlines():
+        line = line.strip()
+        if line.startswith("#EXTINF:"):
+            duration = float(line[8:].partition(",")[0] or 0)
+        elif line and not line.startswith("#"):
+            yield duration, line
+            duration = 0.0
+
+
+def write_progress(total_size, out_time, speed, is_end, /):
+    speed_text = f"{speed:.2f}x" if speed else "N/A"
+    sys.stdout.write("".join([
+        f"total_size={total_size}\n",
+        f"out_time_us={int(out_time * 1000000)}\n",
+        f"speed={speed_text}\n",
+        f"progress={'end' if is_end else 'continue'}\n",
+    ]))
+    sys.stdout.flush()
+
+
+def confirm_overwrite(output, /):
+    sys.stderr.write(f"File '{output}' already exists. Overwrite? [y/N] ")
+    sys.stderr.flush()
+    return sys.stdin.readline().strip().lower() == "y"
+
+
+def main(arguments, /):
+    inputs = [
+        arguments[index + 1]
+        for index, argument in enumerate(arguments[:-1])
+        if argument == "-i"
+    ]
+    program_ids = [
+        int(match["program_id"])
+        for argument in arguments
+        if (match := PROGRAM_REGEX.search(argument))
+    ]
+    output = arguments[-1]
+
+    speed = float(os.environ.get("FAKE_FFMPEG_SPEED", "0"))
+    fetch = os.environ.get("FAKE_FFMPEG_FETCH", "1") != "0"
+
+    if Path(output).exists() and "-y" not in arguments:
+        if not confirm_overwrite(output):
+            sys.stderr.write("Not overwriting - exiting\n")
+            return 1
+
+    start = time.monotonic()
+    total_size = 0
+    out_time = 0.0
+
+    if inputs and inputs[0].endswith(".m3u8"):
+        master_url = inputs[0]
+        variants = list(get_uris(read(master_url).decode()))
+        program_id = program_ids[0] if program_ids else 0
+        _, variant_uri = variants[min(program_id, len(variants) - 1)]
+        playlist_url = join(master_url, variant_uri)
+
+        for duration, uri in get_uris(read(playlist_url).decode()):
+            if fetch:
+                total_size += len(read(join(playlist_url, uri)))
+            out_time += duration
+            if speed:
+                time.sleep(duration / speed)
+
+            elapsed = time.monotonic() - start
+            write_progress(total_size, out_time,
+                out_time / elapsed if elapsed else 0, False)
+
+    for location in inputs[1:]:
+        if fetch:
+            total_size += len(read(location))
+
+    Path(output).write_bytes(b"kamyroll fake ffmpeg output\n")
+    write_progress(total_size, out_time, 0, True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,243 @@
+"""A local stand-in for the Kamyroll api and the HLS CDN.
+
+    /v1/streams?channel_id=crunchyroll&id=ID  api response of an episode
+    /v1/seasons?channel_id=crunchyroll&id=ID  seasons of the generated series
+    /v1/episodes?channel_id=crunchyroll&id=ID episodes of a generated season
+    /hls/ID/master.m3u8                       master playlist
+    /hls/ID/VARIANT/index.m3u8                media playlist
+    /hls/ID/VARIANT/SEGMENT.ts                segment
+    /subtitles/ID/LOCALE.ass                  subtitle
+"""
+import gzip
+import json
+import time
+import random
+import threading
+
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from .. import fixtures
+
+
+
+PLAYLIST_TYPE = "application/vnd.apple.mpegurl"
+SUBTITLE_DATA = b"""[Script Info]
+ScriptType: v4.00+
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+Dialogue: 0,0:00:01.00,0:00:04.00,Default,,0,0,0,,Generated subtitle
+"""
+
+
+@dataclass
+class OriginConfig:
+    #: Seconds every api response is delayed
+    latency: float = 0.0
+    #: Share of api calls that answer with one of `error_codes`
+    error_rate: float = 0.0
+    error_codes: list[str] = field(
+        default_factory=lambda: ["bad_player_connection"])
+    #: Episodes of the generated series, split evenly into the seasons
+    series_episodes: int = 0
+    season_count: int = 1
+    segment_count: int = 20
+    segment_duration: float = 6.0
+    segment_size: int = 64 * 1024
+    #: Body of every segment, `segment_size` filler bytes if not set
+    segment_data: bytes | None = None
+    #: `(width, height, bandwidth)` of every variant
+    variants: list[tuple[int, int, int]] = field(default_factory=lambda: [
+        (1920, 1080, 8000000),
+        (1280, 720, 5000000),
+        (640, 360, 1200000),
+    ])
+    seed: int = 0
+
+
+class LocalOrigin:
+    """Serves generated api responses and HLS streams from a thread."""
+    def __init__(self, /, config=None, host="127.0.0.1", port=0):
+        self.config = config or OriginConfig()
+        self.random = random.Random(self.config.seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.bytes_sent = 0
+
+        self.server = ThreadingHTTPServer((host, port), _get_handler(self))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever,
+            daemon=True)
+
+    @property
+    def url(self, /):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, /):
+        self.thread.start()
+        return self
+
+    def stop(self, /):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_stats(self, /):
+        with self.lock:
+            return {
+                "requests": dict(self.requests),
+                "errors": dict(self.errors),
+                "bytes_sent": self.bytes_sent,
+            }
+
+    def get_response(self, path, query, /):
+        """Return `(kind, content type, body)` or `None` if not found."""
+        parts = path.strip("/").split("/")
+        match parts:
+            case ["v1", "streams"]:
+                return "api", "application/json", self._get_streams(query)
+            case ["v1", "seasons"]:
+                return "api", "application/json", self._get_seasons()
+            case ["v1", "episodes"]:
+                return "api", "application/json", self._get_episodes(query)
+            case ["hls", item_id, "master.m3u8"]:
+                return "master", PLAYLIST_TYPE, self._get_master(item_id)
+            case ["hls", _, _, "index.m3u8"]:
+                return "playlist", PLAYLIST_TYPE, self._get_media_playlist()
+            case ["hls", _, _, segment] if segment.endswith(".ts"):
+                return "segment", "video/mp2t", self._get_segment()
+            case ["subtitles", _, _]:
+                return "subtitle", "text/plain", SUBTITLE_DATA
+        return None
+
+    def count(self, kind, size, /):
+        with self.lock:
+            self.requests[kind] += 1
+            self.bytes_sent += size
+
+    def _get_streams(self, query, /):
+        config = self.config
+        time.sleep(config.latency)
+
+        with self.lock:
+            is_error = self.random.random() < config.error_rate
+            code = self.random.choice(config.error_codes)
+            if is_error:
+                self.errors[code] += 1
+        if is_error:
+            data = {"error": True, "code": code, "message": f"Injected {code}"}
+            return json.dumps(data).encode()
+
+        item_id = query.get("id", ["UNKNOWN"])[0]
+        data = fixtures.read_json("episode.json")
+        episode = data["episode_metadata"]
+        episode["title"] = f"Generated episode {item_id}"
+        episode["episode_number"] = _get_number(item_id)
+        episode["episode"] = str(episode["episode_number"])
+        episode["duration_ms"] = int(
+            config.segment_count * config.segment_duration * 1000)
+
+        master_url = f"{self.url}/hls/{item_id}/master.m3u8"
+        for stream in data["streams"]:
+            stream["url"] = master_url
+        for subtitle in data["subtitles"]:
+            subtitle["url"] = f"{self.url}/subtitles/{item_id}/{subtitle['locale']}.ass"
+        return json.dumps(data).encode()
+
+    def _get_seasons(self, /):
+        time.sleep(self.config.latency)
+        items = [
+            {"id": f"S{number:08}", "season_number": number,
+                "title": f"Generated season {number}"}
+            for number in range(1, self.config.season_count + 1)
+        ]
+        return json.dumps({"items": items}).encode()
+
+    def _get_episodes(self, query, /):
+        config = self.config
+        time.sleep(config.latency)
+
+        season_id = query.get("id", ["S0"])[0]
+        number = _get_number(season_id)
+        per_season = -(-config.series_episodes // max(1, config.season_count))
+        start = (number - 1) * per_season
+        end = min(start + per_season, config.series_episodes)
+        items = [
+            {"id": f"G{index:08}", "episode_number": index + 1,
+                "title": f"Generated episode G{index:08}"}
+            for index in range(max(0, start), end)
+        ]
+        return json.dumps({"items": items}).encode()
+
+    def _get_master(self, item_id, /):
+        lines = ["#EXTM3U", "#EXT-X-VERSION:4", "#EXT-X-INDEPENDENT-SEGMENTS"]
+        for index, (width, height, bandwidth) in enumerate(self.config.variants):
+            lines.append(f"#EXT-X-STREAM-INF:BANDWIDTH={bandwidth},"
+                f"RESOLUTION={width}x{height},FRAME-RATE=23.974,"
+                f'CODECS="avc1.640028,mp4a.40.2"')
+            lines.append(f"{index}/index.m3u8")
+        return ("\n".join(lines) + "\n").encode()
+
+    def _get_media_playlist(self, /):
+        config = self.config
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{int(config.segment_duration + 0.999)}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for index in range(config.segment_count):
+            lines.append(f"#EXTINF:{config.segment_duration:.3f},")
+            lines.append(f"{index}.ts")
+        lines.append("#EXT-X-ENDLIST")
+        return ("\n".join(lines) + "\n").encode()
+
+    def _get_segment(self, /):
+        config = self.config
+        if config.segment_data is not None:
+            return config.segment_data
+        return b"\x47" * config.segment_size
+
+
+def _get_number(item_id, /):
+    digits = "".join(char for char in item_id if char.isdigit())
+    return int(digits or 0)
+
+
+def _get_handler(origin, /):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes, with Nagle a reused
+        # connection waits for the delayed ack of the headers
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            response = origin.get_response(url.path, parse_qs(url.query))
+            if response is None:
+                self.send_error(404)
+                return
+
+            kind, content_type, body = response
+            accepted = self.headers.get("Accept-Encoding", "")
+            is_compressed = kind != "segment" and "gzip" in accepted
+            if is_compressed:
+                body = gzip.compress(body, 6)
+
+            origin.count(kind, len(body))
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            if is_compressed:
+                self.send_header("Content-Encoding", "gzip")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
@@ -0,0 +1,158 @@
+import os
+import sys
+import json
+import timeit
+import platform
+import statistics
+import subprocess
+
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from pathlib import Path
+
+
+
+ROOT_PATH = Path(__file__).parent.parent
+# Relative slowdown against a previous run that counts as a regression
+DEFAULT_THRESHOLD = 0.1
+
+
+@dataclass
+class Benchmark:
+    name: str
+    function: callable
+    #: The function measures itself and returns the seconds of one run
+    is_measurement: bool = False
+    #: Seconds a single run may take at most
+    budget: float | None = None
+    #: Bytes a single run transfers, reported as throughput
+    size: int | None = None
+
+
+class BenchmarkSkipped(Exception):
+    """Raised by a benchmark whose requirements are missing."""
+
+
+_benchmarks: dict[str, Benchmark] = {}
+
+
+def benchmark(name, /, budget=None):
+    """Register a setup function that returns the callable to time."""
+    def decorator(function):
+        _benchmarks[name] = Benchmark(name, function, budget=budget)
+        return function
+    return decorator
+
+
+def measurement(name, /, budget=None, size=None):
+    """Register a function that returns the seconds it measured itself."""
+    def decorator(function):
+        _benchmarks[name] = Benchmark(name, function, is_measurement=True,
+            budget=budget, size=size)
+        return function
+    return decorator
+
+
+def get_application():
+    """Get a QApplication that does not need a display."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
+
+
+def get_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_PATH, capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def run_benchmark(benchmark, /, repeat=5):
+    if benchmark.is_measurement:
+        number = 1
+        timings = [benchmark.function() for _ in range(repeat)]
+    else:
+        timer = timeit.Timer(benchmark.function())
+        number, _ = timer.autorange()
+        timings = [
+            timing / number
+            for timing in timer.repeat(repeat, number)
+        ]
+
+    return {
+        "best": min(timings),
+        "median": statistics.median(timings),
+        "number": number,
+        "repeat": repeat,
+        "budget": benchmark.budget,
+        "throughput": benchmark.size and benchmark.size / min(timings),
+    }
+
+
+def run(patterns=None, /, repeat=5):
+    results = {}
+    for name, benchmark in _benchmarks.items():
+        if patterns and not any(fnmatch(name, pattern) for pattern in patterns):
+            continue
+        try:
+            result = run_benchmark(benchmark, repeat)
+        except BenchmarkSkipped as error:
+            print(f"{name:<60} {'skipped':>12} ({error})", file=sys.stderr)
+            continue
+
+        results[name] = result
+        line = f"{name:<60} {_format_seconds(result['best']):>12}"
+        if result["throughput"]:
+            line += f" {result['throughput'] / 1024 / 1024:>10.1f} MiB/s"
+        print(line, file=sys.stderr)
+
+    return {
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def check_budgets(report, /):
+    """Return the names of all benchmarks that exceeded their budget."""
+    return [
+        name
+        for name, result in report["results"].items()
+        if result["budget"] is not None and result["best"] > result["budget"]
+    ]
+
+
+def compare(previous, current, /, threshold=DEFAULT_THRESHOLD):
+    """Print the change of every benchmark and return the regressions."""
+    regressions = []
+    print(f"{'benchmark':<60} {'before':>12} {'after':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        previous_result = previous["results"].get(name)
+        if previous_result is None:
+            continue
+
+        change = result["best"] / previous_result["best"] - 1
+        marker = ""
+        if change > threshold:
+            marker = " !"
+            regressions.append(name)
+        print(f"{name:<60} {_format_seconds(previous_result['best']):>12}"
+            f" {_format_seconds(result['best']):>12} {change:>+8.1%}{marker}")
+
+    return regressions
+
+
+def load_report(path, /):
+    with open(path, "rb") as file:
+        return json.load(file)
+
+
+def _format_seconds(seconds, /):
+    for unit, factor in [("s", 1), ("ms", 1e3), ("us", 1e6)]:
+        if seconds * factor >= 1:
+            return f"{seconds * factor:.2f} {unit}"
+    return f"{seconds * 1e9:.0f} ns"
@@ -2,25 +2,21 @@ def main():
     import logging
     import sys
 
-    from pathlib import Path
-    from datetime import datetime
-
     from PySide6.QtGui import QIcon
     from PySide6 import __version__ as pyside_version
     from PySide6.QtCore import __version__ as qt_version
     from PySide6.QtWidgets import QApplication
 
     from kamyroll_gui.main_widget import MainWidget
+    from kamyroll_gui.settings import get_manager
+    from kamyroll_gui.utils.log import setup_logging
+    from kamyroll_gui.utils.web_manager import TransportProfile, get_web_manager
 
 
 
-    filename = datetime.now().strftime("logs/kamyroll_%Y-%m-%d_%H-%M-%S.log")
-    logfile = Path(filename)
-    logfile.parent.mkdir(exist_ok=True)
-
-    logging.basicConfig(level=logging.DEBUG, style='{',
-        format='{asctime} | {name:<90} | {levelname:<8} | {message}',
-        filename=str(logfile), filemode='w')
+    settings = get_manager().settings
+    setup_logging("logs/kamyroll.log", level=settings.log_level,
+        module_levels=settings.module_log_levels)
 
     logger = logging.getLogger(__name__)
 
@@ -32,6 +28,8 @@ def main():
     app_icon.addFile("favicon.ico")
     app.setWindowIcon(app_icon)
 
+    get_web_manager().configure(TransportProfile.from_settings(settings))
+
     widget = MainWidget()
     widget.show()
     sys.exit(app.exec())
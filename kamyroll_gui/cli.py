@@ -0,0 +1,325 @@
+"""Headless batch downloads without any widgets.
+
+Every event is written to stdout as a single line of json.
+"""
+import argparse
+import json
+import logging
+import os
+import signal
+import sys
+import time
+
+from dataclasses import replace
+from pathlib import Path
+
+from .utils.log import get_level, setup_logging
+
+
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+EXIT_USAGE = 2
+EXIT_INTERRUPTED = 130
+
+SELECTION_POLICIES = ["skip", "relax"]
+
+
+class HeadlessProgress:
+    def __init__(self, frontend, index, /):
+        self.frontend = frontend
+        self.index = index
+        self.maximum = 0
+        self.value = 0
+
+    def setMaximum(self, maximum, /):
+        self.maximum = maximum
+
+    def setValue(self, value, /):
+        if value == self.value:
+            return
+        self.value = value
+        self.frontend.emit("progress", index=self.index, value=value,
+            maximum=self.maximum)
+
+
+class HeadlessRow:
+    def __init__(self, frontend, index, /):
+        self.frontend = frontend
+        self.index = index
+        self.progress = HeadlessProgress(frontend, index)
+
+    def set_text(self, text, /):
+        self.frontend.emit("status", index=self.index, text=text)
+
+
+class HeadlessFrontend:
+    """Answers every prompt of the scheduler according to a policy."""
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, args, /):
+        self.args = args
+        self.scheduler = None
+        self.exit_code = EXIT_SUCCESS
+
+    def emit(self, event, /, **data):
+        line = json.dumps({"event": event, "time": time.time(), **data},
+            default=str)
+        print(line, flush=True)
+
+    def add_job_row(self, job, /):
+        self.emit("job_started", index=job.index, link=job.link)
+        return HeadlessRow(self, job.index)
+
+    def remove_job_row(self, job, /):
+        if job.index in self.scheduler.requeued:
+            self.emit("job_suspended", index=job.index)
+            return
+        success = job.index in self.scheduler.successful_items
+        self.emit("job_finished", index=job.index, link=job.link,
+            success=success, skipped=job.index in self.scheduler.skipped_items)
+
+    def update_job_progress(self, job, progress, /):
+        self.emit("ffmpeg_progress", index=job.index,
+            total_size=progress.total_size,
+            out_time=_get_seconds(progress.out_time), speed=progress.speed,
+            bitrate=progress.bitrate, eta=_get_seconds(progress.eta))
+
+    def update_queue_eta(self, eta, /):
+        self.emit("queue_eta", eta=_get_seconds(eta))
+
+    def update_overall(self, finished, active, total, /):
+        self.emit("queue", finished=finished, active=active, total=total)
+
+    def update_api_state(self, channel_id, state, retry_after, /):
+        self.emit("api_state", channel=channel_id, state=str(state),
+            retry_after=retry_after)
+
+    def ask_credentials(self, channel_id, /):
+        username = self.args.username
+        password = self.args.password
+        if username and password:
+            return username, password
+        self.emit("info", message=f"No credentials for {channel_id}, using bypass")
+        return None
+
+    def ask_settings(self, stream_response, settings, subtitle_only, /):
+        policy = self.args.on_selection_error
+        self.emit("selection_error", policy=policy)
+        if policy == "relax":
+            return replace(settings, strict_matching=False), False
+        return None
+
+    def ask_question(self, title, question, /):
+        answer = self.args.overwrite
+        self.emit("question", question=question, answer=answer)
+        return answer
+
+    def show_error(self, title, message, /):
+        self.emit("error", title=title, message=message)
+
+    def show_info(self, title, message, /):
+        self.emit("info", title=title, message=message)
+
+    def append_output(self, text, /):
+        if self.args.ffmpeg_output:
+            sys.stderr.write(text)
+
+    def queue_finished(self, successful_items, /):
+        from PySide6.QtCore import QCoreApplication
+
+        failed_items = [
+            index
+            for index in range(self.scheduler.length)
+            if index not in successful_items
+        ]
+        if failed_items and self.exit_code == EXIT_SUCCESS:
+            self.exit_code = EXIT_FAILURE
+        self.emit("finished", successful=successful_items, failed=failed_items)
+        QCoreApplication.exit(self.exit_code)
+
+
+def _get_seconds(value, /):
+    if value is None:
+        return None
+    return value.total_seconds()
+
+
+def _get_parser():
+    parser = argparse.ArgumentParser(prog="python -m kamyroll_gui.cli",
+        description="Download items without the graphical interface.")
+    parser.add_argument("urls", nargs="*", metavar="URL",
+        help="urls of the items, seasons or series to download")
+    parser.add_argument("-i", "--input", type=Path, action="append", default=[],
+        help="read urls from a file, one per line, use - for stdin")
+    parser.add_argument("--settings", type=Path, default=Path("settings.json"),
+        help="the settings file to use (default: %(default)s)")
+    parser.add_argument("--subtitles-only", action="store_true",
+        help="only download the subtitles")
+    parser.add_argument("-o", "--output", type=Path,
+        help="override the output directory")
+    parser.add_argument("-p", "--parallel", type=int,
+        help="override the amount of parallel downloads")
+    parser.add_argument("--encodes", type=int,
+        help="override the amount of parallel re-encodes, 0 for one per cpu core")
+    parser.add_argument("--username", default=os.environ.get("KAMYROLL_USERNAME"),
+        help="login e-mail, defaults to $KAMYROLL_USERNAME")
+    parser.add_argument("--password", default=os.environ.get("KAMYROLL_PASSWORD"),
+        help="login password, defaults to $KAMYROLL_PASSWORD")
+    parser.add_argument("--on-selection-error", choices=SELECTION_POLICIES,
+        default="skip", help="skip the item or retry without strict matching")
+    parser.add_argument("--overwrite", action="store_true",
+        help="overwrite existing output files")
+    parser.add_argument("--missing", action="store_true",
+        help="only download items that are not in the library index")
+    parser.add_argument("--no-skip-existing", dest="skip_existing",
+        action="store_false",
+        help="do not check existing output files with ffprobe")
+    parser.add_argument("--ffmpeg-output", action="store_true",
+        help="write the ffmpeg output to stderr")
+    parser.add_argument("--log-level", type=get_level,
+        help="level of the log written to stderr, defaults to the settings")
+    parser.add_argument("--log-module", type=_parse_module_level,
+        action="append", default=[], metavar="NAME=LEVEL",
+        help="set the log level of a single module")
+    parser.add_argument("--log-file", type=Path,
+        help="also write the log to a rotating file")
+    return parser
+
+
+def _parse_module_level(value, /):
+    name, separator, level = value.partition("=")
+    if not separator:
+        raise ValueError(f"Expected NAME=LEVEL: {value}")
+    get_level(level)
+    return name, level
+
+
+def _read_urls(args, /):
+    urls = list(args.urls)
+    for path in args.input:
+        if str(path) == "-":
+            lines = sys.stdin.read().splitlines()
+        else:
+            lines = path.read_text().splitlines()
+        urls.extend(line.strip() for line in lines)
+
+    return [
+        url
+        for url in urls
+        if url and not url.startswith("#")
+    ]
+
+
+def _get_missing_links(links, subtitles_only, /):
+    from kamyroll_gui.utils import api
+    from kamyroll_gui.utils.library import get_library
+
+    keys = [api.get_item_key(link) for link in links]
+    item_ids = {}
+    for channel_id, item_id in keys:
+        item_ids.setdefault(channel_id, []).append(item_id)
+
+    missing = set()
+    for channel_id, channel_item_ids in item_ids.items():
+        for item_id in get_library().get_missing(channel_id, channel_item_ids,
+                media=not subtitles_only):
+            missing.add((channel_id, item_id))
+
+    return [
+        link
+        for link, key in zip(links, keys)
+        if key in missing
+    ]
+
+
+def main(argv=None, /):
+    parser = _get_parser()
+    args = parser.parse_args(argv)
+
+    try:
+        urls = _read_urls(args)
+    except OSError as error:
+        parser.error(str(error))
+
+    from PySide6.QtCore import QCoreApplication, QTimer
+
+    app = QCoreApplication(sys.argv[:1])
+
+    from kamyroll_gui.utils import api
+    from kamyroll_gui.utils.series import SeriesExpander
+    from kamyroll_gui.settings import SettingsManager
+    from kamyroll_gui.utils.web_manager import TransportProfile, get_web_manager
+    from kamyroll_gui.download_dialog.scheduler import DownloadScheduler
+
+    settings = SettingsManager(args.settings).settings
+    if args.output is not None:
+        settings = replace(settings, download_path=args.output)
+    if args.parallel is not None:
+        settings = replace(settings, max_parallel_downloads=args.parallel)
+    if args.encodes is not None:
+        settings = replace(settings, max_parallel_encodes=args.encodes)
+    if not args.skip_existing:
+        settings = replace(settings, skip_existing=False)
+
+    module_levels = settings.module_log_levels | dict(args.log_module)
+    setup_logging(args.log_file, level=args.log_level or settings.log_level,
+        module_levels=module_levels, stream=sys.stderr)
+    get_web_manager().configure(TransportProfile.from_settings(settings))
+
+    frontend = HeadlessFrontend(args)
+
+    links = []
+    for url in urls:
+        if api.parse_url(url) is None and api.parse_series_url(url) is None:
+            frontend.emit("error", title="Invalid url", message=url)
+            frontend.exit_code = EXIT_FAILURE
+            continue
+        links.append(url)
+
+    if not links:
+        frontend.emit("finished", successful=[], failed=[])
+        return EXIT_USAGE
+
+    def start_downloads(links, errors):
+        for url, message in errors.items():
+            frontend.emit("error", title="Listing failed", url=url,
+                message=message)
+            frontend.exit_code = EXIT_FAILURE
+        if args.missing:
+            links = _get_missing_links(links, args.subtitles_only)
+        if not links:
+            frontend.emit("finished", successful=[], failed=[])
+            app.exit(frontend.exit_code)
+            return
+
+        frontend.emit("queued", total=len(links))
+        scheduler = DownloadScheduler(frontend, links, settings,
+            subtitle_only=args.subtitles_only)
+        frontend.scheduler = scheduler
+        scheduler.start()
+
+    expander = SeriesExpander(start_downloads,
+        lambda done, total: frontend.emit("listing", done=done, total=total),
+        workers=settings.listing_workers)
+
+    def interrupt(*_):
+        expander.stop()
+        if frontend.scheduler is not None:
+            frontend.scheduler.stop()
+        frontend.emit("interrupted")
+        app.exit(EXIT_INTERRUPTED)
+    signal.signal(signal.SIGINT, interrupt)
+
+    # Give the interpreter a chance to run signal handlers
+    signal_timer = QTimer()
+    signal_timer.start(200)
+    signal_timer.timeout.connect(lambda: None)
+
+    # Series urls are replaced by their episodes before anything starts
+    QTimer.singleShot(0, lambda: expander.start(links))
+    return app.exec()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,3 +5,5 @@ from .channel import Channel
 from .stream_response import StreamResponse, StreamResponseType
 from .resolution import Resolution
 from .metadata import EpisodeMetadata, MovieMetadata
+from .variant_policy import VariantPolicy
+from .listing import SeasonEntry, EpisodeEntry
@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+
+
+@dataclass
+class SeasonEntry:
+    id: str
+    number: int
+    title: str
+
+
+@dataclass
+class EpisodeEntry:
+    id: str
+    number: int
+    title: str
+    # The url of the single episode, accepted by `api.parse_url`
+    url: str
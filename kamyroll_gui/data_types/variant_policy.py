@@ -0,0 +1,24 @@
+from enum import Enum
+
+
+
+class VariantPolicy(Enum):
+    #: The highest bandwidth variant of the selected resolution
+    HIGHEST_QUALITY = "highest_quality"
+    #: The lowest bandwidth variant of the selected resolution
+    LOWEST_BANDWIDTH = "lowest_bandwidth"
+    #: The best variant the measured download speed can sustain
+    THROUGHPUT = "throughput"
+
+    def __str__(self, /):
+        return _CLEAR_NAME_LOOKUP[self]
+
+    def __repr__(self, /):
+        return f'<{self.__class__.__name__}.{self.name}>'
+
+
+_CLEAR_NAME_LOOKUP = {
+    VariantPolicy.HIGHEST_QUALITY: "Highest quality",
+    VariantPolicy.LOWEST_BANDWIDTH: "Lowest bandwidth",
+    VariantPolicy.THROUGHPUT: "Fit download speed",
+}
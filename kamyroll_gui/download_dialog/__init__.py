@@ -1 +1,7 @@
-from .download_dialog import DownloadDialog
+# The dialog is loaded on first use, so the widget-free parts
+# of this package can be imported without QtWidgets
+def __getattr__(name):
+    if name == "DownloadDialog":
+        from .download_dialog import DownloadDialog
+        return DownloadDialog
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
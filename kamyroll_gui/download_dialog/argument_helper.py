@@ -1,30 +1,53 @@
+import os
+import shutil
 import logging
 import dataclasses
-import tempfile
 
 from ..utils.filename import format_name
-from ..utils.web_manager import web_manager
+from ..utils.subtitle_cache import get_subtitle_cache, get_subtitle_key
+from ..utils.web_manager import USER_AGENT
 from ..data_types.metadata import EpisodeMetadata
 
 
 
+REMOTE_INPUT_ARGS = [
+    "-reconnect", "1",
+    #"-reconnect_at_eof", "1",
+    "-reconnect_streamed", "1",
+    "-reconnect_on_network_error", "1",
+    "-user_agent", USER_AGENT,
+]
+LOCAL_PLAYLIST_INPUT_ARGS = [
+    "-allowed_extensions", "ALL",
+    "-protocol_whitelist", "file,crypto,data",
+]
+
+
 _logger = logging.getLogger(__name__)
 
 
-def get_arguments(settings, selection, metadata, images, subtitles_only, /):
+def get_arguments(settings, selection, metadata, poster_path, subtitles_only, /,
+        temp_directory=None):
+    """Construct the ffmpeg arguments of an item.
+
+    `poster_path` is the cached poster or `None`, it is not downloaded here.
+    Cached images and subtitles are linked into `temp_directory`,
+    so evicting them from the cache does not affect a running download.
+    Subtitles that are not cached yet are read from their url.
+    """
     output_path = _get_output_path(settings, metadata)
     output_path.parent.mkdir(parents=True, exist_ok=True)
 
-    arguments = _get_input_args(selection, subtitles_only)
+    arguments = _get_input_args(selection, subtitles_only, temp_directory)
 
     if not subtitles_only:
         image_mapping_args = []
-        if settings.write_metadata:
-            poster = images.get("poster_tall")
-            if poster is not None:
-                position = len(arguments) // 2
+        if settings.write_metadata and poster_path is not None:
+            image_path = _get_image_file(poster_path, temp_directory)
+            if image_path is not None:
+                position = arguments.count("-i")
                 image_input_args, image_mapping_args = _get_image_args(
-                    poster, position, settings.separate_subtitles)
+                    image_path, position, settings.separate_subtitles)
                 arguments += image_input_args
 
         if not settings.compress_streams:
@@ -33,17 +56,18 @@ def get_arguments(settings, selection, metadata, images, subtitles_only, /):
         if settings.write_metadata:
             arguments += _get_metadata_args(selection, metadata)
 
-        arguments += _get_video_mapping_args(selection)
+        arguments += _get_video_mapping_args(selection, temp_directory)
         if not settings.separate_subtitles:
             arguments += _get_subtitle_mapping_args(selection)
         if settings.write_metadata:
             arguments += image_mapping_args
 
+        if is_cpu_bound(settings, selection, subtitles_only):
+            arguments.extend(["-threads", str(get_encode_threads(settings))])
         arguments.append(str(output_path))
 
     if settings.separate_subtitles or subtitles_only:
-        subtitle_path = output_path.parent.joinpath(
-            settings.subtitle_prefix, output_path.name)
+        subtitle_path = _get_subtitle_base_path(settings, output_path)
         subtitle_path.parent.mkdir(parents=True, exist_ok=True)
 
         arguments += _get_separate_subtitle_args(selection,
@@ -53,6 +77,53 @@ def get_arguments(settings, selection, metadata, images, subtitles_only, /):
     return arguments
 
 
+def get_output_paths(settings, selection, metadata, subtitles_only, /):
+    """Get the media output, or `None` if only subtitles are written,
+    and the paths of the separate subtitle files."""
+    output_path = _get_output_path(settings, metadata)
+
+    subtitle_paths = []
+    if settings.separate_subtitles or subtitles_only:
+        base_path = _get_subtitle_base_path(settings, output_path)
+        subtitle_paths = [
+            _get_subtitle_path(base_path, subtitle)
+            for subtitle in selection.subtitles
+        ]
+
+    if subtitles_only:
+        return None, subtitle_paths
+    return output_path, subtitle_paths
+
+
+def is_cpu_bound(settings, selection, subtitles_only, /):
+    """If ffmpeg re-encodes the video instead of copying the streams."""
+    if subtitles_only:
+        return False
+    return settings.compress_streams or not selection.hardsub_info.is_native
+
+
+def get_encode_slots(settings, /):
+    """Parallel re-encodes, by default one per cpu core."""
+    return max(1, settings.max_parallel_encodes or os.cpu_count() or 1)
+
+
+def get_encode_threads(settings, /):
+    """Threads of a single re-encode, so a full pool uses every core once."""
+    return max(1, (os.cpu_count() or 1) // get_encode_slots(settings))
+
+
+def get_subtitle_sources(selection, /):
+    """The `(locale, url)` of all subtitles ffmpeg reads for `selection`."""
+    sources = [
+        (subtitle.locale, subtitle.url)
+        for subtitle in selection.subtitles
+    ]
+    hardsub_info = selection.hardsub_info
+    if not hardsub_info.is_native:
+        sources.append((hardsub_info.locale, hardsub_info.url))
+    return sources
+
+
 def _get_output_path(settings, metadata):
     format_data = dataclasses.asdict(metadata)
     if isinstance(metadata, EpisodeMetadata):
@@ -66,18 +137,34 @@ def _get_output_path(settings, metadata):
     return settings.download_path.joinpath(filename + ".mkv")
 
 
-def _get_input_args(download_selection, subtitles_only):
+def _get_subtitle_base_path(settings, output_path, /):
+    return output_path.parent.joinpath(settings.subtitle_prefix,
+        output_path.name)
+
+
+def _get_subtitle_path(base_path, subtitle, /):
+    subtitle_language = subtitle.locale.to_iso_639_2()
+    return base_path.with_suffix(f".{subtitle_language}.ass")
+
+
+def _get_input_args(download_selection, subtitles_only, temp_directory):
     input_args = []
 
     if not subtitles_only:
+        if download_selection.is_local:
+            input_args.extend(LOCAL_PLAYLIST_INPUT_ARGS)
+        else:
+            input_args.extend(REMOTE_INPUT_ARGS)
         input_args.extend(["-i", download_selection.url])
     for subtitle in download_selection.subtitles:
-        input_args.extend(["-i", subtitle.url])
+        subtitle_input = _get_subtitle_file(subtitle.locale, subtitle.url,
+            temp_directory)
+        input_args.extend(["-i", subtitle_input])
 
     return input_args
 
 
-def _get_video_mapping_args(download_selection):
+def _get_video_mapping_args(download_selection, temp_directory):
     mapping_args = []
 
     for program_id in download_selection.program_ids:
@@ -86,7 +173,11 @@ def _get_video_mapping_args(download_selection):
 
     hardsub_info = download_selection.hardsub_info
     if not hardsub_info.is_native:
-        mapping_args.extend(['-vf', f'subtitles={hardsub_info.url}'])
+        hardsub_input = _get_subtitle_file(hardsub_info.locale,
+            hardsub_info.url, temp_directory)
+        if hardsub_input != hardsub_info.url:
+            hardsub_input = _escape_filter_path(hardsub_input)
+        mapping_args.extend(['-vf', f'subtitles={hardsub_input}'])
 
     return mapping_args
 
@@ -109,9 +200,7 @@ def _get_separate_subtitle_args(download_selection, base_path, subtitles_only):
     for index, subtitle in enumerate(download_selection.subtitles, start):
         arguments.extend(["-map", str(index)])
 
-        subtitle_language = subtitle.locale.to_iso_639_2()
-        suffix = f".{subtitle_language}.ass"
-        sub_output_path = base_path.with_suffix(suffix)
+        sub_output_path = _get_subtitle_path(base_path, subtitle)
         arguments.append(str(sub_output_path))
 
     return arguments
@@ -148,8 +237,7 @@ def _get_metadata_args(download_selection, metadata, /):
 
     return arguments
 
-def _get_image_args(image, position, is_mp4):
-    filename = _get_temp_image_file(image)
+def _get_image_args(filename, position, is_mp4):
     if is_mp4:
         return ([
             "-i", filename
@@ -165,11 +253,38 @@ def _get_image_args(image, position, is_mp4):
         "-metadata:s:t", "mimetype=image/jpeg",
     ])
 
-def _get_temp_image_file(image):
-    data = web_manager.get(image)
-    with tempfile.NamedTemporaryFile("wb", prefix="kamyroll_",
-            suffix=".jpeg", delete=False) as file:
-        _logger.debug("Created tempfile: %s", file.name)
-        file.write(data)
-
-    return file.name
+def _get_image_file(cached_path, temp_directory, /):
+    try:
+        return _link_cached_file(cached_path, temp_directory)
+    except OSError as error:
+        # Evicted from the cache since it was fetched
+        _logger.warning("Leaving out image %s: %s", cached_path, error)
+        return None
+
+def _get_subtitle_file(locale, url, temp_directory, /):
+    cached_path = get_subtitle_cache().get(url,
+        key=get_subtitle_key(locale, url))
+    if cached_path is None:
+        _logger.info("Subtitle %s is not cached, reading it remotely", url)
+        return url
+    return _link_cached_file(cached_path, temp_directory)
+
+def _escape_filter_path(path, /):
+    # Inside of a filter graph `:` separates options and `\` escapes
+    path = path.replace("\\", "/").replace(":", "\\:").replace("'", "'\\''")
+    return f"'{path}'"
+
+def _link_cached_file(cached_path, temp_directory, /):
+    if temp_directory is None:
+        return str(cached_path)
+
+    path = temp_directory.joinpath(cached_path.name)
+    if not path.exists():
+        try:
+            os.link(cached_path, path)
+        except OSError:
+            # The cache might be on another file system
+            shutil.copyfile(cached_path, path)
+        _logger.debug("Linked cached file %s to %s", cached_path, path)
+
+    return str(path)
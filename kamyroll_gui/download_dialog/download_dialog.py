@@ -1,37 +1,33 @@
 import logging
-from dataclasses import asdict
 
-from PySide6.QtCore import QTimer, Qt
-from PySide6.QtGui import QFont
+from PySide6.QtCore import Qt, QTimer
 from PySide6.QtWidgets import (
     QDialog,
     QLabel,
     QMessageBox,
     QProgressBar,
-    QTextEdit,
+    QPushButton,
     QVBoxLayout,
 )
 
 from ..settings_dialog.settings_dialog import SettingsDialog
-from ..data_types import StreamResponseType
-from ..settings import manager
-from ..utils import api
+from ..settings import get_manager
+from ..utils.circuit_breaker import CircuitState
 
-from .argument_helper import get_arguments
+from .ffmpeg import format_time
+from .job_row import JobRow
 from .login_dialog import LoginDialog
-from .ffmpeg import FFmpeg
-from .download_selector import (
-    SelectionError,
-    selection_from_stream_response,
-    selection_from_subtitle_list,
-    subtitles_from_stream_response,
-)
+from .output_console import OutputConsole
+from .scheduler import DownloadScheduler
+
 
 
+TOTAL_BASE_FORMAT = "Downloading {type}s: {finished} of {total} finished, {active} active"
+API_OPEN_FORMAT = "The {channel} api is overloaded, waiting {seconds} seconds before trying again"
+API_HALF_OPEN_FORMAT = "Checking if the {channel} api is available again"
 
-TOTAL_BASE_FORMAT = "Downloading {type} {index} of {total}:"
-EPISODE_BASE_FORMAT = "{series} Season {season} Episode {episode_disp}"
-MOVIE_BASE_FORMAT = "{title}"
+# Milliseconds between repaints of the output and the progress bars
+UI_UPDATE_INTERVAL = 100
 
 class DownloadDialog(QDialog):
     _logger = logging.getLogger(__name__).getChild(__qualname__)
@@ -42,19 +38,8 @@ class DownloadDialog(QDialog):
         self.setFixedSize(600, 400)
         self.setAttribute(Qt.WA_DeleteOnClose)
 
-        self.credentials = {}
-        self.settings = manager.settings
-
-        self.halt_execution = False
-        self.links = links
-        self.length = len(links)
-        self.subtitle_only = subtitle_only
         self.type_name = "subtitle" if subtitle_only else "item"
-        self.position = 0
-        self.is_running = False
         self.strict = strict
-        self.ask_login = self.settings.use_own_credentials
-        self.successful_items = []
 
         layout = QVBoxLayout()
         self.setLayout(layout)
@@ -64,164 +49,143 @@ class DownloadDialog(QDialog):
 
         self.overall_progress = QProgressBar()
         self.overall_progress.setMaximum(len(links))
-        self.overall_progress.setValue(self.position)
+        self.overall_progress.setValue(0)
         layout.addWidget(self.overall_progress)
 
-        self.ffmpeg_progress_label = QLabel()
-        layout.addWidget(self.ffmpeg_progress_label)
-
-        self.ffmpeg_progress = QProgressBar()
-        self.ffmpeg_progress.setMaximum(1)
-        self.ffmpeg_progress.setValue(0)
-        layout.addWidget(self.ffmpeg_progress)
-
-        self.text_edit = QTextEdit()
-        text_font = QFont("Monospace")
-        text_font.setStyleHint(QFont.TypeWriter)
-        self.text_edit.setFont(text_font)
-        self.text_edit.setReadOnly(True)
-        self.text_edit.setLineWrapMode(QTextEdit.NoWrap)
-        layout.addWidget(self.text_edit)
-
-        self.ffmpeg = FFmpeg(self, self.ffmpeg_progress, self.text_edit,
-            self.ffmpeg_success, self.ffmpeg_fail)
-        self.is_running = True
-        QTimer.singleShot(0, self.enqueue_next_download)
-
-    def enqueue_next_download(self, /):
-        if self.position >= self.length:
-            return
-
-        self.ffmpeg_progress.setValue(0)
-        self.ffmpeg_progress.setMaximum(0)
-        self.ffmpeg_progress_label.setText("Querying api")
-        current_item = self.links[self.position]
-        self.progress_label.setText(TOTAL_BASE_FORMAT.format(
-            type=self.type_name, index=self.position+1, total=self.length))
-        self.overall_progress.setValue(self.position)
-        parsed_data = api.parse_url(current_item)
-        if parsed_data is None:
-            raise ValueError("Somehow the url is not a valid one")
-        channel_id, params = parsed_data
-
-        settings = self.settings
-
-        username = None
-        password = None
-        if self.ask_login:
-            if channel_id in self.credentials:
-                username, password = self.credentials[channel_id]
-            else:
-                dialog = LoginDialog(self)
-                if self.halt_execution:
-                    return
-                if dialog.exec() == QDialog.Accepted:
-                    data = dialog.get_data()
-                    username, password = data
-                    self.credentials[channel_id] = data
-                else:
-                    # Disable the dialog next time
-                    self.ask_login = False
-
-        try:
-            stream_response = api.get_media(channel_id, params, username, password)
-        except api.ApiError as error:
-            message = f"The api call failed:\n{error}"
-            QMessageBox.critical(self, "Error - Kamyroll", message)
-            if self.halt_execution:
-                return
-            QTimer.singleShot(0, self.safe_enqueue_next)
-            return
-
-        format_data = asdict(stream_response.metadata)
-        if stream_response.type is StreamResponseType.EPISODE:
-            info_text = EPISODE_BASE_FORMAT.format(**format_data)
-        else: # elif stream_response.type is StreamResponseType.MOVIE:
-            info_text = MOVIE_BASE_FORMAT.format(**format_data)
-
-        sub_label_text = f"Downloading {info_text}:"
-        self.ffmpeg_progress_label.setText(sub_label_text)
-
-        try:
-            try:
-                if self.halt_execution:
-                    return
-                selection = self.get_selection(stream_response, settings)
-            except SelectionError as error:
-                dialog = SettingsDialog(self, settings, stream_response,
-                    self.subtitle_only)
-                if self.halt_execution:
-                    return
-                if dialog.exec() != QDialog.Accepted:
-                    QTimer.singleShot(0, self.safe_enqueue_next)
-                    return
-
-                new_settings = dialog.settings
-                if dialog.apply_to_all:
-                    self.settings = new_settings
-                if self.halt_execution:
-                    return
-                selection = self.get_selection(stream_response, new_settings)
-        except Exception as error:
-            self._logger.error("Error during selection: %s", error)
-            QMessageBox.critical(self, "Download Error - Kamyroll", str(error))
-            if self.halt_execution:
-                return
-            QTimer.singleShot(0, self.safe_enqueue_next)
-            return
-
-        arguments = get_arguments(settings, selection, stream_response.metadata,
-            stream_response.images, self.subtitle_only)
-        self.ffmpeg.start(arguments, stream_response.metadata.duration)
-
-    def get_selection(self, stream_response, settings, /):
-        if self.subtitle_only:
-            selected_subtitles = subtitles_from_stream_response(
-                stream_response, settings)
-            selection = selection_from_subtitle_list(selected_subtitles)
+        self.api_label = QLabel()
+        self.api_label.setStyleSheet("color: #b35900")
+        self.api_label.hide()
+        layout.addWidget(self.api_label)
+        self.api_messages = {}
+
+        self.job_layout = QVBoxLayout()
+        layout.addLayout(self.job_layout)
+        self.job_rows = []
+
+        self.console = OutputConsole()
+        layout.addWidget(self.console)
+
+        self.update_timer = QTimer(self)
+        self.update_timer.setInterval(UI_UPDATE_INTERVAL)
+        self.update_timer.timeout.connect(self.flush_updates)
+        self.update_timer.start()
+
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.setToolTip("Stop all downloads, finished segments are kept")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        layout.addWidget(self.pause_button)
+
+        self.scheduler = DownloadScheduler(self, links, get_manager().settings,
+            subtitle_only=subtitle_only)
+        self.scheduler.start()
+
+    @property
+    def successful_items(self, /):
+        return self.scheduler.successful_items
+
+    @property
+    def is_running(self, /):
+        return self.scheduler.is_running
+
+    def toggle_pause(self, /):
+        if self.scheduler.is_paused:
+            self.scheduler.resume()
+            self.pause_button.setText("Pause")
         else:
-            selection = selection_from_stream_response(stream_response,
-                settings)
-        return selection
-
-    def ffmpeg_fail(self, /):
-        self.ffmpeg.stop()
-        QMessageBox.critical(self, "Error - Kamyroll", "The download failed.")
-        self.safe_enqueue_next()
-
-    def ffmpeg_success(self, /):
-        self.successful_items.append(self.position)
-        self.safe_enqueue_next()
-
-    def safe_enqueue_next(self, /):
-        if self.halt_execution:
-            return
-
-        self.position += 1
-
-        if self.position < self.length:
-            QTimer.singleShot(0, self.enqueue_next_download)
-            return
-
-        self.is_running = False
+            self.scheduler.pause()
+            self.pause_button.setText("Resume")
+
+    def add_job_row(self, job, /):
+        row = JobRow(self)
+        self.job_layout.addWidget(row)
+        self.job_rows.append(row)
+        return row
+
+    def remove_job_row(self, job, /):
+        self.job_rows.remove(job.row)
+        self.job_layout.removeWidget(job.row)
+        job.row.deleteLater()
+
+    def flush_updates(self, /):
+        for row in self.job_rows:
+            row.flush()
+        self.console.flush()
+
+    def update_job_progress(self, job, progress, /):
+        details = []
+        if progress.speed is not None:
+            details.append(f"{progress.speed:.1f}x")
+        if progress.eta is not None:
+            details.append(f"{format_time(progress.eta)} left")
+        job.row.progress.setFormat(" - ".join(["%p%", *details]))
+
+    def update_queue_eta(self, eta, /):
+        text = "%p%"
+        if eta is not None:
+            text = f"%p% - about {format_time(eta)} left"
+        if self.overall_progress.format() != text:
+            self.overall_progress.setFormat(text)
+
+    def update_overall(self, finished, active, total, /):
         self.progress_label.setText(TOTAL_BASE_FORMAT.format(
-            type=self.type_name, index=self.length, total=self.length))
-        self.overall_progress.setValue(self.length)
-        self.ffmpeg_progress.setMaximum(1)
-        self.ffmpeg_progress.setValue(1)
-        if self.successful_items:
+            type=self.type_name, finished=finished, active=active,
+            total=total))
+        self.overall_progress.setValue(finished)
+
+    def update_api_state(self, channel_id, state, retry_after, /):
+        match state:
+            case CircuitState.OPEN:
+                self.api_messages[channel_id] = API_OPEN_FORMAT.format(
+                    channel=channel_id, seconds=round(retry_after))
+            case CircuitState.HALF_OPEN:
+                self.api_messages[channel_id] = API_HALF_OPEN_FORMAT.format(
+                    channel=channel_id)
+            case _:
+                self.api_messages.pop(channel_id, None)
+
+        self.api_label.setText("\n".join(self.api_messages.values()))
+        self.api_label.setVisible(bool(self.api_messages))
+
+    def ask_credentials(self, channel_id, /):
+        dialog = LoginDialog(self)
+        if dialog.exec() == QDialog.Accepted:
+            return dialog.get_data()
+        return None
+
+    def ask_settings(self, stream_response, settings, subtitle_only, /):
+        dialog = SettingsDialog(self, settings, stream_response, subtitle_only)
+        if dialog.exec() != QDialog.Accepted:
+            return None
+        return dialog.settings, dialog.apply_to_all
+
+    def show_error(self, title, message, /):
+        QMessageBox.critical(self, title, message)
+
+    def show_info(self, title, message, /):
+        QMessageBox.information(self, title, message)
+
+    def ask_question(self, title, question, /):
+        reply = QMessageBox.question(self, title, question)
+        return reply == QMessageBox.Yes
+
+    def append_output(self, text, /):
+        self.console.append_output(text)
+
+    def queue_finished(self, successful_items, /):
+        self.pause_button.setEnabled(False)
+        self.flush_updates()
+        if successful_items:
             QMessageBox.information(self, "Info - Kamyroll", "The download is finished.")
         else:
             QMessageBox.information(self, "Info - Kamyroll", "No items were downloaded.")
 
     def reject(self):
         if not self.is_running:
-            self.halt_execution = True
-            self.ffmpeg.stop()
+            self.scheduler.stop()
             return super().accept()
 
         response = QMessageBox.question(self, "Terminate download? - Kamyroll",
             "A Download is in progress. Exiting now will terminate the download progess.\n\nAre you sure you want to quit?")
         if response == QMessageBox.Yes:
-            self.ffmpeg.stop()
+            self.scheduler.stop()
             return super().reject()
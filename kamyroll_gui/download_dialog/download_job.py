@@ -0,0 +1,74 @@
+import time
+import shutil
+import logging
+import tempfile
+
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from ..data_types import StreamResponse
+from ..utils.image_cache import TEMP_PREFIX
+from .download_selector import DownloadSelection
+
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ResolvedItem:
+    settings: Any
+    created: float = field(default_factory=time.monotonic)
+    stream_response: StreamResponse | None = None
+    selection: DownloadSelection | None = None
+    arguments: list[str] | None = None
+    # The cached poster, set once the `PosterFetch` of the job finished
+    poster_path: Path | None = None
+    # Holds the files the arguments refer to, until `cleanup`
+    temp_directory: Path | None = None
+
+    def get_temp_directory(self, /):
+        if self.temp_directory is None:
+            self.temp_directory = Path(tempfile.mkdtemp(prefix=TEMP_PREFIX))
+        return self.temp_directory
+
+    def cleanup(self, /):
+        """Remove the temporary files, the arguments are invalid after."""
+        if self.temp_directory is None:
+            return
+        _logger.debug("Removing temp directory %s", self.temp_directory)
+        shutil.rmtree(self.temp_directory, ignore_errors=True)
+        self.temp_directory = None
+        self.arguments = None
+
+
+@dataclass
+class DownloadJob:
+    index: int
+    link: str
+    row: Any = None
+    # The pending `ApiRequest` while the item is resolved
+    request: Any = None
+    ffmpeg: Any = None
+    downloader: Any = None
+    # The `OutputCheck` of existing files before the download starts
+    output_check: Any = None
+    # The `SubtitleFetch` that makes the subtitles local before ffmpeg starts
+    subtitle_fetch: Any = None
+    # The `PosterFetch` that caches the poster before ffmpeg starts
+    poster_fetch: Any = None
+    # Existing outputs differ and have to be replaced
+    overwrite: bool = False
+    spool_path: Path | None = None
+    # Runs in the cpu pool, because ffmpeg re-encodes the video
+    cpu_bound: bool = False
+    # Advertised bits per second of the selected variant
+    bandwidth: int = 0
+    # `time.monotonic()` when ffmpeg was started
+    ffmpeg_started: float | None = None
+    stream_response: StreamResponse | None = None
+    # The `ResolvedItem` that is downloaded
+    item: ResolvedItem | None = None
+    # The latest `FFmpegProgress` of the job
+    progress: Any = None
@@ -3,10 +3,11 @@ import logging
 from dataclasses import dataclass
 
 from ..utils import m3u8
-from ..utils.web_manager import web_manager
+from ..utils.web_manager import get_web_manager
 from ..data_types import (
     Locale,
     Subtitle,
+    VariantPolicy,
 )
 
 
@@ -28,13 +29,20 @@ class DownloadSelection:
     program_ids: list[int]
     hardsub_info: HardsubInfo
     subtitles: list[Subtitle]
+    # Set if `url` points to a local playlist of downloaded segments
+    is_local: bool = False
+    # The advertised bits per second of the selected variant
+    bandwidth: int = 0
+    # The height of the selected variant
+    height: int = 0
 
 
 class SelectionError(Exception):
     pass
 
 
-def selection_from_stream_response(stream_response, settings):
+def selection_from_stream_response(stream_response, settings, /,
+        throughput=None):
     # Match on subtitle settings
     selected_subtitles = subtitles_from_stream_response(
         stream_response, settings)
@@ -80,25 +88,83 @@ def selection_from_stream_response(stream_response, settings):
 
     # Get program ids to select the correct resolution
     program_url = matching_streams[0].url
-    data = web_manager.get(program_url).decode()
-    resolutions = m3u8.get_resolutions(data)
-    if settings.video_height in resolutions:
-        program_ids = resolutions[settings.video_height]
+    data = get_web_manager().get(program_url, cached=True).decode()
+    master = m3u8.parse_master(data)
+    variant = select_variant(master.variants, settings, throughput)
+    _logger.info("Selected variant %s with %s bit/s",
+        variant.program_id, variant.bandwidth)
+
+    return DownloadSelection(url=program_url,
+        audio_locale=settings.audio_locale, hardsub_info=hardsub_info,
+        subtitles=selected_subtitles, program_ids=[variant.program_id],
+        bandwidth=variant.bandwidth, height=variant.resolution[1])
+
+
+def select_variant(variants, settings, /, throughput=None):
+    """Select a variant according to the settings.
+
+    `throughput` is the measured download speed of a single download
+    in bits per second, if it is known.
+    """
+    candidates = [
+        variant
+        for variant in variants
+        if variant.resolution is not None
+    ]
+
+    budget = _get_bandwidth_budget(settings, throughput)
+    if budget:
+        affordable = [
+            variant
+            for variant in candidates
+            if variant.bandwidth <= budget
+        ]
+        if not affordable:
+            if settings.strict_matching:
+                raise SelectionError("No variant fits into the bitrate limit")
+            affordable = [min(candidates, key=_bandwidth_key, default=None)]
+        candidates = [variant for variant in affordable if variant is not None]
+
+    heights = {variant.resolution[1] for variant in candidates}
+    if settings.video_height in heights:
+        height = settings.video_height
     else:
         if settings.strict_matching:
             raise SelectionError("Desired resolution not available")
-        suitable_resolutions = [
-            resolution
-            for resolution in sorted(resolutions, reverse=True)
-            if resolution <= settings.video_height
+        suitable_heights = [
+            height
+            for height in heights
+            if height <= settings.video_height
         ]
-        if not suitable_resolutions:
+        if not suitable_heights:
             raise SelectionError("Desired resolution or smaller not available")
-        program_ids = resolutions[suitable_resolutions[0]]
+        height = max(suitable_heights)
 
-    return DownloadSelection(url=program_url,
-        audio_locale=settings.audio_locale, hardsub_info=hardsub_info,
-        subtitles=selected_subtitles, program_ids=program_ids)
+    matching_variants = [
+        variant
+        for variant in candidates
+        if variant.resolution[1] == height
+    ]
+    if settings.variant_policy is VariantPolicy.LOWEST_BANDWIDTH:
+        return min(matching_variants, key=_bandwidth_key)
+    return max(matching_variants, key=_quality_key)
+
+
+def _get_bandwidth_budget(settings, throughput, /):
+    budget = settings.max_bandwidth
+    if settings.variant_policy is VariantPolicy.THROUGHPUT and throughput:
+        budget = min(budget, throughput) if budget else throughput
+    return int(budget)
+
+
+def _quality_key(variant, /):
+    width, _ = variant.resolution
+    return (width, variant.frame_rate or 30, variant.bandwidth,
+        variant.program_id)
+
+
+def _bandwidth_key(variant, /):
+    return (variant.bandwidth, -variant.program_id)
 
 
 def subtitles_from_stream_response(stream_response, settings):
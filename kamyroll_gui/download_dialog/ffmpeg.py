@@ -1,73 +1,190 @@
-import re
 import logging
 
+from dataclasses import dataclass
 from datetime import timedelta
 
-from PySide6.QtCore import QProcess
-from PySide6.QtWidgets import QMessageBox
+from PySide6.QtCore import QProcess, QTimer
 
+from ..utils.log import Truncated
 
 
-PROGRESS_REGEX = re.compile(r""
-    # output file size
-    + r"size=(?:(?:N/A)|(?:\s*?(?P<size>-?\d+)kB)) "
-    # output file length as time
-    + r"time=(?:(?:N/A)|(?:(?P<hours>-?\d+):(?P<minutes>\d+):(?P<seconds>\d+\.\d+))) "
-)
+
+# Milliseconds ffmpeg gets to finish writing the output after being asked to quit
+GRACEFUL_STOP_TIMEOUT = 5000
+
+
+@dataclass
+class FFmpegProgress:
+    """A single block of the `-progress` output of ffmpeg."""
+    #: Bytes written to the output
+    total_size: int | None = None
+    out_time: timedelta | None = None
+    #: Seconds of media processed per second
+    speed: float | None = None
+    #: Kilobits per second of the output
+    bitrate: float | None = None
+    #: Estimated time until the job is finished
+    eta: timedelta | None = None
+    is_end: bool = False
+
+    @classmethod
+    def from_values(cls, values, /):
+        out_time = None
+        # `out_time_ms` is in microseconds as well
+        for key in ["out_time_us", "out_time_ms"]:
+            microseconds = _parse_number(values.get(key), int)
+            if microseconds is not None:
+                out_time = timedelta(microseconds=max(0, microseconds))
+                break
+
+        return cls(total_size=_parse_number(values.get("total_size"), int),
+            out_time=out_time,
+            speed=_parse_number(values.get("speed", "").removesuffix("x")),
+            bitrate=_parse_number(
+                values.get("bitrate", "").removesuffix("kbits/s")),
+            is_end=values.get("progress") == "end")
+
+    def describe(self, /):
+        parts = []
+        if self.total_size is not None:
+            parts.append(f"size={self.total_size // 1024}kB")
+        if self.out_time is not None:
+            parts.append(f"time={format_time(self.out_time)}")
+        if self.bitrate is not None:
+            parts.append(f"bitrate={self.bitrate:.1f}kbits/s")
+        if self.speed is not None:
+            parts.append(f"speed={self.speed:.2f}x")
+        if self.eta is not None:
+            parts.append(f"eta={format_time(self.eta)}")
+        return " ".join(parts)
+
+
+def format_time(value, /):
+    return str(timedelta(seconds=int(value.total_seconds())))
+
+
+def _parse_number(value, /, number_type=float):
+    try:
+        return number_type(value.strip())
+    except (AttributeError, ValueError):
+        return None
 
 
 class FFmpeg:
+    """Runs ffmpeg and reports its progress.
+
+    Output, questions and messages are forwarded to the `frontend`.
+    """
     _logger = logging.getLogger(__name__).getChild(__qualname__)
 
-    def __init__(self, /, parent, progress, text_edit,
-            success_callback, fail_callback):
-        self.parent = parent
+    def __init__(self, /, frontend, progress, success_callback, fail_callback,
+            progress_callback=None):
+        self.frontend = frontend
         self.success_callback = success_callback
         self.fail_callback = fail_callback
+        self.progress_callback = progress_callback
         self.is_stopped = True
         self.first_update = True
         self.max_time: timedelta
 
         self.leftover_bytes = b""
+        self.leftover_progress = b""
+        self.progress_values = {}
 
         self.progress = progress
-        self.text_edit = text_edit
 
         self.process = QProcess()
         self.process.readyReadStandardError.connect(self.readAll)
+        self.process.readyReadStandardOutput.connect(self.read_progress)
         self.process.finished.connect(self.finished)
 
-    def start(self, arguments, max_time, /):
+    def start(self, arguments, max_time, /, overwrite=False):
         self.max_time = max_time
         self.progress.setMaximum(0)
 
         prepended_args = [
             "-hide_banner",
-            "-stats",
+            "-nostats",
+            "-progress", "pipe:1",
             "-loglevel", "error",
-            "-reconnect", "1",
-            #"-reconnect_at_eof", "1",
-            "-reconnect_streamed", "1",
-            "-reconnect_on_network_error", "1",
-            "-user_agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36 Edg/94.0.992.50",
         ]
+        if overwrite:
+            prepended_args.append("-y")
         arguments = prepended_args + arguments
 
         self.is_stopped = False
         self.first_update = True
+        self.leftover_progress = b""
+        self.progress_values = {}
         self._logger.info("Started ffmpeg process with arguments: %r", arguments)
         self.process.start("ffmpeg", arguments)
 
-    def stop(self, /):
+    def stop(self, /, graceful=True):
         self.is_stopped = True
-        self.process.kill()
-        self._logger.info("FFmpeg process stopped")
+        if self.process.state() == QProcess.NotRunning:
+            return
+
+        if not graceful:
+            self.process.kill()
+            self._logger.info("FFmpeg process killed")
+            return
+
+        # Let ffmpeg finalize the output, kill it if it does not react
+        self.process.write(b"q")
+        QTimer.singleShot(GRACEFUL_STOP_TIMEOUT, self._kill_if_running)
+        self._logger.info("FFmpeg process asked to stop")
+
+    def _kill_if_running(self, /):
+        if self.process.state() != QProcess.NotRunning:
+            self._logger.info("FFmpeg process did not stop in time")
+            self.process.kill()
 
     def readAll(self, /):
         data = bytes(self.process.readAllStandardError())
-        self._logger.debug("Read data: %s", data)
+        self._logger.debug("Read data: %s", Truncated(data))
         self._process_data(data)
 
+    def read_progress(self, /):
+        data = bytes(self.process.readAllStandardOutput())
+        self._process_progress_data(data)
+
+    def _process_progress_data(self, chunk, /):
+        if self.is_stopped:
+            return
+
+        *lines, self.leftover_progress = (self.leftover_progress + chunk).split(b"\n")
+        for line in lines:
+            key, _, value = line.decode().strip().partition("=")
+            if not key:
+                continue
+            self.progress_values[key] = value
+            # Every block of values ends with the `progress` key
+            if key == "progress":
+                progress = FFmpegProgress.from_values(self.progress_values)
+                self.progress_values = {}
+                self._update_progress(progress)
+
+    def _update_progress(self, progress, /):
+        if self.is_stopped or progress.out_time is None:
+            return
+
+        if self.first_update:
+            self.first_update = False
+            maximum = int(self.max_time.total_seconds())
+            self.progress.setMaximum(maximum)
+
+        if progress.out_time > self.max_time:
+            self.progress.setMaximum(0)
+            self.progress.setValue(0)
+        else:
+            self.progress.setValue(int(progress.out_time.total_seconds()))
+            if progress.speed:
+                progress.eta = (self.max_time - progress.out_time) / progress.speed
+
+        self.frontend.append_output(progress.describe() + "\n")
+        if self.progress_callback is not None:
+            self.progress_callback(progress)
+
     def _process_data(self, chunk, /):
         if self.is_stopped:
             return
@@ -79,27 +196,30 @@ class FFmpeg:
             split_chunk[0] = self.leftover_bytes + split_chunk[0]
             self.leftover_bytes = split_chunk.pop()
 
-            for line in map(bytes.decode, split_chunk):
-                if not line:
-                    continue
-                self.text_edit.insertPlainText(line)
-                self.text_edit.insertPlainText("\n")
+            lines = [
+                line
+                for line in map(bytes.decode, split_chunk)
+                if line
+            ]
+            if lines:
+                self.frontend.append_output("\n".join(lines) + "\n")
+            for line in lines:
                 self._process_line(line)
         else:
             self.leftover_bytes += chunk
 
         if self.leftover_bytes.endswith(b"[y/N] "):
             line = self.leftover_bytes.decode()
-            self.text_edit.insertPlainText(line)
+            self.frontend.append_output(line)
             question = line.rstrip("[y/N] ")
             self.ask_question(question)
             self.leftover_bytes = b""
 
     def ask_question(self, question, /):
-        reply = QMessageBox.question(self.parent,
-            "Question - FFmpeg - Kamyroll", question)
-        response = "y\n" if reply == QMessageBox.Yes else "n\n"
-        self.text_edit.insertPlainText(response)
+        reply = self.frontend.ask_question("Question - FFmpeg - Kamyroll",
+            question)
+        response = "y\n" if reply else "n\n"
+        self.frontend.append_output(response)
         self.process.write(response.encode())
 
     def _process_line(self, line, /):
@@ -121,34 +241,13 @@ class FFmpeg:
                 f"Message: {message}",
                 f"Data: {data}"
             ])
-            QMessageBox.critical(self.parent, "Error - FFmpeg - Kamyroll", info_line)
+            self.frontend.show_error("Error - FFmpeg - Kamyroll", info_line)
             self._logger.error("FFmpeg error: %s", line)
 
             self.fail_callback()
             return
 
-        match = PROGRESS_REGEX.search(line)
-        if match:
-            try:
-                hours = int(match["hours"])
-                minutes = int(match["minutes"])
-                seconds = float(match["seconds"])
-                parsed_time = timedelta(hours=hours, minutes=minutes, seconds=seconds)
-            except ValueError:
-                return
-            if self.first_update:
-                maximum = int(self.max_time.total_seconds())
-                self.progress.setMaximum(maximum)
-
-            if parsed_time > self.max_time:
-                self.progress.setMaximum(0)
-                self.progress.setValue(0)
-                return
-
-            self.progress.setValue(int(parsed_time.total_seconds()))
-            return
-
-        QMessageBox.information(self.parent, "Info - FFmpeg - Kamyroll", line)
+        self.frontend.show_info("Info - FFmpeg - Kamyroll", line)
 
     def finished(self, exit_code, status: QProcess.ExitStatus, /):
         if status == QProcess.ExitStatus.CrashExit:
@@ -158,6 +257,10 @@ class FFmpeg:
             return
 
         # status == NormalExit
+        if self.is_stopped:
+            self._logger.info("FFmpeg process exited after stop (%s)", exit_code)
+            return
+
         self.progress.setMaximum(1)
         self.progress.setValue(1)
         self._logger.info("FFmpeg process exited successfully (%s)", exit_code)
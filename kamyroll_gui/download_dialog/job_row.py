@@ -0,0 +1,70 @@
+from PySide6.QtWidgets import (
+    QLabel,
+    QProgressBar,
+    QVBoxLayout,
+    QWidget,
+)
+
+
+
+class CoalescedProgress:
+    """Collects progress updates until `flush` applies them to the bar.
+
+    Progress arrives many times per second, only the latest state
+    is worth a repaint.
+    """
+    def __init__(self, bar, /):
+        self.bar = bar
+        self.maximum = bar.maximum()
+        self.value = bar.value()
+        self.format = bar.format()
+        self.is_dirty = False
+
+    def setMaximum(self, maximum, /):
+        self.maximum = maximum
+        self.is_dirty = True
+
+    def setValue(self, value, /):
+        self.value = value
+        self.is_dirty = True
+
+    def setFormat(self, format, /):
+        self.format = format
+        self.is_dirty = True
+
+    def flush(self, /):
+        if not self.is_dirty:
+            return
+        self.is_dirty = False
+
+        if self.bar.maximum() != self.maximum:
+            self.bar.setMaximum(self.maximum)
+        if self.bar.value() != self.value:
+            self.bar.setValue(self.value)
+        if self.bar.format() != self.format:
+            self.bar.setFormat(self.format)
+
+
+class JobRow(QWidget):
+    def __init__(self, /, parent=None):
+        super().__init__(parent)
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        self.setLayout(layout)
+
+        self.label = QLabel()
+        layout.addWidget(self.label)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximum(0)
+        self.progress_bar.setValue(0)
+        layout.addWidget(self.progress_bar)
+
+        self.progress = CoalescedProgress(self.progress_bar)
+
+    def set_text(self, text, /):
+        self.label.setText(text)
+
+    def flush(self, /):
+        self.progress.flush()
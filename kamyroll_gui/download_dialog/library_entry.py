@@ -0,0 +1,46 @@
+from ..data_types import EpisodeMetadata
+from ..utils import api
+from ..utils.library import LibraryEntry, get_checksum
+
+from .argument_helper import get_output_paths
+
+
+
+def get_selection_key(selection, /):
+    """`(audio, hardsub, subtitles, height)` as stored in the library."""
+    return (selection.audio_locale.value,
+        selection.hardsub_info.locale.value,
+        sorted(subtitle.locale.value for subtitle in selection.subtitles),
+        selection.height)
+
+
+def get_output_list(settings, selection, metadata, subtitles_only, /):
+    media_path, subtitle_paths = get_output_paths(settings, selection,
+        metadata, subtitles_only)
+    if media_path is None:
+        return subtitle_paths
+    return [media_path, *subtitle_paths]
+
+
+def create_library_entry(link, settings, selection, metadata, subtitles_only, /):
+    """Describe the finished download of an item.
+
+    Raises `OSError` if the outputs can not be read.
+    """
+    channel_id, item_id = api.get_item_key(link)
+    audio, hardsub, subtitles, height = get_selection_key(selection)
+    paths = get_output_list(settings, selection, metadata, subtitles_only)
+
+    entry = LibraryEntry(channel=channel_id, item_id=item_id, audio=audio,
+        hardsub=hardsub, subtitles=subtitles, height=height,
+        media=not subtitles_only,
+        root=str(settings.download_path.resolve()), output_paths=paths,
+        size=sum(path.stat().st_size for path in paths),
+        duration=metadata.duration.total_seconds(),
+        checksum=get_checksum(paths), title=metadata.title)
+
+    if isinstance(metadata, EpisodeMetadata):
+        entry.series = metadata.series
+        entry.season = metadata.season
+        entry.episode = metadata.episode
+    return entry
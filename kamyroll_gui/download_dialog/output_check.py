@@ -0,0 +1,191 @@
+import sqlite3
+import logging
+
+from datetime import timedelta
+
+from ..utils import api
+from ..utils.library import get_checksum, get_library
+from ..utils.probe import Prober
+
+from .argument_helper import get_output_paths
+from .library_entry import get_selection_key
+
+
+
+MISSING = "missing"
+MATCHING = "matching"
+DIFFERENT = "different"
+UNKNOWN = "unknown"
+
+# Remuxing can shift the duration a bit, compared to the api
+DURATION_TOLERANCE = timedelta(seconds=2)
+DURATION_TOLERANCE_RATIO = 0.01
+# Matroska stores the bibliographic codes of these languages
+BIBLIOGRAPHIC_LANGUAGES = {
+    "ger": "deu",
+    "fre": "fra",
+    "chi": "zho",
+}
+
+
+_logger = logging.getLogger(__name__)
+
+
+class OutputCheck:
+    """Checks if the outputs of an item were already written.
+
+    `callback` is called with `MISSING` if none of the outputs exist,
+    `MATCHING` if all of them exist and fit the selection and
+    `DIFFERENT` otherwise, in which case they should be replaced.
+    If the outputs could not be probed, e.g. because ffprobe is missing,
+    it is called with `UNKNOWN` and the user decides about replacing them.
+
+    Outputs that are unchanged since they were recorded in the library
+    index are not probed again.
+    """
+    def __init__(self, /, link, settings, selection, metadata, subtitles_only,
+            callback):
+        self.link = link
+        self.settings = settings
+        self.selection = selection
+        self.metadata = metadata
+        self.callback = callback
+        self.media_path, self.subtitle_paths = get_output_paths(settings,
+            selection, metadata, subtitles_only)
+        self.prober = None
+
+    def start(self, /):
+        # In the order of the library checksum
+        paths = [*self.subtitle_paths]
+        if self.media_path is not None:
+            paths.insert(0, self.media_path)
+        existing_paths = [path for path in paths if path.exists()]
+
+        if not existing_paths:
+            self.callback(MISSING)
+            return
+        if len(existing_paths) < len(paths):
+            _logger.info("Only some outputs exist: %s", existing_paths)
+            self.callback(DIFFERENT)
+            return
+        for path in self.subtitle_paths:
+            if not path.stat().st_size:
+                _logger.info("Empty subtitle output %s", path)
+                self.callback(DIFFERENT)
+                return
+
+        if self.media_path is None or self._is_in_library(paths):
+            self.callback(MATCHING)
+            return
+
+        self.prober = Prober(self.media_path, self._on_probe)
+        self.prober.start()
+
+    def stop(self, /):
+        if self.prober is not None:
+            self.prober.stop()
+
+    def _is_in_library(self, paths, /):
+        if not self.settings.library_index:
+            return False
+
+        channel_id, item_id = api.get_item_key(self.link)
+        try:
+            entries = get_library().find(channel_id, item_id)
+        except sqlite3.Error as error:
+            _logger.warning("Could not query the library index: %s", error)
+            return False
+
+        selection_key = get_selection_key(self.selection)
+        resolved_paths = {path.resolve() for path in paths}
+        size = sum(path.stat().st_size for path in paths)
+        media = self.media_path is not None
+        checksum = None
+        for entry in entries:
+            if not (entry.media == media and entry.has_selection(*selection_key)
+                    and set(entry.output_paths) == resolved_paths
+                    and entry.size == size):
+                continue
+            # A file rewritten with the same size has a different checksum
+            if checksum is None:
+                try:
+                    checksum = get_checksum(paths)
+                except OSError as error:
+                    _logger.warning("Could not read outputs of %s: %s",
+                        self.link, error)
+                    return False
+            if entry.checksum == checksum:
+                _logger.info("Outputs of %s are in the library index", self.link)
+                return True
+        return False
+
+    def _on_probe(self, result, /):
+        if result is None:
+            _logger.warning("Could not check existing output %s",
+                self.media_path)
+            self.callback(UNKNOWN)
+            return
+
+        reason = get_mismatch(result, self.settings, self.selection,
+            self.metadata)
+        if reason is not None:
+            _logger.info("Existing output %s differs: %s", self.media_path,
+                reason)
+            self.callback(DIFFERENT)
+            return
+
+        _logger.info("Existing output %s matches the selection",
+            self.media_path)
+        self.callback(MATCHING)
+
+
+def get_mismatch(result, settings, selection, metadata, /):
+    """Describe why a probed output does not fit, `None` if it does."""
+    if result.duration is None:
+        return "unknown duration"
+    tolerance = max(DURATION_TOLERANCE,
+        metadata.duration * DURATION_TOLERANCE_RATIO)
+    if abs(result.duration - metadata.duration) > tolerance:
+        return f"duration {result.duration} instead of {metadata.duration}"
+
+    video_streams = result.get_streams("video")
+    if not video_streams:
+        return "no video stream"
+    if selection.height and video_streams[0].height != selection.height:
+        return f"height {video_streams[0].height} instead of {selection.height}"
+    audio_streams = result.get_streams("audio")
+    if not audio_streams:
+        return "no audio stream"
+
+    # Languages are only known if they were written as metadata
+    if settings.write_metadata:
+        audio_language = selection.audio_locale.to_iso_639_2()
+        if _get_language(audio_streams[0]) != audio_language:
+            return f"audio language {audio_streams[0].language}"
+        # The video is only tagged if it has hardsubs
+        hardsub_language = selection.hardsub_info.locale.to_iso_639_2() or None
+        if _get_language(video_streams[0]) != hardsub_language:
+            return f"hardsub language {video_streams[0].language}"
+
+    expected_subtitles = []
+    if not settings.separate_subtitles:
+        expected_subtitles = [
+            subtitle.locale.to_iso_639_2()
+            for subtitle in selection.subtitles
+        ]
+    subtitle_streams = result.get_streams("subtitle")
+    if len(subtitle_streams) != len(expected_subtitles):
+        return f"{len(subtitle_streams)} subtitles instead of {len(expected_subtitles)}"
+    if settings.write_metadata:
+        languages = [_get_language(stream) for stream in subtitle_streams]
+        if sorted(languages, key=str) != sorted(expected_subtitles):
+            return f"subtitle languages {languages}"
+
+    return None
+
+
+def _get_language(stream, /):
+    """The ISO-639-2/T code of a probed stream, `None` if it is unknown."""
+    if stream.language in (None, "und"):
+        return None
+    return BIBLIOGRAPHIC_LANGUAGES.get(stream.language, stream.language)
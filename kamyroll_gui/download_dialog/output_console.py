@@ -0,0 +1,37 @@
+from PySide6.QtGui import QFont, QTextCursor
+from PySide6.QtWidgets import QPlainTextEdit
+
+
+
+# Older lines of the ffmpeg output are discarded
+MAX_OUTPUT_LINES = 1000
+
+
+class OutputConsole(QPlainTextEdit):
+    """Shows the last `max_lines` lines of output.
+
+    Appended text is buffered until `flush` writes it in one go.
+    """
+    def __init__(self, /, parent=None, max_lines=MAX_OUTPUT_LINES):
+        super().__init__(parent)
+        text_font = QFont("Monospace")
+        text_font.setStyleHint(QFont.TypeWriter)
+        self.setFont(text_font)
+        self.setReadOnly(True)
+        self.setLineWrapMode(QPlainTextEdit.NoWrap)
+        self.setMaximumBlockCount(max_lines)
+        self.pending_output = []
+
+    def append_output(self, text, /):
+        self.pending_output.append(text)
+
+    def flush(self, /):
+        if not self.pending_output:
+            return
+        text = "".join(self.pending_output)
+        self.pending_output.clear()
+
+        cursor = self.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+        self.setTextCursor(cursor)
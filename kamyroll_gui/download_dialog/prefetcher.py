@@ -0,0 +1,131 @@
+import logging
+import time
+
+from functools import partial
+
+from PySide6.QtCore import QTimer
+
+from ..utils import api
+
+from . import telemetry
+from .download_job import ResolvedItem
+
+
+
+# Stream urls are signed and expire, so do not hold on to them forever
+PREFETCH_EXPIRY = 10 * 60
+
+
+class Prefetcher:
+    """Resolves upcoming queue items while the ffmpeg slots are busy.
+
+    Prefetching never prompts the user, items that would need
+    interaction are left for the scheduler to resolve.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, scheduler, lookahead, /, expiry=PREFETCH_EXPIRY):
+        self.scheduler = scheduler
+        self.lookahead = max(0, lookahead)
+        self.expiry = expiry
+        self.items: dict[int, ResolvedItem] = {}
+        self.is_cancelled = False
+        self.failed = set()
+        self.request = None
+
+    def schedule(self, /):
+        if self.lookahead and not self.is_cancelled:
+            QTimer.singleShot(0, self.run)
+
+    def cancel(self, /):
+        self.is_cancelled = True
+        for item in self.items.values():
+            item.cleanup()
+        self.items.clear()
+        if self.request is not None:
+            self.request.cancel()
+
+    def take(self, index, settings, /):
+        item = self.items.pop(index, None)
+        if item is None:
+            return None
+
+        age = time.monotonic() - item.created
+        if age > self.expiry:
+            self._logger.info("Discarding expired prefetch of item %s", index)
+            item.cleanup()
+            return None
+
+        if item.settings is not settings:
+            # Settings changed, only the api response is still valid
+            self._logger.info("Discarding stale selection of item %s", index)
+            item.settings = settings
+            item.selection = None
+            item.arguments = None
+            item.cleanup()
+
+        return item
+
+    def run(self, /):
+        scheduler = self.scheduler
+        if self.is_cancelled or scheduler.is_resolving:
+            return
+        if scheduler.has_free_slot():
+            return
+
+        index = self._get_next_index()
+        if index is None:
+            return
+        link = scheduler.links[index]
+        if scheduler.wait_for_circuit(link):
+            return
+
+        self._logger.debug("Prefetching item %s", index)
+        scheduler.is_resolving = True
+        scheduler.telemetry.enter(index, telemetry.RESOLVING)
+        self.request = scheduler.resolve_stream_response(link,
+            interactive=False)
+        self.request.add_done_callback(partial(self._resolved, index))
+
+    def _get_next_index(self, /):
+        scheduler = self.scheduler
+        start = scheduler.position
+        end = min(start + self.lookahead, scheduler.length)
+
+        for index in range(start, end):
+            if index not in self.items and index not in self.failed:
+                return index
+        return None
+
+    def _resolved(self, index, request, /):
+        scheduler = self.scheduler
+        scheduler.is_resolving = False
+        self.request = None
+        if self.is_cancelled:
+            return
+
+        scheduler.update_api_state(request.channel_id)
+        scheduler.telemetry.add_retries(index, max(request.attempts - 1, 0))
+        if request.result is None:
+            # Leave it to the scheduler to report the error, unless
+            # the api was only paused and it can be tried again
+            if not isinstance(request.error, api.ApiCircuitOpenError):
+                self.failed.add(index)
+            scheduler.telemetry.enter(index, telemetry.QUEUED)
+        else:
+            item = ResolvedItem(settings=scheduler.settings,
+                stream_response=request.result)
+            scheduler.is_resolving = True
+            try:
+                scheduler.complete_item(index, item, interactive=False)
+            finally:
+                scheduler.is_resolving = False
+            scheduler.telemetry.enter(index, telemetry.QUEUED)
+            if self.is_cancelled:
+                item.cleanup()
+                return
+            self.items[index] = item
+
+        # Jobs might have finished while we were resolving,
+        # otherwise this prefetches the next item
+        scheduler.fill_slots()
@@ -0,0 +1,765 @@
+import hashlib
+import logging
+import shutil
+import sqlite3
+import time
+
+from dataclasses import asdict, replace
+from datetime import timedelta
+from functools import partial
+
+from PySide6.QtCore import QTimer
+
+from ..data_types import StreamResponseType
+from ..utils import api
+from ..utils.circuit_breaker import CircuitState, get_circuit_breaker
+from ..utils.hls_downloader import HlsDownloader
+from ..utils.image_cache import (
+    PosterFetch,
+    get_image_cache,
+    remove_stale_temp_files,
+)
+from ..utils.library import get_library
+from ..utils.subtitle_cache import (
+    SubtitleFetch,
+    get_subtitle_cache,
+    get_subtitle_key,
+)
+
+from .argument_helper import (
+    get_arguments,
+    get_encode_slots,
+    get_subtitle_sources,
+    is_cpu_bound,
+)
+from .download_job import DownloadJob, ResolvedItem
+from .ffmpeg import FFmpeg
+from .library_entry import create_library_entry
+from .output_check import OutputCheck, MATCHING, DIFFERENT
+from .prefetcher import Prefetcher
+from . import telemetry
+from .download_selector import (
+    SelectionError,
+    selection_from_stream_response,
+    selection_from_subtitle_list,
+    subtitles_from_stream_response,
+)
+
+
+EPISODE_BASE_FORMAT = "{series} Season {season} Episode {episode_disp}"
+MOVIE_BASE_FORMAT = "{title}"
+
+SPOOL_DIRECTORY = ".kamyroll_spool"
+# Weight of the newest measurement in the throughput average
+THROUGHPUT_SMOOTHING = 0.5
+
+
+def describe(stream_response, /):
+    format_data = asdict(stream_response.metadata)
+    if stream_response.type is StreamResponseType.EPISODE:
+        return EPISODE_BASE_FORMAT.format(**format_data)
+    # elif stream_response.type is StreamResponseType.MOVIE:
+    return MOVIE_BASE_FORMAT.format(**format_data)
+
+
+class DownloadScheduler:
+    """Runs up to `max_parallel_downloads` download jobs at the same time.
+
+    Jobs that re-encode the video leave that network pool once their
+    arguments are known and run in a pool of `max_parallel_encodes`
+    cpu slots instead.
+
+    The scheduler itself does not create any widgets, every interaction
+    is forwarded to the `frontend`.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, frontend, links, settings, /, subtitle_only=False):
+        self.frontend = frontend
+        self.links = links
+        self.length = len(links)
+        self.settings = settings
+        self.subtitle_only = subtitle_only
+        self.max_parallel = max(1, settings.max_parallel_downloads)
+        self.max_encodes = get_encode_slots(settings)
+
+        self.credentials = {}
+        self.ask_login = settings.use_own_credentials
+
+        self.position = 0
+        # Paused items that have to be started again
+        self.requeued: list[int] = []
+        self.suspended = set()
+        self.finished_count = 0
+        # Measured bits per second of a single download
+        self.measured_throughput = None
+        self.active_jobs: dict[int, DownloadJob] = {}
+        # Cpu bound jobs running ffmpeg, they do not take a network slot
+        self.encoding = set()
+        # Cpu bound `(job, arguments)` waiting for a free cpu slot
+        self.encode_queue = []
+        self.successful_items = []
+        # Successful items whose outputs already existed
+        self.skipped_items = []
+
+        self.is_resolving = False
+        # The last circuit state of every channel that was shown
+        self.api_states: dict[str, CircuitState] = {}
+        self.is_running = False
+        self.is_paused = False
+        self.halt_execution = False
+
+        self.prefetcher = Prefetcher(self, settings.prefetch_count)
+        self.telemetry = telemetry.BatchTelemetry(links)
+
+        # Resumes resolving once an open api circuit allows requests again
+        self.circuit_timer = QTimer()
+        self.circuit_timer.setSingleShot(True)
+        self.circuit_timer.timeout.connect(self.fill_slots)
+
+    def start(self, /):
+        self.is_running = True
+        remove_stale_temp_files()
+        self._update_overall()
+        QTimer.singleShot(0, self.fill_slots)
+
+    def stop(self, /):
+        if self.is_running:
+            self.is_running = False
+            self.telemetry.write_report()
+        self.halt_execution = True
+        self.circuit_timer.stop()
+        self.prefetcher.cancel()
+        self.encode_queue.clear()
+        for job in self.active_jobs.values():
+            if job.request is not None:
+                job.request.cancel()
+            if job.output_check is not None:
+                job.output_check.stop()
+            if job.subtitle_fetch is not None:
+                job.subtitle_fetch.stop()
+            if job.poster_fetch is not None:
+                job.poster_fetch.stop()
+            if job.downloader is not None:
+                job.downloader.stop()
+            if job.ffmpeg is not None:
+                job.ffmpeg.stop()
+            if job.item is not None:
+                job.item.cleanup()
+
+    def pause(self, /):
+        """Gracefully stop all running jobs, they continue on `resume`."""
+        if self.is_paused:
+            return
+        self.is_paused = True
+        self._logger.info("Pausing downloads")
+
+        for job in list(self.active_jobs.values()):
+            if (job.downloader is None and job.ffmpeg is None
+                    and job.output_check is None and job.subtitle_fetch is None
+                    and job.poster_fetch is None
+                    and not self._is_encode_queued(job)):
+                # Still resolving, it is suspended once it started
+                continue
+            self._suspend_job(job)
+        self._update_overall()
+
+    def resume(self, /):
+        if not self.is_paused:
+            return
+        self.is_paused = False
+        self._logger.info("Resuming downloads")
+        QTimer.singleShot(0, self.fill_slots)
+
+    def _suspend_job(self, job, /):
+        if job.output_check is not None:
+            job.output_check.stop()
+            job.output_check = None
+        if job.subtitle_fetch is not None:
+            job.subtitle_fetch.stop()
+            job.subtitle_fetch = None
+        if job.poster_fetch is not None:
+            job.poster_fetch.stop()
+            job.poster_fetch = None
+        if job.downloader is not None:
+            job.downloader.stop()
+        if job.ffmpeg is not None:
+            job.ffmpeg.stop()
+        # The item is resolved again once it is resumed
+        if job.item is not None:
+            job.item.cleanup()
+        self.encode_queue = [
+            entry
+            for entry in self.encode_queue
+            if entry[0] is not job
+        ]
+        self._release_cpu_slot(job)
+
+        self._record_transfer(job)
+        self.telemetry.enter(job.index, telemetry.QUEUED)
+        self.active_jobs.pop(job.index, None)
+        self.suspended.add(job.index)
+        self.requeued.append(job.index)
+        self.requeued.sort()
+        self.frontend.remove_job_row(job)
+
+    def fill_slots(self, /):
+        # Only one item is resolved at a time, so that prompts
+        # for it are never shown in the middle of another one
+        if self.halt_execution or self.is_resolving or self.is_paused:
+            return
+
+        while self.has_free_slot():
+            if self.requeued:
+                index = self.requeued[0]
+            else:
+                index = self.position
+            if self.wait_for_circuit(self.links[index]):
+                return
+
+            if self.requeued:
+                self.requeued.pop(0)
+            else:
+                self.position += 1
+
+            job = DownloadJob(index=index, link=self.links[index])
+            self.active_jobs[index] = job
+            job.row = self.frontend.add_job_row(job)
+            self._update_overall()
+
+            self._start_job(job)
+            if self.halt_execution or self.is_resolving:
+                # The api answer continues filling the slots
+                return
+            if index not in self.active_jobs:
+                # Failed or suspended, the next round is already scheduled
+                return
+
+        self.prefetcher.schedule()
+
+    def wait_for_circuit(self, link, /):
+        """Delay resolving `link` while the api of its channel is overloaded.
+
+        Returns if the circuit is open, `fill_slots` is called again
+        once it allows a request.
+        """
+        channel_id = _get_channel_id(link)
+        self.update_api_state(channel_id)
+        retry_after = get_circuit_breaker(channel_id).retry_after()
+        if not retry_after:
+            return False
+
+        milliseconds = int(retry_after * 1000) + 1
+        if (not self.circuit_timer.isActive()
+                or self.circuit_timer.remainingTime() > milliseconds):
+            self._logger.info("Waiting %s ms for the %s api", milliseconds,
+                channel_id)
+            self.circuit_timer.start(milliseconds)
+        return True
+
+    def update_api_state(self, channel_id, /):
+        breaker = get_circuit_breaker(channel_id)
+        state = breaker.state
+        if self.api_states.get(channel_id, CircuitState.CLOSED) is state:
+            return
+        self.api_states[channel_id] = state
+        self.frontend.update_api_state(channel_id, state,
+            breaker.retry_after())
+
+    def has_free_slot(self, /):
+        network_jobs = len(self.active_jobs) - len(self.encoding)
+        return ((self.requeued or self.position < self.length)
+            and network_jobs < self.max_parallel)
+
+    def _start_job(self, job, /):
+        item = self.prefetcher.take(job.index, self.settings)
+        if item is None:
+            item = ResolvedItem(settings=self.settings)
+        job.item = item
+
+        if item.stream_response is not None:
+            self._continue_job(job, item)
+            return
+
+        job.row.set_text("Querying api")
+        self.telemetry.enter(job.index, telemetry.RESOLVING)
+        self.is_resolving = True
+        job.request = self.resolve_stream_response(job.link)
+        job.request.add_done_callback(
+            partial(self._stream_response_resolved, job, item))
+
+    def _stream_response_resolved(self, job, item, request, /):
+        self.is_resolving = False
+        job.request = None
+        if self.halt_execution:
+            return
+
+        self.update_api_state(request.channel_id)
+        self.telemetry.add_retries(job.index, max(request.attempts - 1, 0))
+        if isinstance(request.error, api.ApiCircuitOpenError):
+            # Not the fault of the item, try it again once the api recovered
+            self.telemetry.enter(job.index, telemetry.QUEUED)
+            self.active_jobs.pop(job.index, None)
+            self.requeued.append(job.index)
+            self.requeued.sort()
+            self.frontend.remove_job_row(job)
+            self._update_overall()
+            QTimer.singleShot(0, self.fill_slots)
+            return
+
+        if request.result is None:
+            self._finish_job(job, False)
+            return
+
+        item.stream_response = request.result
+        self._continue_job(job, item)
+        QTimer.singleShot(0, self.fill_slots)
+
+    def _continue_job(self, job, item, /):
+        self.is_resolving = True
+        try:
+            started = self._prepare_job(job, item)
+        finally:
+            self.is_resolving = False
+
+        if self.halt_execution:
+            return
+        if not started:
+            self._finish_job(job, False)
+            return
+        # Skipped items are already finished
+        if self.is_paused and job.index in self.active_jobs:
+            self._suspend_job(job)
+            self._update_overall()
+
+    def _prepare_job(self, job, item, /):
+        stream_response = item.stream_response
+        job.stream_response = stream_response
+
+        info_text = describe(stream_response)
+        job.row.set_text(f"Downloading {info_text}:")
+
+        if not self.complete_item(job.index, item):
+            return False
+        job.bandwidth = item.selection.bandwidth
+
+        if not item.settings.skip_existing:
+            self._start_download(job, item)
+            return True
+
+        self.telemetry.enter(job.index, telemetry.PROBING)
+        job.output_check = OutputCheck(job.link, item.settings, item.selection,
+            stream_response.metadata, self.subtitle_only,
+            partial(self._output_checked, job, item))
+        job.output_check.start()
+        return True
+
+    def _output_checked(self, job, item, result, /):
+        if job.output_check is None or self.halt_execution:
+            # Stopped while checking
+            return
+        job.output_check = None
+
+        if result == MATCHING:
+            self._logger.info("Skipping item %s, it was already downloaded",
+                job.index)
+            self._finish_job(job, True, skipped=True)
+            return
+
+        # Replace differing outputs without asking, the user wanted them
+        # checked. Outputs that could not be checked need a confirmation.
+        job.overwrite = result == DIFFERENT
+        self._start_download(job, item)
+
+    def _start_download(self, job, item, /):
+        # Local subtitles are read by ffmpeg at once and survive retries
+        self.telemetry.enter(job.index, telemetry.ARGUMENTS)
+        poster = None
+        if item.settings.write_metadata and not self.subtitle_only:
+            poster = item.stream_response.images.get("poster_tall")
+        # Cached files call back right away, so both are set before starting
+        job.poster_fetch = PosterFetch(poster,
+            partial(self._poster_fetched, job, item))
+        job.subtitle_fetch = SubtitleFetch(get_subtitle_sources(item.selection),
+            partial(self._subtitles_fetched, job, item))
+        job.poster_fetch.start()
+        job.subtitle_fetch.start()
+
+    def _poster_fetched(self, job, item, path, /):
+        if job.poster_fetch is None or self.halt_execution:
+            # Stopped while fetching
+            return
+        job.poster_fetch = None
+        item.poster_path = path
+        self._files_fetched(job, item)
+
+    def _subtitles_fetched(self, job, item, failed, /):
+        if job.subtitle_fetch is None or self.halt_execution:
+            # Stopped while fetching
+            return
+        job.subtitle_fetch = None
+        self._files_fetched(job, item)
+
+    def _files_fetched(self, job, item, /):
+        if job.poster_fetch is not None or job.subtitle_fetch is not None:
+            return
+
+        if self._uses_native_hls(item.settings):
+            self._download_segments(job, item)
+            return
+
+        if item.arguments is None:
+            stream_response = item.stream_response
+            item.arguments = get_arguments(item.settings, item.selection,
+                stream_response.metadata, item.poster_path,
+                self.subtitle_only, temp_directory=item.get_temp_directory())
+        job.cpu_bound = is_cpu_bound(item.settings, item.selection,
+            self.subtitle_only)
+        self._start_ffmpeg(job, item.arguments)
+
+    def _start_ffmpeg(self, job, arguments, /):
+        if job.cpu_bound:
+            if len(self.encoding) >= self.max_encodes:
+                # It keeps its network slot, so the queue does not grow
+                self._logger.info("Item %s waits for a cpu slot", job.index)
+                self.telemetry.enter(job.index, telemetry.ENCODE_QUEUED)
+                self.encode_queue.append((job, arguments))
+                return
+            self.encoding.add(job.index)
+            # The network slot of the job is free now
+            QTimer.singleShot(0, self.fill_slots)
+        self._run_ffmpeg(job, arguments)
+
+    def _is_encode_queued(self, job, /):
+        return any(queued_job is job for queued_job, _ in self.encode_queue)
+
+    def _release_cpu_slot(self, job, /):
+        if job.index not in self.encoding:
+            return
+        self.encoding.remove(job.index)
+        if self.is_paused or self.halt_execution or not self.encode_queue:
+            return
+
+        queued_job, arguments = self.encode_queue.pop(0)
+        self.encoding.add(queued_job.index)
+        self._run_ffmpeg(queued_job, arguments)
+        QTimer.singleShot(0, self.fill_slots)
+
+    def _run_ffmpeg(self, job, arguments, /):
+        self.telemetry.enter(job.index, telemetry.DOWNLOADING)
+        job.ffmpeg_started = time.monotonic()
+        job.ffmpeg = FFmpeg(self.frontend, job.row.progress,
+            partial(self._ffmpeg_success, job), partial(self._ffmpeg_fail, job),
+            partial(self._ffmpeg_progress, job))
+        # A suspended job left a partial output that we have to replace
+        job.ffmpeg.start(arguments, job.stream_response.metadata.duration,
+            overwrite=job.overwrite or job.index in self.suspended)
+
+    def _uses_native_hls(self, settings, /):
+        return settings.native_hls_download and not self.subtitle_only
+
+    def _download_segments(self, job, item, /):
+        link_hash = hashlib.sha256(job.link.encode()).hexdigest()[:16]
+        job.spool_path = item.settings.download_path.joinpath(
+            SPOOL_DIRECTORY, link_hash)
+        self.telemetry.enter(job.index, telemetry.DOWNLOADING)
+
+        job.downloader = HlsDownloader(job.spool_path,
+            partial(self._segments_downloaded, job, item),
+            partial(self._segments_failed, job),
+            partial(self._segments_progress, job),
+            connections=item.settings.segment_connections)
+        job.downloader.start(item.selection.url, item.selection.program_ids)
+
+    def _segments_progress(self, job, done, total, /):
+        job.row.progress.setMaximum(total)
+        job.row.progress.setValue(done)
+
+    def _segments_downloaded(self, job, item, master_path, program_ids, /):
+        if self.halt_execution:
+            return
+        self._record_throughput(job.downloader.throughput)
+        self._record_transfer(job)
+        self.telemetry.enter(job.index, telemetry.ARGUMENTS)
+
+        selection = replace(item.selection, url=str(master_path),
+            program_ids=program_ids, is_local=True)
+        stream_response = item.stream_response
+        arguments = get_arguments(item.settings, selection,
+            stream_response.metadata, item.poster_path,
+            self.subtitle_only, temp_directory=item.get_temp_directory())
+        job.cpu_bound = is_cpu_bound(item.settings, selection,
+            self.subtitle_only)
+        self._start_ffmpeg(job, arguments)
+
+    def _segments_failed(self, job, message, /):
+        if self.halt_execution:
+            return
+        self._record_transfer(job)
+        self.frontend.show_error("Error - Kamyroll",
+            f"The download failed:\n{message}")
+        self._finish_job(job, False)
+
+    def _record_transfer(self, job, /):
+        downloader = job.downloader
+        if downloader is not None:
+            self.telemetry.add_bytes(job.index,
+                downloaded=downloader.downloaded_bytes)
+            self.telemetry.add_retries(job.index, downloader.retry_count)
+            # Do not count the same transfer twice
+            downloader.downloaded_bytes = 0
+            downloader.retry_count = 0
+
+        if job.progress is not None and job.progress.total_size:
+            self.telemetry.add_bytes(job.index,
+                output=job.progress.total_size)
+            job.progress = None
+
+    def _record_throughput(self, throughput, /):
+        if throughput is None:
+            return
+        if self.measured_throughput is None:
+            self.measured_throughput = throughput
+        else:
+            self.measured_throughput += THROUGHPUT_SMOOTHING * (
+                throughput - self.measured_throughput)
+        self._logger.info("Measured throughput: %d bit/s per download",
+            self.measured_throughput)
+
+    def complete_item(self, index, item, /, interactive=True):
+        if item.selection is None:
+            self.telemetry.enter(index, telemetry.SELECTING)
+            item.selection = self._resolve_selection(item.stream_response,
+                interactive)
+            if item.selection is None:
+                return False
+            item.settings = self.settings
+
+        # The arguments are created once the subtitles are local
+        self._prefetch_subtitles(item.selection)
+        return True
+
+    def _prefetch_subtitles(self, selection, /):
+        subtitle_cache = get_subtitle_cache()
+        for locale, url in get_subtitle_sources(selection):
+            subtitle_cache.prefetch(url, key=get_subtitle_key(locale, url))
+
+    def resolve_stream_response(self, link, /, interactive=True):
+        """Start querying the api for `link`.
+
+        Returns an `api.ApiRequest`, errors are already reported
+        once its callbacks are called.
+        """
+        parsed_data = api.parse_url(link)
+        if parsed_data is None:
+            raise ValueError("Somehow the url is not a valid one")
+        channel_id, params = parsed_data
+
+        username = None
+        password = None
+        if self.ask_login:
+            if channel_id in self.credentials:
+                username, password = self.credentials[channel_id]
+            elif not interactive:
+                return api.ApiRequest.from_error(channel_id,
+                    api.ApiError("Credentials are required"))
+            else:
+                data = self.frontend.ask_credentials(channel_id)
+                if self.halt_execution:
+                    return api.ApiRequest.from_error(channel_id,
+                        api.ApiError("The download was stopped"))
+                if data is not None:
+                    username, password = data
+                    self.credentials[channel_id] = data
+                else:
+                    # Disable the dialog next time
+                    self.ask_login = False
+
+        request = api.get_media_async(channel_id, params, username, password,
+            use_cache=self.settings.cache_api_responses,
+            needs_streams=not self.subtitle_only)
+        request.add_done_callback(
+            partial(self._report_api_error, interactive))
+        request.add_done_callback(self._prefetch_images)
+        return request
+
+    def _report_api_error(self, interactive, request, /):
+        error = request.error
+        if error is None or request.is_cancelled or self.halt_execution:
+            return
+        if not interactive or isinstance(error, api.ApiCircuitOpenError):
+            self._logger.info("Api call for a queued item failed: %s", error)
+            return
+        message = f"The api call failed:\n{error}"
+        self.frontend.show_error("Error - Kamyroll", message)
+
+    def _prefetch_images(self, request, /):
+        settings = self.settings
+        if (request.result is None or self.subtitle_only
+                or not settings.write_metadata):
+            return
+        # Episodes of a series share the poster, so it is cached
+        poster = request.result.images.get("poster_tall")
+        if poster is not None:
+            get_image_cache().prefetch(poster)
+
+    def _resolve_selection(self, stream_response, interactive, /):
+        settings = self.settings
+        try:
+            try:
+                if self.halt_execution:
+                    return None
+                return self.get_selection(stream_response, settings)
+            except SelectionError:
+                if not interactive:
+                    return None
+                result = self.frontend.ask_settings(stream_response,
+                    settings, self.subtitle_only)
+                if self.halt_execution or result is None:
+                    return None
+
+                new_settings, apply_to_all = result
+                if apply_to_all:
+                    self.settings = new_settings
+                if self.halt_execution:
+                    return None
+                return self.get_selection(stream_response, new_settings)
+        except Exception as error:
+            self._logger.error("Error during selection: %s", error)
+            if interactive:
+                self.frontend.show_error("Download Error - Kamyroll", str(error))
+            return None
+
+    def get_selection(self, stream_response, settings, /):
+        if self.subtitle_only:
+            selected_subtitles = subtitles_from_stream_response(
+                stream_response, settings)
+            selection = selection_from_subtitle_list(selected_subtitles)
+        else:
+            selection = selection_from_stream_response(stream_response,
+                settings, throughput=self.measured_throughput)
+        return selection
+
+    def _ffmpeg_progress(self, job, progress, /):
+        job.progress = progress
+        self.frontend.update_job_progress(job, progress)
+        self.frontend.update_queue_eta(self.get_queue_eta())
+
+    def get_queue_eta(self, /):
+        """Estimate the time until the whole queue is downloaded.
+
+        Uses the media durations of all known items and the combined
+        speed of the running ffmpeg processes. Native segment downloads
+        have no ffmpeg speed yet, they count with the measured throughput
+        over the bandwidth of their variant.
+        """
+        speed = 0
+        for job in self.active_jobs.values():
+            if job.progress is not None and job.progress.speed:
+                speed += job.progress.speed
+            elif (job.downloader is not None and job.ffmpeg is None
+                    and job.bandwidth and self.measured_throughput):
+                speed += self.measured_throughput / job.bandwidth
+        durations = {
+            index: item.stream_response.metadata.duration
+            for index, item in self.prefetcher.items.items()
+        }
+        for job in self.active_jobs.values():
+            if job.stream_response is not None:
+                durations[job.index] = job.stream_response.metadata.duration
+        if not speed or not durations:
+            return None
+
+        average = sum(durations.values(), timedelta()) / len(durations)
+        remaining = timedelta()
+        for job in self.active_jobs.values():
+            duration = durations.get(job.index, average)
+            if job.progress is not None and job.progress.out_time is not None:
+                duration = max(timedelta(), duration - job.progress.out_time)
+            remaining += duration
+
+        pending = range(self.position, self.length)
+        for index in [*self.requeued, *pending]:
+            remaining += durations.get(index, average)
+
+        return remaining / speed
+
+    def _ffmpeg_fail(self, job, /):
+        job.ffmpeg.stop()
+        self.frontend.show_error("Error - Kamyroll", "The download failed.")
+        self._finish_job(job, False)
+
+    def _ffmpeg_success(self, job, /):
+        self._record_throughput(self._get_ffmpeg_throughput(job))
+        self._finish_job(job, True)
+
+    def _get_ffmpeg_throughput(self, job, /):
+        """The download speed of ffmpeg reading the remote stream.
+
+        Only a remux reads as fast as the network allows and writes about
+        as many bytes as it downloads, local inputs and encodes say
+        nothing about the network.
+        """
+        if (job.cpu_bound or job.downloader is not None or self.subtitle_only
+                or job.progress is None or not job.progress.total_size):
+            return None
+        elapsed = time.monotonic() - job.ffmpeg_started
+        if elapsed <= 0:
+            return None
+        return job.progress.total_size * 8 / elapsed
+
+    def _finish_job(self, job, success, /, skipped=False):
+        if self.halt_execution:
+            return
+
+        self.active_jobs.pop(job.index, None)
+        self._release_cpu_slot(job)
+        self.finished_count += 1
+        self._record_transfer(job)
+        self.telemetry.finish(job.index, success, skipped=skipped)
+        if job.item is not None:
+            job.item.cleanup()
+        if skipped:
+            self.skipped_items.append(job.index)
+        if success:
+            self._record_in_library(job)
+        # Keep the segments of failed jobs so a later run can resume them
+        if success and job.spool_path is not None:
+            shutil.rmtree(job.spool_path, ignore_errors=True)
+        if success:
+            # Jobs can finish out of order, keep the list sorted
+            self.successful_items.append(job.index)
+            self.successful_items.sort()
+        self.frontend.remove_job_row(job)
+        self._update_overall()
+
+        if self.finished_count < self.length:
+            QTimer.singleShot(0, self.fill_slots)
+            return
+
+        self.is_running = False
+        self.telemetry.write_report()
+        self.frontend.queue_finished(self.successful_items)
+
+    def _record_in_library(self, job, /):
+        item = job.item
+        if item is None or not item.settings.library_index:
+            return
+
+        try:
+            entry = create_library_entry(job.link, item.settings,
+                item.selection, item.stream_response.metadata,
+                self.subtitle_only)
+            get_library().record(entry)
+        except (OSError, sqlite3.Error) as error:
+            self._logger.warning("Could not add item %s to the library: %s",
+                job.index, error)
+
+    def _update_overall(self, /):
+        self.frontend.update_overall(self.finished_count,
+            len(self.active_jobs), self.length)
+
+
+def _get_channel_id(link, /):
+    channel_id, _ = api.parse_url(link)
+    return channel_id
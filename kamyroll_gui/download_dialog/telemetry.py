@@ -0,0 +1,182 @@
+import csv
+import json
+import math
+import time
+import logging
+
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+
+
+
+REPORT_DIRECTORY = Path("logs")
+
+QUEUED = "queued"
+RESOLVING = "resolving"
+SELECTING = "selecting"
+ARGUMENTS = "arguments"
+PROBING = "probing"
+ENCODE_QUEUED = "encode_queued"
+DOWNLOADING = "downloading"
+FINISHED = "finished"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+STAGES = [QUEUED, RESOLVING, SELECTING, ARGUMENTS, PROBING, ENCODE_QUEUED,
+    DOWNLOADING]
+PERCENTILES = [50, 90, 95]
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JobTimings:
+    index: int
+    link: str
+    #: `(stage, seconds since the batch started)` for every stage entered
+    transitions: list[tuple[str, float]] = field(default_factory=list)
+    status: str | None = None
+    downloaded_bytes: int = 0
+    output_bytes: int = 0
+    retries: int = 0
+
+    def get_durations(self, /):
+        """Sum up the seconds spent in every stage.
+
+        A stage can be entered multiple times, e.g. after a resume.
+        """
+        durations = dict.fromkeys(STAGES, 0.0)
+        for (stage, start), (_, end) in zip(self.transitions, self.transitions[1:]):
+            if stage in durations:
+                durations[stage] += end - start
+        return durations
+
+    @property
+    def total(self, /):
+        if len(self.transitions) < 2:
+            return 0.0
+        return self.transitions[-1][1] - self.transitions[0][1]
+
+
+class BatchTelemetry:
+    """Records when every item of a batch enters which stage.
+
+    The stages are `QUEUED`, `RESOLVING` (api call), `SELECTING`
+    (master playlist and variant), `ARGUMENTS` (including the poster
+    and subtitle downloads), `PROBING` (existing outputs),
+    `ENCODE_QUEUED` (waiting for a cpu slot) and `DOWNLOADING`,
+    until it is `FINISHED`, `SKIPPED` or `FAILED`.
+    """
+    def __init__(self, links, /):
+        self.started = datetime.now()
+        self.start_time = time.monotonic()
+        self.jobs = [
+            JobTimings(index=index, link=link)
+            for index, link in enumerate(links)
+        ]
+        for job in self.jobs:
+            job.transitions.append((QUEUED, 0.0))
+
+    def enter(self, index, stage, /):
+        job = self.jobs[index]
+        if job.transitions and job.transitions[-1][0] == stage:
+            return
+        job.transitions.append((stage, time.monotonic() - self.start_time))
+
+    def finish(self, index, success, /, skipped=False):
+        status = FINISHED if success else FAILED
+        if skipped:
+            status = SKIPPED
+        self.enter(index, status)
+        self.jobs[index].status = status
+
+    def add_bytes(self, index, /, downloaded=0, output=0):
+        job = self.jobs[index]
+        job.downloaded_bytes += downloaded
+        job.output_bytes += output
+
+    def add_retries(self, index, retries, /):
+        self.jobs[index].retries += retries
+
+    def get_report(self, /):
+        durations = [job.get_durations() for job in self.jobs]
+        stages = {}
+        for stage in STAGES:
+            values = sorted(
+                job_durations[stage]
+                for job, job_durations in zip(self.jobs, durations)
+                if job.status is not None
+            )
+            stages[stage] = _get_statistics(values)
+        finished_totals = sorted(
+            job.total
+            for job in self.jobs
+            if job.status is not None
+        )
+        stages["total"] = _get_statistics(finished_totals)
+
+        return {
+            "started": self.started.isoformat(timespec="seconds"),
+            "duration": time.monotonic() - self.start_time,
+            "stages": stages,
+            "items": [
+                {
+                    "index": job.index,
+                    "link": job.link,
+                    "status": job.status,
+                    "downloaded_bytes": job.downloaded_bytes,
+                    "output_bytes": job.output_bytes,
+                    "retries": job.retries,
+                    "durations": job_durations,
+                    "transitions": job.transitions,
+                }
+                for job, job_durations in zip(self.jobs, durations)
+            ],
+        }
+
+    def write_report(self, /, directory=REPORT_DIRECTORY):
+        """Write the report as `.json` and the items as `.csv`."""
+        report = self.get_report()
+        name = self.started.strftime("batch_%Y-%m-%d_%H-%M-%S")
+        json_path = Path(directory, f"{name}.json")
+        csv_path = Path(directory, f"{name}.csv")
+
+        try:
+            json_path.parent.mkdir(parents=True, exist_ok=True)
+            with json_path.open("w") as file:
+                json.dump(report, file, indent=4)
+
+            with csv_path.open("w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["index", "link", "status", "downloaded_bytes",
+                    "output_bytes", "retries", *STAGES, "total"])
+                for job, item in zip(self.jobs, report["items"]):
+                    durations = item["durations"]
+                    writer.writerow([job.index, job.link, job.status,
+                        job.downloaded_bytes, job.output_bytes, job.retries,
+                        *(f"{durations[stage]:.3f}" for stage in STAGES),
+                        f"{job.total:.3f}"])
+        except OSError as error:
+            _logger.warning("Could not write batch report: %s", error)
+            return None
+
+        _logger.info("Wrote batch report to %s", json_path)
+        return json_path
+
+
+def _get_statistics(values, /):
+    if not values:
+        return {"count": 0}
+
+    statistics = {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "max": values[-1],
+    }
+    for percentile in PERCENTILES:
+        # Nearest rank, the values are already sorted
+        rank = math.ceil(percentile / 100 * len(values))
+        statistics[f"p{percentile}"] = values[max(0, rank - 1)]
+    return statistics
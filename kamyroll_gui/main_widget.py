@@ -14,10 +14,10 @@ from PySide6.QtWidgets import (
     QPushButton,
 )
 
-from .settings_dialog import SettingsDialog
-from .download_dialog import DownloadDialog
 from .validated_url_input_dialog import ValidatedUrlInputDialog
-from .settings import manager
+from .settings import get_manager
+from .utils import api
+from .utils.series import SeriesExpander
 
 
 ABOUT_TEXT = """
@@ -26,6 +26,7 @@ and was developed by <a href="https://github.com/Grub4K">Grub4K</a><br>
 The source is available on <a href="https://github.com/Grub4K/kamyroll-gui">GitHub</a><br><br>
 It uses the Kamyroll API developed by <a href="https://github.com/hyugogirubato">hyugogirubato</a>
 """
+EXPANDING_FORMAT = "Listing episodes of {url} ({done} of {total} lists)"
 
 class MainWidget(QWidget):
     _logger = logging.getLogger(__name__).getChild(__qualname__)
@@ -36,6 +37,8 @@ class MainWidget(QWidget):
         self.setMinimumSize(700, 500)
 
         self.url_correct = False
+        # Placeholder items of the series that are still being listed
+        self.expanders: dict[QListWidgetItem, SeriesExpander] = {}
 
         layout = QGridLayout()
         self.setLayout(layout)
@@ -91,13 +94,23 @@ class MainWidget(QWidget):
         dialog = ValidatedUrlInputDialog(self, item.text())
         if dialog.exec() == QDialog.Accepted:
             value = dialog.line_edit.text()
-            item.setText(value)
+            if api.parse_series_url(value) is None:
+                item.setText(value)
+                return
+
+            row = self.list_widget.row(item)
+            self._remove_list_item(item)
+            self._add_url(value, row)
 
     def check_selection(self, /):
         selection = self.list_widget.selectedIndexes()
         self.remove_item_button.setEnabled(bool(selection))
 
     def create_settings(self, /):
+        # The dialogs are only imported when used to speed up startup
+        from .settings_dialog import SettingsDialog
+
+        manager = get_manager()
         dialog = SettingsDialog(self, manager.settings)
         if dialog.exec() == QDialog.Accepted:
             manager.settings = dialog.settings
@@ -105,8 +118,7 @@ class MainWidget(QWidget):
 
     def remove_item(self, /):
         for item in self.list_widget.selectedItems():
-            row = self.list_widget.row(item)
-            self.list_widget.takeItem(row)
+            self._remove_list_item(item)
             del item
 
         self._set_button_states()
@@ -115,12 +127,51 @@ class MainWidget(QWidget):
         dialog = ValidatedUrlInputDialog(self)
         if dialog.exec() == QDialog.Accepted:
             value = dialog.line_edit.text()
-            self.list_widget.addItem(value)
+            self._add_url(value, self.list_widget.count())
+
+        self._set_button_states()
+
+    def _add_url(self, url, row, /):
+        if api.parse_series_url(url) is None:
+            self.list_widget.insertItem(row, url)
+            return
+
+        placeholder = QListWidgetItem(EXPANDING_FORMAT.format(url=url,
+            done=0, total=1))
+        placeholder.setFlags(Qt.ItemIsEnabled | Qt.ItemIsSelectable)
+        self.list_widget.insertItem(row, placeholder)
+
+        def update_progress(done, total):
+            placeholder.setText(EXPANDING_FORMAT.format(url=url,
+                done=done, total=total))
+
+        expander = SeriesExpander(partial(self._series_expanded, placeholder),
+            update_progress, workers=get_manager().settings.listing_workers)
+        self.expanders[placeholder] = expander
+        expander.start([url])
+
+    def _series_expanded(self, placeholder, urls, errors, /):
+        self.expanders.pop(placeholder, None)
+        row = self.list_widget.row(placeholder)
+        if row != -1:
+            self.list_widget.takeItem(row)
+            for offset, url in enumerate(urls):
+                self.list_widget.insertItem(row + offset, url)
 
         self._set_button_states()
+        for url, message in errors.items():
+            QMessageBox.critical(self, "Error - Kamyroll",
+                f"Could not add the episodes of {url}:\n{message}")
+
+    def _remove_list_item(self, item, /):
+        expander = self.expanders.pop(item, None)
+        if expander is not None:
+            expander.stop()
+        row = self.list_widget.row(item)
+        self.list_widget.takeItem(row)
 
     def create_subtitle_download_dialog(self, /):
-        if not manager.settings.subtitle_locales:
+        if not get_manager().settings.subtitle_locales:
             QMessageBox.information(self, "Info - Kamyroll",
                 "No subtitles are selected.\nSelect subtitles in the settings and try again.")
             return
@@ -130,11 +181,14 @@ class MainWidget(QWidget):
         self._real_create_download_dialog(False)
 
     def _set_button_states(self, /):
-        disable_buttons = not self.list_widget.count()
+        # Placeholders of unlisted series can not be downloaded
+        disable_buttons = not self.list_widget.count() or bool(self.expanders)
         self.download_button.setDisabled(disable_buttons)
         self.download_subs_button.setDisabled(disable_buttons)
 
     def _real_create_download_dialog(self, subtitle_only, /):
+        from .download_dialog import DownloadDialog
+
         items = self._get_items()
         dialog = DownloadDialog(self, items, subtitle_only=subtitle_only)
         if dialog.exec() == QDialog.Accepted:
@@ -2,6 +2,8 @@ import json
 import logging
 import typing
 
+from functools import cache
+
 from dataclasses import (
     asdict,
     dataclass,
@@ -16,6 +18,7 @@ from types import GenericAlias
 from .data_types import (
     Locale,
     Resolution,
+    VariantPolicy,
 )
 
 
@@ -29,6 +32,9 @@ class Settings:
     hardsub_locale: Locale = Locale.NONE
     subtitle_locales: list[Locale] = field(default_factory=list)
     video_height: Resolution = Resolution.R1080
+    variant_policy: VariantPolicy = VariantPolicy.HIGHEST_QUALITY
+    # Bits per second per download, 0 means unlimited
+    max_bandwidth: int = 0
     episode_format: str = "{series}/{series}.S{season}.E{episode}"
     subtitle_prefix: str = "subtitles"
     movie_format: str = "{title}"
@@ -36,8 +42,26 @@ class Settings:
     write_metadata: bool = False
     separate_subtitles: bool = False
     compress_streams: bool = False
+    skip_existing: bool = True
+    # Record finished downloads in `library.sqlite3`
+    library_index: bool = True
     use_own_credentials: bool = False
     strict_matching: bool = False
+    cache_api_responses: bool = True
+    max_parallel_downloads: int = 1
+    # Re-encoding jobs at the same time, `0` runs one per cpu core
+    max_parallel_encodes: int = 0
+    prefetch_count: int = 1
+    # Parallel api calls when listing the episodes of a series
+    listing_workers: int = 4
+    native_hls_download: bool = False
+    segment_connections: int = 4
+    http2_enabled: bool = True
+    compressed_transfer: bool = True
+    connections_per_host: int = 6
+    log_level: str = "INFO"
+    # Logger names like `kamyroll_gui.utils.web_manager` mapped to a level
+    module_log_levels: dict[str, str] = field(default_factory=dict)
 
 
 class SettingsManager:
@@ -155,4 +179,7 @@ class SettingsManager:
         _logger.warning("Cannot parse value %r, type %s is unknown", data, field_type)
 
 
-manager = SettingsManager("settings.json")
+@cache
+def get_manager():
+    """The settings of the application, loaded on first use."""
+    return SettingsManager("settings.json")
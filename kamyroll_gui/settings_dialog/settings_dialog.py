@@ -7,6 +7,9 @@ from PySide6.QtWidgets import (
     QMessageBox,
     QPushButton,
     QGridLayout,
+    QHBoxLayout,
+    QLabel,
+    QSpinBox,
     QVBoxLayout,
     QWidget,
 )
@@ -117,6 +120,81 @@ class SettingsDialog(QDialog):
         self.use_strict_matching_box.setChecked(self.settings.strict_matching)
         _checkbox_layout.addWidget(self.use_strict_matching_box)
 
+        self.cache_api_responses = QCheckBox("Cache api responses")
+        self.cache_api_responses.setToolTip("Reuse recent api responses and fall back to cached metadata when offline")
+        self.cache_api_responses.stateChanged.connect(self.update_cache_api_responses)
+        self.cache_api_responses.setChecked(self.settings.cache_api_responses)
+        _checkbox_layout.addWidget(self.cache_api_responses)
+
+        self.native_hls_download = QCheckBox("Download segments in parallel")
+        self.native_hls_download.setToolTip("Download the stream segments over multiple connections before ffmpeg remuxes them")
+        self.native_hls_download.stateChanged.connect(self.update_native_hls_download)
+        self.native_hls_download.setChecked(self.settings.native_hls_download)
+        _checkbox_layout.addWidget(self.native_hls_download)
+
+        self.skip_existing = QCheckBox("Skip existing downloads")
+        self.skip_existing.setToolTip("Check existing files with ffprobe and only replace them if they differ")
+        self.skip_existing.stateChanged.connect(self.update_skip_existing)
+        self.skip_existing.setChecked(self.settings.skip_existing)
+        _checkbox_layout.addWidget(self.skip_existing)
+
+        _parallel_layout = QHBoxLayout()
+        _checkbox_layout.addLayout(_parallel_layout)
+
+        parallel_downloads_label = QLabel("Parallel downloads:")
+        _parallel_layout.addWidget(parallel_downloads_label)
+
+        self.parallel_downloads = QSpinBox()
+        self.parallel_downloads.setToolTip("Amount of items that are downloaded at the same time")
+        self.parallel_downloads.setRange(1, 16)
+        self.parallel_downloads.setValue(self.settings.max_parallel_downloads)
+        self.parallel_downloads.valueChanged.connect(self.update_parallel_downloads)
+        parallel_downloads_label.setBuddy(self.parallel_downloads)
+        _parallel_layout.addWidget(self.parallel_downloads)
+
+        _encodes_layout = QHBoxLayout()
+        _checkbox_layout.addLayout(_encodes_layout)
+
+        parallel_encodes_label = QLabel("Parallel encodes:")
+        _encodes_layout.addWidget(parallel_encodes_label)
+
+        self.parallel_encodes = QSpinBox()
+        self.parallel_encodes.setToolTip("Amount of items that are re-encoded at the same time, in addition to the downloads")
+        self.parallel_encodes.setRange(0, 64)
+        self.parallel_encodes.setSpecialValueText("One per core")
+        self.parallel_encodes.setValue(self.settings.max_parallel_encodes)
+        self.parallel_encodes.valueChanged.connect(self.update_parallel_encodes)
+        parallel_encodes_label.setBuddy(self.parallel_encodes)
+        _encodes_layout.addWidget(self.parallel_encodes)
+
+        _prefetch_layout = QHBoxLayout()
+        _checkbox_layout.addLayout(_prefetch_layout)
+
+        prefetch_count_label = QLabel("Prefetched items:")
+        _prefetch_layout.addWidget(prefetch_count_label)
+
+        self.prefetch_count = QSpinBox()
+        self.prefetch_count.setToolTip("Amount of upcoming items that are prepared while downloading")
+        self.prefetch_count.setRange(0, 16)
+        self.prefetch_count.setValue(self.settings.prefetch_count)
+        self.prefetch_count.valueChanged.connect(self.update_prefetch_count)
+        prefetch_count_label.setBuddy(self.prefetch_count)
+        _prefetch_layout.addWidget(self.prefetch_count)
+
+        _connections_layout = QHBoxLayout()
+        _checkbox_layout.addLayout(_connections_layout)
+
+        segment_connections_label = QLabel("Segment connections:")
+        _connections_layout.addWidget(segment_connections_label)
+
+        self.segment_connections = QSpinBox()
+        self.segment_connections.setToolTip("Amount of parallel connections used per download for segments")
+        self.segment_connections.setRange(1, 32)
+        self.segment_connections.setValue(self.settings.segment_connections)
+        self.segment_connections.valueChanged.connect(self.update_segment_connections)
+        segment_connections_label.setBuddy(self.segment_connections)
+        _connections_layout.addWidget(self.segment_connections)
+
     def update_metadata(self, state, /):
         self.settings.write_metadata = bool(state)
 
@@ -128,3 +206,24 @@ class SettingsDialog(QDialog):
 
     def update_strict_matching(self, state, /):
         self.settings.strict_matching = bool(state)
+
+    def update_cache_api_responses(self, state, /):
+        self.settings.cache_api_responses = bool(state)
+
+    def update_native_hls_download(self, state, /):
+        self.settings.native_hls_download = bool(state)
+
+    def update_skip_existing(self, state, /):
+        self.settings.skip_existing = bool(state)
+
+    def update_segment_connections(self, value, /):
+        self.settings.segment_connections = value
+
+    def update_parallel_downloads(self, value, /):
+        self.settings.max_parallel_downloads = value
+
+    def update_parallel_encodes(self, value, /):
+        self.settings.max_parallel_encodes = value
+
+    def update_prefetch_count(self, value, /):
+        self.settings.prefetch_count = value
@@ -6,6 +6,7 @@ from PySide6.QtCore import Qt
 from PySide6.QtWidgets import (
     QVBoxLayout,
     QComboBox,
+    QSpinBox,
     QWidget,
     QLabel,
 )
@@ -14,10 +15,11 @@ from kamyroll_gui.data_types.stream_response import StreamResponse
 from kamyroll_gui.settings import Settings
 
 from ..utils import m3u8
-from ..utils.web_manager import web_manager
+from ..utils.web_manager import get_web_manager
 from ..data_types import (
     Locale,
     Resolution,
+    VariantPolicy,
 )
 
 
@@ -67,12 +69,33 @@ class VideoWidget(QWidget):
         layout.addWidget(self.video_width_label)
         layout.addWidget(self.video_height)
 
+        self.variant_policy = QComboBox()
+        for policy in VariantPolicy:
+            self.variant_policy.addItem(str(policy), policy)
+        variant_policy_label = QLabel("Variant selection:")
+        variant_policy_label.setBuddy(self.variant_policy)
+        layout.addWidget(variant_policy_label)
+        layout.addWidget(self.variant_policy)
+
+        self.max_bandwidth = QSpinBox()
+        self.max_bandwidth.setRange(0, 1000000)
+        self.max_bandwidth.setSingleStep(500)
+        self.max_bandwidth.setSuffix(" kbit/s")
+        self.max_bandwidth.setSpecialValueText("Unlimited")
+        self.max_bandwidth.setValue(settings.max_bandwidth // 1000)
+        max_bandwidth_label = QLabel("Maximum bitrate per download:")
+        max_bandwidth_label.setBuddy(self.max_bandwidth)
+        layout.addWidget(max_bandwidth_label)
+        layout.addWidget(self.max_bandwidth)
+
         selected_audio_index = self.audio_locale.findData(settings.audio_locale)
         self.audio_locale.setCurrentIndex(selected_audio_index)
         selected_hardsub_index = self.hardsub_locale.findData(settings.hardsub_locale)
         self.hardsub_locale.setCurrentIndex(selected_hardsub_index)
         selected_resolution_index = self.video_height.findData(settings.video_height.value)
         self.video_height.setCurrentIndex(selected_resolution_index)
+        selected_policy_index = self.variant_policy.findData(settings.variant_policy)
+        self.variant_policy.setCurrentIndex(selected_policy_index)
 
         self.set_audio_locale()
         self.set_hardsub_locale()
@@ -81,6 +104,8 @@ class VideoWidget(QWidget):
         self.audio_locale.currentIndexChanged.connect(self.set_audio_locale)
         self.hardsub_locale.currentIndexChanged.connect(self.set_hardsub_locale)
         self.video_height.currentIndexChanged.connect(self.set_video_height)
+        self.variant_policy.currentIndexChanged.connect(self.set_variant_policy)
+        self.max_bandwidth.valueChanged.connect(self.set_max_bandwidth)
 
     def get_audio_locales(self, /):
         if self.stream_response is None:
@@ -171,8 +196,14 @@ class VideoWidget(QWidget):
     def set_video_height(self, /):
         self.settings.video_height = self.video_height.currentData()
 
+    def set_variant_policy(self, /):
+        self.settings.variant_policy = self.variant_policy.currentData()
+
+    def set_max_bandwidth(self, value, /):
+        self.settings.max_bandwidth = value * 1000
+
     @lru_cache
     def _get_resolutions(self, url, /):
-        data = web_manager.get(url).decode()
+        data = get_web_manager().get(url, cached=True).decode()
         resolutions = m3u8.get_resolutions(data)
         return list(resolutions)
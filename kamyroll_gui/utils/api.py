@@ -1,11 +1,17 @@
+import os
 import re
 import json
+import random
 import logging
 
 from datetime import datetime, timedelta
+from typing import Any
 
-from .web_manager import web_manager
-from .blocking import wait
+from PySide6.QtCore import QTimer
+
+from .api_cache import get_api_cache
+from .circuit_breaker import get_circuit_breaker
+from .web_manager import get_web_manager
 from ..data_types import (
     Channel,
     EpisodeMetadata,
@@ -16,18 +22,51 @@ from ..data_types import (
     StreamResponse,
     StreamResponseType,
     MovieMetadata,
+    SeasonEntry,
+    EpisodeEntry,
 )
 
 
 
-BASE_URL = "https://kamyroll-server.herokuapp.com"
+# Can be pointed at a local server for testing
+BASE_URL = os.environ.get("KAMYROLL_API_URL", "https://kamyroll-server.herokuapp.com")
 
 REGEXES = [
     ("crunchyroll", re.compile(r"https://beta\.crunchyroll\.com/(?:[a-z]{2,}/)?watch/(?P<id>[A-Z0-9]+)/")),
-    ("funimation", re.compile(r"https://www\.funimation\.com/v/(?P<slug_show>[a-z\-]+)/(?P<slug_episode>[a-z\-]+)")),
+    ("funimation", re.compile(r"https://www\.funimation\.com/v/(?P<slug_show>[a-z0-9\-]+)/(?P<slug_episode>[a-z0-9\-]+)")),
     ("adn", re.compile(r"https://animedigitalnetwork\.fr/video/[^/]+/(?P<id>[0-9]+)-")),
 ]
 
+# Urls of a whole series, `season_id` limits it to a single season
+SERIES_REGEXES = [
+    ("crunchyroll", re.compile(r"https://beta\.crunchyroll\.com/(?:[a-z]{2,}/)?series/(?P<id>[A-Z0-9]+)(?:/[^?#]*)?(?:\?season=(?P<season_id>[A-Z0-9]+))?")),
+    ("funimation", re.compile(r"https://www\.funimation\.com/shows/(?P<id>[a-z0-9\-]+)/?(?:\?season=(?P<season_id>[0-9]+))?$")),
+    ("adn", re.compile(r"https://animedigitalnetwork\.fr/video/(?P<id>[a-z0-9\-]+)/?$")),
+]
+
+EPISODE_URL_FORMATS = {
+    "crunchyroll": "https://beta.crunchyroll.com/watch/{id}/",
+    "funimation": "https://www.funimation.com/v/{series_id}/{slug}",
+    "adn": "https://animedigitalnetwork.fr/video/{series_id}/{id}-{slug}",
+}
+# What `parse_url` has to return for the generated episode urls
+EPISODE_URL_PARAMS = {
+    "crunchyroll": {"id": "{id}"},
+    "funimation": {"slug_show": "{series_id}", "slug_episode": "{slug}"},
+    "adn": {"id": "{id}"},
+}
+
+STREAMS_PATH = "/v1/streams"
+SEASONS_PATH = "/v1/seasons"
+EPISODES_PATH = "/v1/episodes"
+
+
+# Attempts of a single api call before it fails
+DEFAULT_RETRIES = 5
+# Milliseconds before the first retry, doubled for every further attempt
+RETRY_BASE_DELAY = 1000
+RETRY_MAX_DELAY = 30000
+
 
 _logger = logging.getLogger(__name__)
 
@@ -36,6 +75,18 @@ class ApiError(Exception):
     pass
 
 
+class ApiUnavailableError(ApiError):
+    pass
+
+
+class ApiCircuitOpenError(ApiUnavailableError):
+    """Too many calls failed recently, the api is not queried for now."""
+    def __init__(self, message, retry_after, /):
+        super().__init__(message)
+        #: Seconds until the api is queried again
+        self.retry_after = retry_after
+
+
 def parse_url(url):
     for name, regexp in REGEXES:
         match = regexp.match(url)
@@ -46,55 +97,322 @@ def parse_url(url):
     return None
 
 
-def get_media(name, params, /, username=None, password=None, retries=3):
-    use_login = username and password
-    use_bypass = False
+def get_item_key(url, /):
+    """Get `(channel_id, item_id)`, identifying an item across urls."""
+    channel_id, params = parse_url(url)
+    return channel_id, "/".join(params.values())
 
-    params["channel_id"] = name
 
-    if name=="adn":
-        params["country"] = "fr"
+def parse_series_url(url):
+    for name, regexp in SERIES_REGEXES:
+        match = regexp.match(url)
+        if not match:
+            continue
 
-    if use_login:
-        params["email"] = username
-        params["password"] = password
-    else:
-        use_bypass = True
+        return name, {
+            key: value
+            for key, value in match.groupdict().items()
+            if value is not None
+        }
+    return None
 
-    if retries <= 1:
-        retries = 1
-    data = {}
-    for _ in range(retries):
-        params["bypass"] = "true"
-        if not use_bypass:
-            del params["bypass"]
 
-        data = call_api("/v1/streams", params=params)
+def get_seasons_async(name, series_id, /):
+    """Start listing the seasons of a series as `SeasonEntry`s."""
+    request = ApiRequest(name, {"id": series_id}, use_cache=False,
+        path=SEASONS_PATH, parser=_parse_seasons)
+    request.start()
+    return request
+
+
+def get_episodes_async(name, series_id, season_id, /):
+    """Start listing the episodes of a season as `EpisodeEntry`s."""
+    request = ApiRequest(name, {"id": season_id}, use_cache=False,
+        path=EPISODES_PATH,
+        parser=lambda data: _parse_episodes(data, name, series_id))
+    request.start()
+    return request
+
+
+def get_media_async(name, params, /, username=None, password=None,
+        retries=DEFAULT_RETRIES, use_cache=True, needs_streams=True):
+    """Start querying the streams of an item.
+
+    Returns an `ApiRequest`, failed attempts are retried after an
+    exponentially growing delay without blocking the event loop.
+    Without `needs_streams`, cached metadata of which the streams
+    expired is used if the api is not available.
+    """
+    request = ApiRequest(name, params, username, password, retries, use_cache,
+        needs_streams=needs_streams)
+    request.start()
+    return request
+
+
+def get_retry_delay(attempt, /):
+    """Milliseconds to wait before retrying after `attempt` attempts.
+
+    The delay is jittered so that failed items do not retry in lockstep.
+    """
+    delay = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** max(0, attempt - 1))
+    return int(random.uniform(delay / 2, delay))
+
+
+class ApiRequest:
+    """The pending result of an api call, by default to `/v1/streams`.
+
+    Callbacks added with `add_done_callback` are called with the request
+    once either `result` or `error` is set. The response is turned
+    into the `result` by `parser`.
+    """
+    def __init__(self, name, params, /, username=None, password=None,
+            retries=DEFAULT_RETRIES, use_cache=True, path=STREAMS_PATH,
+            parser=None, needs_streams=True):
+        self.channel_id = name
+        self.retries = max(1, retries)
+        self.use_cache = use_cache
+        self.needs_streams = needs_streams
+        self.path = path
+        self.parser = parser or _parse_stream_response
+        self.cache_params = dict(params)
+
+        self.params = dict(params)
+        self.params["channel_id"] = name
+        if name == "adn":
+            self.params["country"] = "fr"
+
+        self.use_login = bool(username and password)
+        if self.use_login:
+            self.params["email"] = username
+            self.params["password"] = password
+        self.use_bypass = not self.use_login
+
+        self.result: Any = None
+        self.error: ApiError | None = None
+        self.attempts = 0
+        self.is_done = False
+        self.is_cancelled = False
+
+        self._callbacks = []
+        self._future = None
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self._attempt)
+
+    @classmethod
+    def from_error(cls, name, error, /):
+        request = cls(name, {}, use_cache=False)
+        request.error = error
+        request.is_done = True
+        return request
+
+    @property
+    def circuit_breaker(self, /):
+        return get_circuit_breaker(self.channel_id)
+
+    def add_done_callback(self, callback, /):
+        if self.is_done:
+            callback(self)
+            return
+        self._callbacks.append(callback)
+
+    def cancel(self, /):
+        if self.is_done:
+            return
+        self.is_cancelled = True
+        self._timer.stop()
+        if self._future is not None:
+            self._future.cancel()
+
+    def start(self, /):
+        if self.use_cache:
+            cached_data = get_api_cache().get(self.channel_id, self.cache_params)
+            if cached_data is not None:
+                _logger.info("Using cached api response for %s %s",
+                    self.channel_id, self.cache_params)
+                self._finish_from_data(cached_data)
+                return
+
+        self._attempt()
+
+    def _attempt(self, /):
+        if self.is_cancelled:
+            return
+
+        breaker = self.circuit_breaker
+        if not breaker.allow_request():
+            self._fail(ApiCircuitOpenError(
+                f"The {self.channel_id} api is overloaded, try again later",
+                breaker.retry_after()))
+            return
+
+        self.attempts += 1
+        params = dict(self.params)
+        if self.use_bypass:
+            params["bypass"] = "true"
+        self._future = call_api_async(self.path, params=params)
+        self._future.add_done_callback(self._on_response)
+
+    def _on_response(self, future, /):
+        self._future = None
+        if self.is_cancelled:
+            return
+
+        breaker = self.circuit_breaker
+        data = _decode_api_data(future.data)
         if "error" in data:
-            return_val = _handle_error(data["code"], data["message"],
-                use_login, name)
-            if return_val is not None:
-                use_bypass = return_val
+            try:
+                use_bypass = _handle_error(data["code"], data["message"],
+                    self.use_login, self.channel_id)
+            except ApiError as error:
+                # The api answered properly, it is the item that failed
+                breaker.record_success()
+                self._fail(error)
+                return
+
+            if use_bypass is None:
+                breaker.record_failure()
+                self._retry(ApiError(data["message"]))
+                return
+
+            self.use_bypass = use_bypass
+            self._retry(ApiError(data["message"]), delay=0)
+            return
+
+        # TEMP: this checks if we have internet
+        if not future.data or (future.status or 0) >= 500 or future.status == 429:
+            breaker.record_failure()
+            self._retry(ApiUnavailableError("Internet or API not available"))
+            return
+
+        breaker.record_success()
+        try:
+            result = self.parser(data)
+        except ApiError as error:
+            self._fail(error)
+            return
+
+        if self.use_cache:
+            get_api_cache().put(self.channel_id, self.cache_params, data)
+        self._finish(result)
+
+    def _retry(self, error, /, delay=None):
+        if self.attempts >= self.retries:
+            _logger.error("Api call failed after too many retries")
+            self._fail(error)
+            return
+
+        if delay is None:
+            delay = get_retry_delay(self.attempts)
+        _logger.info("Retrying api call in %s ms (attempt %s of %s)",
+            delay, self.attempts + 1, self.retries)
+        self._timer.start(delay)
+
+    def _fail(self, error, /):
+        # An open circuit is retried later, the cache would hide that
+        if (isinstance(error, ApiUnavailableError)
+                and not isinstance(error, ApiCircuitOpenError)
+                and self.use_cache):
+            cached_data = get_api_cache().get(self.channel_id,
+                self.cache_params, allow_expired=True)
+            if cached_data is not None and (cached_data.get("streams")
+                    or not self.needs_streams):
+                _logger.warning("Api not available, serving metadata from cache")
+                self._finish_from_data(cached_data)
+                return
+
+        self.error = error
+        self._done()
+
+    def _finish_from_data(self, data, /):
+        try:
+            self._finish(self.parser(data))
+        except ApiError as error:
+            self.error = error
+            self._done()
+
+    def _finish(self, result, /):
+        self.result = result
+        self._done()
+
+    def _done(self, /):
+        self.is_done = True
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                _logger.exception("Error in api request callback")
+
+
+def _parse_stream_response(data, /):
+    try:
+        return _stream_response_from_response_dict(data)
+    except Exception as error:
+        message = f"Unknown error while parsing response: {error}"
+        raise ApiError(message)
+
+
+def _parse_seasons(data, /):
+    seasons = []
+    for season_dict in _get_items(data):
+        try:
+            season = SeasonEntry(id=str(season_dict["id"]),
+                number=season_dict.get("season_number", 0),
+                title=season_dict.get("title", ""))
+        except KeyError as error:
+            _logger.error("Error parsing season: Key %s does not exist in json", error)
             continue
+        seasons.append(season)
+    return seasons
+
+
+def _parse_episodes(data, channel_id, series_id, /):
+    url_format = EPISODE_URL_FORMATS[channel_id]
+    params_format = EPISODE_URL_PARAMS[channel_id]
+
+    episodes = []
+    for episode_dict in _get_items(data):
         try:
-            return _stream_response_from_response_dict(data)
-        except Exception as error:
-            message = f"Unknown error while parsing response: {error}"
-            raise ApiError(message)
+            episode_id = str(episode_dict["id"])
+            fields = {"id": episode_id, "series_id": series_id,
+                "slug": str(episode_dict.get("slug", episode_id))}
+        except KeyError as error:
+            _logger.error("Error parsing episode: Key %s does not exist in json", error)
+            continue
+
+        url = url_format.format(**fields)
+        # A url that parses to other ids would download another item
+        params = {
+            key: value.format(**fields)
+            for key, value in params_format.items()
+        }
+        if parse_url(url) != (channel_id, params):
+            _logger.error("Episode %s has no supported url: %s", episode_id, url)
+            continue
+
+        episodes.append(EpisodeEntry(id=episode_id,
+            number=episode_dict.get("episode_number", 0),
+            title=episode_dict.get("title", ""), url=url))
+    return episodes
+
 
-    _logger.error("Api call failed after too many retries")
-    message = data.get("message") or "Unknown error"
-    raise ApiError(message)
+def _get_items(data, /):
+    items = data.get("items")
+    if not isinstance(items, list):
+        raise ApiError("Key 'items' missing in response json")
+    return [item for item in items if isinstance(item, dict)]
 
 
-def call_api(path, /, params=None):
+def call_api_async(path, /, params=None):
     _logger.info("Calling api endpoing %s with %s", path, params)
     url = BASE_URL + path
-    data = web_manager.get(url, params=params)
+    return get_web_manager().get_async(url, params=params)
 
-    # TEMP: this checks if we have internet
+
+def _decode_api_data(data, /):
     if not data:
-        raise ApiError("Internet or API not available")
+        return {}
 
     json_data = {}
     try:
@@ -102,6 +420,9 @@ def call_api(path, /, params=None):
     except ValueError as exception:
         _logger.error("Error decoding returned json: %s", exception)
 
+    if not isinstance(json_data, dict):
+        return {}
+
     if "error" in json_data:
         error_code = json_data.get("code", "unknown")
         error_message = json_data.get("message", "Unknown Error")
@@ -113,6 +434,12 @@ def call_api(path, /, params=None):
 
 
 def _handle_error(code, message, use_login, channel_id):
+    """Decide how to continue after the api returned an error.
+
+    Raises `ApiError` if retrying is pointless, returns `False` if the
+    call should be retried right away without the bypass and `None`
+    if it should be retried after a delay.
+    """
     _logger.error("Api returned error code %s: %s", code, message)
 
     match code:
@@ -127,18 +454,12 @@ def _handle_error(code, message, use_login, channel_id):
             # the api backend user runs out of premium
             raise ApiError("Unexpected bypass error, try again later")
 
-        case "bad_player_connection":
-            wait(2000)
-
-        case "bad_initialize":
-            wait(2000)
-
         case "unknown_id":
             raise ApiError("The provided id of the url is not valid")
 
-        case _:
-            wait(1000)
-    return
+    # bad_player_connection, bad_initialize and everything unknown
+    # are usually temporary
+    return None
 
 
 def _stream_response_from_response_dict(data, /):
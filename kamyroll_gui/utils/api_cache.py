@@ -0,0 +1,110 @@
+import re
+import json
+import time
+import hashlib
+import logging
+
+from functools import cache
+from pathlib import Path
+
+
+
+# Metadata, images and subtitles rarely change
+METADATA_TTL = 7 * 24 * 60 * 60
+# Used if no stream url tells us when its signature expires
+STREAM_TTL = 30 * 60
+# Do not hand out stream urls that are about to expire
+EXPIRY_MARGIN = 5 * 60
+
+EXPIRES_REGEX = re.compile(r"[?&~](?:Expires|expires|exp)=(?P<timestamp>\d{9,})")
+
+ENTRY_KEYS = {"stored", "streams_expire", "data"}
+
+
+_logger = logging.getLogger(__name__)
+
+
+class ApiCache:
+    """Stores raw `/v1/streams` responses on disk.
+
+    The streams of a response are only served until their signed urls
+    expire, while the rest of the response is kept for `METADATA_TTL`.
+    """
+    def __init__(self, path, /):
+        self.path = Path(path)
+
+    def get(self, channel_id, params, /, allow_expired=False):
+        """Get a cached response.
+
+        If `allow_expired` is set, responses with expired streams are
+        returned with the streams removed.
+        """
+        entry = self._load(channel_id, params)
+        if entry is None:
+            return None
+
+        now = time.time()
+        if now < entry["streams_expire"]:
+            return entry["data"]
+
+        if allow_expired and now < entry["stored"] + METADATA_TTL:
+            _logger.info("Using cached metadata for %s %s", channel_id, params)
+            return dict(entry["data"], streams=[])
+
+        return None
+
+    def put(self, channel_id, params, data, /):
+        now = time.time()
+        entry = {
+            "stored": now,
+            "streams_expire": self._get_streams_expiry(data, now),
+            "data": data,
+        }
+
+        path = self._get_path(channel_id, params)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with path.open("w") as file:
+                json.dump(entry, file)
+        except OSError as error:
+            _logger.warning("Could not write api cache file %s: %s", path, error)
+
+    def _load(self, channel_id, params, /):
+        path = self._get_path(channel_id, params)
+        if not path.exists():
+            return None
+
+        try:
+            with path.open("rb") as file:
+                entry = json.load(file)
+        except (OSError, ValueError) as error:
+            _logger.warning("Error reading api cache file %s: %s", path, error)
+            return None
+
+        if not isinstance(entry, dict) or not ENTRY_KEYS <= entry.keys():
+            _logger.warning("Invalid api cache file %s", path)
+            return None
+
+        return entry
+
+    def _get_path(self, channel_id, params, /):
+        key = json.dumps([channel_id, params], sort_keys=True)
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return self.path.joinpath(f"{digest}.json")
+
+    @staticmethod
+    def _get_streams_expiry(data, now, /):
+        expiry = now + STREAM_TTL
+
+        for stream in data.get("streams", []):
+            match = EXPIRES_REGEX.search(stream.get("url", ""))
+            if match:
+                timestamp = int(match["timestamp"]) - EXPIRY_MARGIN
+                expiry = min(expiry, timestamp)
+
+        return expiry
+
+
+@cache
+def get_api_cache():
+    return ApiCache("cache/api")
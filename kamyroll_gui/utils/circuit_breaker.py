@@ -0,0 +1,123 @@
+import time
+import logging
+
+from collections import deque
+from enum import Enum
+from functools import cache
+
+
+
+# Outcomes of the latest requests that decide if the circuit opens
+WINDOW_SIZE = 20
+MIN_REQUESTS = 5
+FAILURE_RATE = 0.5
+# Seconds the circuit stays open, doubled every time a probe fails
+COOLDOWN = 15
+MAX_COOLDOWN = 5 * 60
+# A probe that never reported back does not block the circuit forever
+PROBE_TIMEOUT = 60
+
+
+_logger = logging.getLogger(__name__)
+
+
+class CircuitState(Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __str__(self, /):
+        return self.value
+
+
+class CircuitBreaker:
+    """Stops requests to a service once too many of them failed.
+
+    While the circuit is open, `allow_request` refuses all requests.
+    After the cooldown a single probe is allowed, its outcome either
+    closes the circuit again or keeps it open for twice as long.
+    """
+    def __init__(self, name, /, window=WINDOW_SIZE,
+            min_requests=MIN_REQUESTS, failure_rate=FAILURE_RATE,
+            cooldown=COOLDOWN, max_cooldown=MAX_COOLDOWN):
+        self.name = name
+        self.min_requests = min_requests
+        self.failure_rate = failure_rate
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self.outcomes = deque(maxlen=window)
+        self.cooldown = cooldown
+        self.opened_until = 0.0
+        self.probe_started = None
+        self._state = CircuitState.CLOSED
+
+    @property
+    def state(self, /):
+        if (self._state is CircuitState.OPEN
+                and time.monotonic() >= self.opened_until):
+            self._set_state(CircuitState.HALF_OPEN)
+        return self._state
+
+    def retry_after(self, /):
+        """Seconds until the next request would be allowed."""
+        state = self.state
+        now = time.monotonic()
+        if state is CircuitState.OPEN:
+            return self.opened_until - now
+        if state is CircuitState.HALF_OPEN and self.probe_started is not None:
+            return max(0.0, self.probe_started + PROBE_TIMEOUT - now)
+        return 0.0
+
+    def allow_request(self, /):
+        state = self.state
+        if state is CircuitState.CLOSED:
+            return True
+        if state is CircuitState.OPEN or self.retry_after():
+            return False
+
+        self.probe_started = time.monotonic()
+        _logger.info("Probing %s with a single request", self.name)
+        return True
+
+    def record_success(self, /):
+        if self._state is not CircuitState.CLOSED:
+            self.outcomes.clear()
+            self.cooldown = self.base_cooldown
+            self.probe_started = None
+            self._set_state(CircuitState.CLOSED)
+        self.outcomes.append(True)
+
+    def record_failure(self, /):
+        if self._state is CircuitState.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+            return
+        if self._state is CircuitState.OPEN:
+            return
+
+        self.outcomes.append(False)
+        if len(self.outcomes) < self.min_requests:
+            return
+        failures = self.outcomes.count(False)
+        if failures / len(self.outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self, /):
+        self.outcomes.clear()
+        self.probe_started = None
+        self.opened_until = time.monotonic() + self.cooldown
+        _logger.warning("Too many failed requests to %s, pausing for %s seconds",
+            self.name, self.cooldown)
+        self._set_state(CircuitState.OPEN)
+
+    def _set_state(self, state, /):
+        if state is not self._state:
+            _logger.info("Circuit of %s is now %s", self.name, state)
+        self._state = state
+
+
+@cache
+def get_circuit_breaker(name, /):
+    """The circuit breaker shared by all requests to `name`."""
+    return CircuitBreaker(name)
@@ -0,0 +1,132 @@
+import os
+import hashlib
+import logging
+
+from pathlib import Path
+
+from .web_manager import get_web_manager
+
+
+
+_logger = logging.getLogger(__name__)
+
+
+class FileCache:
+    """Stores downloaded files under the hash of their key.
+
+    The key defaults to the url. Once the files take up more than
+    `max_size` bytes, the least recently used ones are removed.
+    Concurrent requests for the same key share one download.
+    """
+    suffix = ""
+
+    def __init__(self, path, max_size, /):
+        self.path = Path(path)
+        self.max_size = max_size
+        self._in_flight = {}
+
+    def get(self, url, /, key=None):
+        """The path of the cached file or `None`."""
+        path = self._get_path(url, key)
+        try:
+            # The modification time tracks the last use
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def prefetch(self, url, /, key=None):
+        """Start downloading the file in the background."""
+        self.fetch(url, None, key=key)
+
+    def fetch(self, url, callback, /, key=None):
+        """Download the file unless it is cached.
+
+        `callback` is called with the path, or `None` if the download
+        failed or the file was invalid. Cached files are passed right away.
+        """
+        path = self.get(url, key)
+        if path is not None:
+            if callback is not None:
+                callback(path)
+            return
+
+        future = self._in_flight.get(key or url)
+        if future is None:
+            _logger.debug("Downloading %s into the cache", url)
+            future = self._start(url, key)
+        if callback is not None:
+            future.add_done_callback(
+                lambda future: callback(self.get(url, key)))
+
+    def get_or_download(self, url, /, key=None):
+        """Get the path of the file, downloading it if needed.
+
+        Blocks until the download finished, returns `None` if it failed.
+        """
+        path = self.get(url, key)
+        if path is not None:
+            return path
+
+        future = self._in_flight.get(key or url) or self._start(url, key)
+        future.result()
+        return self.get(url, key)
+
+    def is_valid(self, data, /):
+        return bool(data)
+
+    def _start(self, url, key, /):
+        future = get_web_manager().get_async(url)
+        self._in_flight[key or url] = future
+        future.add_done_callback(
+            lambda future: self._on_downloaded(url, key, future))
+        return future
+
+    def _on_downloaded(self, url, key, future, /):
+        self._in_flight.pop(key or url, None)
+        if future.error is not None:
+            _logger.warning("Could not download %s: %s", url, future.error)
+            return
+        if not self.is_valid(future.data):
+            _logger.warning("Downloaded invalid file from %s", url)
+            return
+
+        path = self._get_path(url, key)
+        partial_path = path.with_name(path.name + ".part")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial_path.write_bytes(future.data)
+            partial_path.replace(path)
+        except OSError as error:
+            _logger.warning("Could not write cached file %s: %s", path, error)
+            return
+
+        self._evict()
+
+    def _evict(self, /):
+        entries = []
+        try:
+            with os.scandir(self.path) as iterator:
+                for entry in iterator:
+                    if entry.is_file() and not entry.name.endswith(".part"):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError as error:
+            _logger.warning("Could not list cache %s: %s", self.path, error)
+            return
+
+        total_size = sum(size for _, size, _ in entries)
+        # Oldest first
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_size -= size
+            _logger.debug("Evicted cached file %s", path)
+
+    def _get_path(self, url, key, /):
+        digest = hashlib.sha256((key or url).encode()).hexdigest()
+        return self.path.joinpath(digest + self.suffix)
@@ -0,0 +1,260 @@
+import json
+import time
+import shutil
+import logging
+
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from PySide6.QtCore import QTimer
+
+from . import m3u8
+from .web_manager import get_web_manager
+
+
+
+MANIFEST_NAME = "manifest.json"
+COMPLETED_NAME = "completed.log"
+
+RETRY_DELAY = 1000
+# Milliseconds without any transferred data until a segment is retried
+SEGMENT_TIMEOUT = 20000
+
+
+@dataclass
+class _Download:
+    url: str
+    path: Path
+    attempts: int = 0
+
+
+class HlsDownloader:
+    """Downloads the selected programs of a HLS stream into a directory.
+
+    Segments are fetched over up to `connections` parallel requests.
+    Once everything is downloaded `success_callback` is called with the
+    path of a local master playlist and the program ids inside of it.
+
+    Finished segments are recorded in the spool directory, so starting
+    the same selection again only downloads the missing segments.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, /, spool_path, success_callback, fail_callback,
+            progress_callback=None, connections=4, retries=3):
+        self.spool_path = Path(spool_path)
+        self.success_callback = success_callback
+        self.fail_callback = fail_callback
+        self.progress_callback = progress_callback
+        self.connections = max(1, connections)
+        self.retries = max(1, retries)
+
+        self.is_stopped = True
+        self.master_data = ""
+        self.program_ids = []
+        self.pending_playlists = 0
+        self.queue: deque[_Download] = deque()
+        self.active = {}
+        self.total_count = 0
+        self.done_count = 0
+        self.downloaded_bytes = 0
+        self.retry_count = 0
+        self.completed_names = set()
+        self.start_time = None
+
+    @property
+    def throughput(self, /):
+        """The average download speed in bits per second."""
+        if self.start_time is None:
+            return None
+        elapsed = time.monotonic() - self.start_time
+        if elapsed <= 0 or not self.downloaded_bytes:
+            return None
+        return self.downloaded_bytes * 8 / elapsed
+
+    def start(self, master_url, program_ids, /):
+        self.is_stopped = False
+        self.start_time = time.monotonic()
+        try:
+            self.spool_path.mkdir(parents=True, exist_ok=True)
+        except OSError as error:
+            self._fail(f"Could not create spool directory: {error}")
+            return
+        self._logger.info("Downloading segments of %s into %s",
+            master_url, self.spool_path)
+
+        future = get_web_manager().get_async(master_url, cached=True)
+        future.add_done_callback(
+            lambda future: self._on_master(master_url, program_ids, future))
+
+    def stop(self, /):
+        self.is_stopped = True
+        self.queue.clear()
+        for future in list(self.active.values()):
+            future.cancel()
+        self.active.clear()
+
+    def _on_master(self, url, program_ids, future, /):
+        if self.is_stopped:
+            return
+        if future.error is not None or not future.data:
+            self._fail(f"Could not download master playlist: {future.error}")
+            return
+
+        self.master_data, playlists, self.program_ids = m3u8.localize_master(
+            future.data.decode(), url, program_ids)
+        try:
+            self._load_checkpoint(program_ids)
+        except OSError as error:
+            self._fail(f"Could not write checkpoint: {error}")
+            return
+
+        self.pending_playlists = len(playlists)
+        for playlist_url, local_name in playlists:
+            future = get_web_manager().get_async(playlist_url)
+            future.add_done_callback(
+                lambda future, url=playlist_url, name=local_name:
+                    self._on_media_playlist(url, name, future))
+
+        if not playlists:
+            self._fail("No media playlists selected")
+
+    def _on_media_playlist(self, url, local_name, future, /):
+        if self.is_stopped:
+            return
+        if future.error is not None or not future.data:
+            self._fail(f"Could not download media playlist: {future.error}")
+            return
+
+        prefix = local_name.removesuffix(".m3u8")
+        playlist, downloads = m3u8.localize_media_playlist(
+            future.data.decode(), url, prefix)
+        try:
+            self.spool_path.joinpath(local_name).write_text(playlist)
+        except OSError as error:
+            self._fail(f"Could not write media playlist: {error}")
+            return
+
+        for segment_url, segment_name in downloads:
+            path = self.spool_path.joinpath(segment_name)
+            if segment_name in self.completed_names and path.exists():
+                self.done_count += 1
+                continue
+            self.queue.append(_Download(url=segment_url, path=path))
+        self.total_count += len(downloads)
+
+        self.pending_playlists -= 1
+        if not self.pending_playlists:
+            self._report_progress()
+            self._fill_connections()
+
+    def _fill_connections(self, /):
+        if self.is_stopped:
+            return
+
+        while self.queue and len(self.active) < self.connections:
+            download = self.queue.popleft()
+            download.attempts += 1
+            future = get_web_manager().get_async(download.url,
+                timeout=SEGMENT_TIMEOUT)
+            self.active[download.path] = future
+            future.add_done_callback(
+                lambda future, download=download:
+                    self._on_segment(download, future))
+
+        if not self.active and not self.queue:
+            self._finish()
+
+    def _on_segment(self, download, future, /):
+        if self.is_stopped:
+            return
+        self.active.pop(download.path, None)
+
+        if future.error is not None:
+            if download.attempts >= self.retries:
+                self._fail(f"Could not download segment {download.url}: {future.error}")
+                return
+
+            self._logger.warning("Retrying segment %s (%s)",
+                download.url, future.error)
+            self.retry_count += 1
+            QTimer.singleShot(RETRY_DELAY * download.attempts,
+                lambda: self._retry(download))
+            return
+
+        try:
+            # Only complete segments may ever be recorded in the checkpoint
+            partial_path = download.path.with_name(download.path.name + ".part")
+            partial_path.write_bytes(future.data)
+            partial_path.replace(download.path)
+            with self.spool_path.joinpath(COMPLETED_NAME).open("a") as file:
+                file.write(download.path.name + "\n")
+        except OSError as error:
+            self._fail(f"Could not write segment: {error}")
+            return
+
+        self.done_count += 1
+        self.downloaded_bytes += len(future.data)
+        self._report_progress()
+        self._fill_connections()
+
+    def _retry(self, download, /):
+        if self.is_stopped:
+            return
+        self.queue.appendleft(download)
+        self._fill_connections()
+
+    def _load_checkpoint(self, program_ids, /):
+        manifest = {
+            "program_ids": program_ids,
+            "master": self.master_data,
+        }
+        manifest_path = self.spool_path.joinpath(MANIFEST_NAME)
+        completed_path = self.spool_path.joinpath(COMPLETED_NAME)
+
+        try:
+            with manifest_path.open("rb") as file:
+                previous_manifest = json.load(file)
+        except (OSError, ValueError):
+            previous_manifest = None
+
+        if previous_manifest == manifest:
+            try:
+                self.completed_names = set(completed_path.read_text().split())
+            except OSError:
+                self.completed_names = set()
+            self._logger.info("Resuming with %s finished segments",
+                len(self.completed_names))
+            return
+
+        if previous_manifest is not None:
+            self._logger.info("Selection changed, discarding old segments")
+        shutil.rmtree(self.spool_path, ignore_errors=True)
+        self.spool_path.mkdir(parents=True, exist_ok=True)
+        with manifest_path.open("w") as file:
+            json.dump(manifest, file)
+
+    def _report_progress(self, /):
+        if self.progress_callback is not None:
+            self.progress_callback(self.done_count, self.total_count)
+
+    def _finish(self, /):
+        if self.is_stopped:
+            return
+
+        master_path = self.spool_path.joinpath("master.m3u8")
+        try:
+            master_path.write_text(self.master_data)
+        except OSError as error:
+            self._fail(f"Could not write master playlist: {error}")
+            return
+        self.is_stopped = True
+        self._logger.info("Downloaded %s segments (%s bytes)",
+            self.done_count, self.downloaded_bytes)
+        self.success_callback(master_path, self.program_ids)
+
+    def _fail(self, message, /):
+        self._logger.error("Segment download failed: %s", message)
+        self.stop()
+        self.fail_callback(message)
@@ -0,0 +1,175 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+
+
+MAX_AGE_REGEX = re.compile(r"max-age=(?P<seconds>\d+)")
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    url: str
+    stored: float
+    etag: str | None = None
+    last_modified: str | None = None
+    max_age: int | None = None
+
+    def is_fresh(self, /):
+        if self.max_age is None:
+            return False
+        return time.time() < self.stored + self.max_age
+
+    def get_validation_headers(self, /):
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    @classmethod
+    def from_headers(cls, url, headers, /, default_max_age=None):
+        max_age = default_max_age
+        cache_control = headers.get("cache-control", "")
+        match = MAX_AGE_REGEX.search(cache_control)
+        if "no-cache" in cache_control:
+            max_age = None
+        elif match:
+            max_age = int(match["seconds"])
+
+        return cls(url=url, stored=time.time(), etag=headers.get("etag"),
+            last_modified=headers.get("last-modified"), max_age=max_age)
+
+
+class HttpCache:
+    """A LRU memory cache of http responses backed by a LRU disk cache.
+
+    Entries are revalidated using `ETag` and `Last-Modified`
+    unless `Cache-Control` tells us they are still fresh. Responses
+    without `Cache-Control` are considered fresh for `default_max_age`.
+    """
+    def __init__(self, path, /, max_entries=64, max_disk_entries=1024,
+            default_max_age=300):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.default_max_age = default_max_age
+        self._entries: OrderedDict[str, tuple[CacheEntry, bytes]] = OrderedDict()
+        # Upper bound of the entries on disk, counted on the first store
+        self._disk_entries: int | None = None
+
+    def get(self, url, /):
+        if url in self._entries:
+            self._entries.move_to_end(url)
+            self._touch(url)
+            return self._entries[url]
+
+        result = self._load(url)
+        if result is not None:
+            self._remember(url, result)
+            self._touch(url)
+        return result
+
+    def create_entry(self, url, headers, /):
+        if "no-store" in headers.get("cache-control", ""):
+            return None
+        return CacheEntry.from_headers(url, headers, self.default_max_age)
+
+    def put(self, entry, data, /):
+        if entry.etag is None and entry.last_modified is None \
+                and entry.max_age is None:
+            # We could never use it again
+            return
+
+        self._remember(entry.url, (entry, data))
+        self._store(entry, data)
+
+    def refresh(self, entry, data, headers, /):
+        """Update an entry after the server answered `304 Not Modified`."""
+        updated_entry = CacheEntry.from_headers(entry.url, headers,
+            self.default_max_age)
+        entry.stored = updated_entry.stored
+        entry.max_age = updated_entry.max_age
+        entry.etag = updated_entry.etag or entry.etag
+        entry.last_modified = updated_entry.last_modified or entry.last_modified
+
+        self._remember(entry.url, (entry, data))
+        self._store(entry, data)
+
+    def _remember(self, url, result, /):
+        self._entries[url] = result
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _get_paths(self, url, /):
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return (self.path.joinpath(f"{digest}.json"),
+            self.path.joinpath(f"{digest}.bin"))
+
+    def _load(self, url, /):
+        meta_path, data_path = self._get_paths(url)
+        if not meta_path.exists() or not data_path.exists():
+            return None
+
+        try:
+            with meta_path.open("rb") as file:
+                entry = CacheEntry(**json.load(file))
+            data = data_path.read_bytes()
+        except (OSError, ValueError, TypeError) as error:
+            _logger.warning("Invalid http cache entry for %s: %s", url, error)
+            return None
+
+        if entry.url != url:
+            return None
+        return entry, data
+
+    def _touch(self, url, /):
+        """Mark the disk entry as used, eviction goes by modification time."""
+        meta_path, _ = self._get_paths(url)
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+    def _store(self, entry, data, /):
+        meta_path, data_path = self._get_paths(entry.url)
+        if self._disk_entries is None:
+            self._disk_entries = sum(1 for _ in self.path.glob("*.json"))
+        is_new = not meta_path.exists()
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            data_path.write_bytes(data)
+            with meta_path.open("w") as file:
+                json.dump(asdict(entry), file)
+        except OSError as error:
+            _logger.warning("Could not write http cache entry: %s", error)
+            return
+
+        if is_new:
+            self._disk_entries += 1
+        if self._disk_entries > self.max_disk_entries:
+            self._evict_disk_entries()
+
+    def _evict_disk_entries(self, /):
+        meta_paths = list(self.path.glob("*.json"))
+        overflow = len(meta_paths) - self.max_disk_entries
+        self._disk_entries = min(len(meta_paths), self.max_disk_entries)
+        if overflow <= 0:
+            return
+
+        meta_paths.sort(key=lambda path: path.stat().st_mtime)
+        for meta_path in meta_paths[:overflow]:
+            meta_path.unlink(missing_ok=True)
+            meta_path.with_suffix(".bin").unlink(missing_ok=True)
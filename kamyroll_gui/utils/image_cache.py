@@ -0,0 +1,90 @@
+import time
+import shutil
+import logging
+import tempfile
+
+from functools import cache
+from pathlib import Path
+
+from .file_cache import FileCache
+
+
+
+DEFAULT_MAX_SIZE = 200 * 1024 * 1024
+# Prefix of the temporary directories of single items
+TEMP_PREFIX = "kamyroll_item_"
+# Older versions wrote posters to temporary files and never removed them
+LEGACY_TEMP_PATTERN = "kamyroll_*.jpeg"
+# Leftovers of crashed runs are removed after this many seconds
+STALE_TEMP_AGE = 24 * 60 * 60
+
+
+_logger = logging.getLogger(__name__)
+
+
+class ImageCache(FileCache):
+    suffix = ".jpeg"
+
+    def __init__(self, path, /, max_size=DEFAULT_MAX_SIZE):
+        super().__init__(path, max_size)
+
+
+class PosterFetch:
+    """Downloads the poster of an item into the `ImageCache`.
+
+    `callback` is called with the cached path, or `None` if there
+    is no poster or it could not be downloaded.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, url, callback, /):
+        self.url = url
+        self.callback = callback
+        self.is_stopped = True
+
+    def start(self, /):
+        self.is_stopped = False
+        if self.url is None:
+            self._on_fetched(None)
+            return
+
+        get_image_cache().fetch(self.url, self._on_fetched)
+
+    def stop(self, /):
+        self.is_stopped = True
+
+    def _on_fetched(self, path, /):
+        if self.is_stopped:
+            return
+
+        self.is_stopped = True
+        if path is None and self.url is not None:
+            self._logger.warning("Leaving out image %s", self.url)
+        self.callback(path)
+
+
+def remove_stale_temp_files(max_age=STALE_TEMP_AGE):
+    """Remove the temporary files that earlier runs did not clean up."""
+    directory = Path(tempfile.gettempdir())
+    threshold = time.time() - max_age
+    paths = [
+        *directory.glob(f"{TEMP_PREFIX}*"),
+        *directory.glob(LEGACY_TEMP_PATTERN),
+    ]
+    for path in paths:
+        try:
+            if path.stat().st_mtime > threshold:
+                continue
+            if path.is_dir():
+                shutil.rmtree(path)
+            else:
+                path.unlink()
+        except OSError as error:
+            _logger.debug("Could not remove stale temp file %s: %s", path, error)
+            continue
+        _logger.info("Removed stale temp file %s", path)
+
+
+@cache
+def get_image_cache():
+    return ImageCache("cache/images")
@@ -0,0 +1,228 @@
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+
+from dataclasses import dataclass, field
+from functools import cache
+from pathlib import Path
+
+
+
+SCHEMA_VERSION = 1
+# A subtitle download shares its subtitle files with the full download,
+# so an output path can belong to more than one item
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY,
+    channel TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    audio TEXT NOT NULL,
+    hardsub TEXT NOT NULL,
+    subtitles TEXT NOT NULL,
+    height INTEGER NOT NULL,
+    -- 0 if only the subtitles were downloaded
+    media INTEGER NOT NULL,
+    root TEXT NOT NULL,
+    title TEXT NOT NULL,
+    series TEXT,
+    season INTEGER,
+    episode INTEGER,
+    size INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    checksum TEXT NOT NULL,
+    downloaded REAL NOT NULL,
+    UNIQUE (channel, item_id, audio, hardsub, subtitles, height, media, root)
+);
+CREATE INDEX IF NOT EXISTS items_by_item ON items (channel, item_id);
+
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT NOT NULL,
+    item INTEGER NOT NULL REFERENCES items (id) ON DELETE CASCADE,
+    PRIMARY KEY (path, item)
+);
+CREATE INDEX IF NOT EXISTS outputs_by_item ON outputs (item);
+"""
+ITEM_COLUMNS = ("channel, item_id, audio, hardsub, subtitles, height, media, "
+    "root, title, series, season, episode, size, duration, checksum, downloaded")
+
+# Bytes read from the start and the end of every file for the checksum
+CHECKSUM_SAMPLE_SIZE = 1024 * 1024
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LibraryEntry:
+    channel: str
+    item_id: str
+    audio: str
+    hardsub: str
+    #: Locales of the subtitles, sorted
+    subtitles: list[str]
+    height: int
+    #: The `download_path` the outputs were written into
+    root: str
+    output_paths: list[Path]
+    #: Total bytes of all outputs
+    size: int
+    #: Seconds of media
+    duration: float
+    checksum: str
+    #: `False` if only the subtitles were downloaded
+    media: bool = True
+    title: str = ""
+    series: str | None = None
+    season: int | None = None
+    episode: int | None = None
+    downloaded: float = field(default_factory=time.time)
+
+    def has_selection(self, audio, hardsub, subtitles, height, /):
+        return (self.audio == audio and self.hardsub == hardsub
+            and self.subtitles == sorted(subtitles)
+            and (not height or self.height == height))
+
+
+class LibraryIndex:
+    """A sqlite index of all items that were downloaded.
+
+    Every lookup uses an index, so even large libraries spread over
+    many download directories never have to be walked.
+    """
+    def __init__(self, path, /):
+        self.path = Path(path)
+        self._connection = None
+
+    @property
+    def connection(self, /):
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA foreign_keys = ON")
+            version, = connection.execute("PRAGMA user_version").fetchone()
+            if version < SCHEMA_VERSION:
+                _logger.info("Creating library index in %s", self.path)
+                with connection:
+                    connection.executescript(SCHEMA)
+                    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._connection = connection
+        return self._connection
+
+    def close(self, /):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def record(self, entry, /):
+        """Add `entry`, replacing a previous download of the same selection."""
+        values = [entry.channel, entry.item_id, entry.audio, entry.hardsub,
+            json.dumps(sorted(entry.subtitles)), entry.height,
+            int(entry.media), entry.root, entry.title, entry.series, entry.season, entry.episode,
+            entry.size, entry.duration, entry.checksum, entry.downloaded]
+        paths = [str(Path(path).resolve()) for path in entry.output_paths]
+
+        with self.connection as connection:
+            connection.execute(f"""
+                INSERT INTO items ({ITEM_COLUMNS})
+                VALUES ({", ".join("?" * len(values))})
+                ON CONFLICT (channel, item_id, audio, hardsub, subtitles, height,
+                    media, root)
+                DO UPDATE SET title = excluded.title, series = excluded.series,
+                    season = excluded.season, episode = excluded.episode,
+                    size = excluded.size, duration = excluded.duration,
+                    checksum = excluded.checksum, downloaded = excluded.downloaded
+            """, values)
+            row_id, = connection.execute("""
+                SELECT id FROM items WHERE channel = ? AND item_id = ?
+                    AND audio = ? AND hardsub = ? AND subtitles = ?
+                    AND height = ? AND media = ? AND root = ?
+            """, values[:8]).fetchone()
+            connection.execute("DELETE FROM outputs WHERE item = ?", [row_id])
+            # The files were replaced, unless only the subtitles were written
+            connection.executemany("""
+                DELETE FROM outputs WHERE path = ?
+                    AND item IN (SELECT id FROM items WHERE media = ?)
+            """, [(path, values[6]) for path in paths])
+            connection.executemany(
+                "INSERT INTO outputs (path, item) VALUES (?, ?)",
+                [(path, row_id) for path in paths])
+        _logger.debug("Recorded %s %s in the library", entry.channel,
+            entry.item_id)
+
+    def find(self, channel, item_id, /):
+        """All downloads of an item, in any selection and directory."""
+        return self._select("WHERE channel = ? AND item_id = ?",
+            [channel, item_id])
+
+    def get_missing(self, channel, item_ids, /, media=True):
+        """The `item_ids` that were never downloaded, in the same order.
+
+        With `media`, items of which only the subtitles were
+        downloaded count as missing.
+        """
+        connection = self.connection
+        with connection:
+            connection.execute(
+                "CREATE TEMP TABLE IF NOT EXISTS wanted (position INTEGER, item_id TEXT)")
+            connection.execute("DELETE FROM wanted")
+            connection.executemany("INSERT INTO wanted VALUES (?, ?)",
+                enumerate(item_ids))
+            rows = connection.execute("""
+                SELECT wanted.item_id FROM wanted
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM items
+                    WHERE items.channel = ? AND items.item_id = wanted.item_id
+                        AND items.media >= ?
+                )
+                ORDER BY wanted.position
+            """, [channel, int(media)]).fetchall()
+        return [item_id for item_id, in rows]
+
+    def _select(self, condition, parameters, /):
+        rows = self.connection.execute(f"""
+            SELECT id, {ITEM_COLUMNS} FROM items {condition}
+        """, parameters).fetchall()
+
+        entries = []
+        for row_id, *values in rows:
+            paths = self.connection.execute(
+                "SELECT path FROM outputs WHERE item = ? ORDER BY path",
+                [row_id]).fetchall()
+            (channel, item_id, audio, hardsub, subtitles, height, media, root,
+                title, series, season, episode, size, duration, checksum,
+                downloaded) = values
+            entries.append(LibraryEntry(channel=channel, item_id=item_id,
+                audio=audio, hardsub=hardsub, subtitles=json.loads(subtitles),
+                height=height, media=bool(media), root=root,
+                output_paths=[Path(path) for path, in paths], size=size,
+                duration=duration, checksum=checksum, title=title,
+                series=series, season=season, episode=episode,
+                downloaded=downloaded))
+        return entries
+
+
+def get_checksum(paths, /):
+    """A quick checksum of files.
+
+    Hashing whole videos would read gigabytes, so only the size and
+    the first and last `CHECKSUM_SAMPLE_SIZE` bytes of every file count.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as file:
+            size = file.seek(0, 2)
+            digest.update(size.to_bytes(8, "little"))
+            file.seek(0)
+            digest.update(file.read(CHECKSUM_SAMPLE_SIZE))
+            if size > CHECKSUM_SAMPLE_SIZE:
+                file.seek(max(CHECKSUM_SAMPLE_SIZE, size - CHECKSUM_SAMPLE_SIZE))
+                digest.update(file.read(CHECKSUM_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+@cache
+def get_library():
+    return LibraryIndex("library.sqlite3")
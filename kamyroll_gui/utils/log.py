@@ -0,0 +1,116 @@
+import re
+import queue
+import atexit
+import logging
+import logging.handlers
+
+from pathlib import Path
+
+
+
+LOG_FORMAT = "{asctime} | {name:<90} | {levelname:<8} | {message}"
+
+MAX_LOG_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Characters of a payload that are written to the log
+PAYLOAD_LIMIT = 1000
+
+REDACT_REGEX = re.compile(r"""
+    (?P<key>['"]?(?:password|token|access_token|refresh_token)['"]?\s*[:=]\s*)
+    (?:'[^']*'|"[^"]*"|[^&,\s}]+)
+""", re.IGNORECASE | re.VERBOSE)
+
+
+_logger = logging.getLogger(__name__)
+
+
+class Truncated:
+    """Shortens a payload, but only once it is actually logged."""
+    def __init__(self, data, /, limit=PAYLOAD_LIMIT):
+        self.data = data
+        self.limit = limit
+
+    def __str__(self, /):
+        data = self.data[:self.limit]
+        if isinstance(data, (bytes, bytearray)):
+            text = bytes(data).decode(errors="replace")
+        else:
+            text = str(data)
+
+        if len(self.data) > self.limit:
+            return f"{text}... ({len(self.data)} total)"
+        return text
+
+
+class RedactingFilter(logging.Filter):
+    """Removes credentials from every formatted log message."""
+    def filter(self, record, /):
+        record.msg = redact(record.getMessage())
+        record.args = None
+        return True
+
+
+def redact(text, /):
+    return REDACT_REGEX.sub(r"\g<key>***", text)
+
+
+def get_level(name, /):
+    if isinstance(name, int):
+        return name
+    level = logging.getLevelName(str(name).upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Unknown log level: {name}")
+    return level
+
+
+def setup_logging(path, /, level="INFO", module_levels=None, stream=None):
+    """Send all log records through a queue to a background thread.
+
+    Records are written to a rotating log file at `path` and to
+    `stream`, if given. Every call to `setup_logging` starts a new file.
+    `module_levels` maps logger names to levels that override `level`.
+    """
+    formatter = logging.Formatter(LOG_FORMAT, style="{")
+    handlers = []
+
+    if path is not None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(path,
+            maxBytes=MAX_LOG_BYTES, backupCount=LOG_BACKUP_COUNT,
+            encoding="utf-8", delay=True)
+        if path.exists() and path.stat().st_size:
+            file_handler.doRollover()
+        handlers.append(file_handler)
+
+    if stream is not None:
+        handlers.append(logging.StreamHandler(stream))
+
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RedactingFilter())
+
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(queue_handler)
+
+    invalid_levels = []
+    levels = {"": level, **(module_levels or {})}
+    for name, module_level in levels.items():
+        try:
+            logging.getLogger(name).setLevel(get_level(module_level))
+        except ValueError:
+            invalid_levels.append(module_level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers,
+        respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    for module_level in invalid_levels:
+        _logger.warning("Ignoring unknown log level %r", module_level)
+    return listener
@@ -1,50 +1,334 @@
 import re
 
+from dataclasses import dataclass, field
+from pathlib import PurePosixPath
+from urllib.parse import urljoin, urlparse
 
 
-PROGRAM_INFO_REGEX = re.compile(r'[:,]([^=]*)=(?:"([^"]*)"|([^,]*))')
+
+ATTRIBUTE_REGEX = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+URI_ATTRIBUTE_REGEX = re.compile(r'URI="([^"]*)"')
+# Rendition groups that are not kept in a localized master playlist
+DROPPED_GROUP_REGEX = re.compile(r'(?:^|,)(?:SUBTITLES|CLOSED-CAPTIONS)="[^"]*"')
+KEPT_MASTER_TAGS = (
+    "#EXTM3U",
+    "#EXT-X-VERSION",
+    "#EXT-X-INDEPENDENT-SEGMENTS",
+)
+
+
+@dataclass
+class Variant:
+    #: Index of the variant, ffmpeg creates one program per variant
+    program_id: int
+    uri: str
+    bandwidth: int
+    average_bandwidth: int | None = None
+    codecs: str | None = None
+    resolution: tuple[int, int] | None = None
+    frame_rate: float | None = None
+    audio: str | None = None
+    #: The attribute list as found in the playlist
+    raw_attributes: str = ""
+
+
+@dataclass
+class Rendition:
+    type: str
+    group_id: str
+    name: str | None = None
+    language: str | None = None
+    default: bool = False
+    uri: str | None = None
+    raw_attributes: str = ""
+
+
+@dataclass
+class MasterPlaylist:
+    variants: list[Variant] = field(default_factory=list)
+    renditions: list[Rendition] = field(default_factory=list)
+
+    def get_renditions(self, rendition_type, group_id, /):
+        return [
+            rendition
+            for rendition in self.renditions
+            if rendition.type == rendition_type
+            and rendition.group_id == group_id
+        ]
+
+
+@dataclass
+class Key:
+    method: str
+    uri: str | None = None
+    iv: str | None = None
+
+
+@dataclass
+class Segment:
+    uri: str
+    duration: float
+    #: `(length, offset)`, offset is `None` if it follows the previous range
+    byte_range: tuple[int, int | None] | None = None
+    key: Key | None = None
+    map_uri: str | None = None
+
+
+@dataclass
+class MediaPlaylist:
+    target_duration: float = 0
+    media_sequence: int = 0
+    is_endlist: bool = False
+    segments: list[Segment] = field(default_factory=list)
+
+    @property
+    def duration(self, /):
+        return sum(segment.duration for segment in self.segments)
+
+
+def parse_attributes(text, /):
+    return {
+        key: value[1:-1] if value.startswith('"') else value
+        for key, value in ATTRIBUTE_REGEX.findall(text)
+    }
+
+
+def iter_lines(data, /):
+    """Yield `(tag, value)` for every tag and `(None, uri)` for every uri."""
+    for line in data.splitlines(keepends=False):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith("#EXT"):
+            tag, _, value = line.partition(":")
+            yield tag, value
+        elif not line.startswith("#"):
+            yield None, line
+
+
+def parse_master(data, /, base_url=""):
+    playlist = MasterPlaylist()
+    stream_info = None
+
+    for tag, value in iter_lines(data):
+        if tag == "#EXT-X-STREAM-INF":
+            stream_info = value
+
+        elif tag == "#EXT-X-MEDIA":
+            playlist.renditions.append(_rendition_from_attributes(value, base_url))
+
+        elif tag is None and stream_info is not None:
+            variant = _variant_from_attributes(stream_info, value, base_url,
+                len(playlist.variants))
+            playlist.variants.append(variant)
+            stream_info = None
+
+    return playlist
+
+
+def parse_media(data, /, base_url=""):
+    playlist = MediaPlaylist()
+    duration = None
+    byte_range = None
+    key = None
+    map_uri = None
+
+    for tag, value in iter_lines(data):
+        match tag:
+            case "#EXTINF":
+                duration = float(value.partition(",")[0] or 0)
+
+            case "#EXT-X-BYTERANGE":
+                length, _, offset = value.partition("@")
+                byte_range = (int(length), int(offset) if offset else None)
+
+            case "#EXT-X-KEY":
+                attributes = parse_attributes(value)
+                method = attributes.get("METHOD", "NONE")
+                key = None
+                if method != "NONE":
+                    uri = attributes.get("URI")
+                    key = Key(method=method, iv=attributes.get("IV"),
+                        uri=urljoin(base_url, uri) if uri else None)
+
+            case "#EXT-X-MAP":
+                uri = parse_attributes(value).get("URI")
+                map_uri = urljoin(base_url, uri) if uri else None
+
+            case "#EXT-X-TARGETDURATION":
+                playlist.target_duration = float(value)
+
+            case "#EXT-X-MEDIA-SEQUENCE":
+                playlist.media_sequence = int(value)
+
+            case "#EXT-X-ENDLIST":
+                playlist.is_endlist = True
+
+            case None:
+                segment = Segment(uri=urljoin(base_url, value),
+                    duration=duration or 0, byte_range=byte_range, key=key,
+                    map_uri=map_uri)
+                playlist.segments.append(segment)
+                duration = None
+                byte_range = None
+
+    return playlist
 
 
 def get_resolutions(data, /):
-    audio_program_id = None
+    master = parse_master(data)
+
     resolutions = {}
-    data_lines = (
-        line
+    for variant in master.variants:
+        if variant.resolution is None:
+            continue
+
+        width, height = variant.resolution
+        frame_rate = variant.frame_rate or 30
+        item = (width, height, frame_rate, variant.bandwidth, variant.program_id)
+
+        if height in resolutions:
+            if resolutions[height] > item:
+                continue
+
+        resolutions[height] = item
+
+    return {
+        height: [program_id]
+        for height, (*_, program_id) in resolutions.items()
+    }
+
+
+def localize_master(data, base_url, program_ids, /):
+    """Reduce a master playlist to the given programs.
+
+    Returns the reduced playlist referencing local media playlists,
+    the `(url, local_name)` pairs of the media playlists to download
+    and the new program ids in the order of `program_ids`.
+    Of every audio group only the default rendition is kept,
+    subtitle and closed caption groups are dropped.
+    """
+    master = parse_master(data, base_url)
+    lines = [
+        line.strip()
         for line in data.splitlines(keepends=False)
-        if line.startswith("#EXT-X-STREAM-INF:") or line.startswith("#EXT-X-MEDIA:")
-    )
-    for program_id, line in enumerate(data_lines):
-        matches = PROGRAM_INFO_REGEX.findall(line)
-        info_dict = {
-            key: first or second
-            for key, first, second in matches
-        }
-
-        if "RESOLUTION" in info_dict:
-            resolution = info_dict["RESOLUTION"]
-            bandwidth = int(info_dict["BANDWIDTH"])
-            frame_rate = float(info_dict.get("FRAME-RATE", 30))
-            width, _, height = resolution.partition("x")
-            width, height = int(width), int(height)
-            item = (width, height, frame_rate, bandwidth, program_id)
-
-            if height in resolutions:
-                if resolutions[height] > item:
-                    continue
-
-            resolutions[height] = item
-
-        elif "TYPE" in info_dict:
-            # VERIFY
-            if info_dict["TYPE"].lower() == "audio":
-                audio_program_id = program_id
-
-    resolution_dict = {}
-    for key, value in resolutions.items():
-        _, _, _, _, program_id = value
-        program_ids = [program_id]
-        if audio_program_id is not None:
-            program_ids.append(audio_program_id)
-        resolution_dict[key] = program_ids
-
-    return resolution_dict
+        if line.strip().startswith(KEPT_MASTER_TAGS)
+    ]
+    playlists = []
+
+    selected_variants = [
+        variant
+        for variant in master.variants
+        if variant.program_id in program_ids
+    ]
+
+    audio_groups = {
+        variant.audio
+        for variant in selected_variants
+        if variant.audio is not None
+    }
+    for index, group_id in enumerate(sorted(audio_groups)):
+        renditions = master.get_renditions("AUDIO", group_id)
+        rendition = next(
+            (rendition for rendition in renditions if rendition.default),
+            renditions[0] if renditions else None)
+        if rendition is None:
+            continue
+
+        attributes = rendition.raw_attributes
+        if rendition.uri is not None:
+            local_name = f"audio_{index}.m3u8"
+            playlists.append((rendition.uri, local_name))
+            match = URI_ATTRIBUTE_REGEX.search(attributes)
+            attributes = _replace_uri(attributes, match, local_name)
+        lines.append(f"#EXT-X-MEDIA:{attributes}")
+
+    new_program_ids = {}
+    for variant in selected_variants:
+        local_name = f"video_{variant.program_id}.m3u8"
+        playlists.append((variant.uri, local_name))
+        new_program_ids[variant.program_id] = len(new_program_ids)
+        # Do not reference the dropped groups
+        attributes = DROPPED_GROUP_REGEX.sub("", variant.raw_attributes)
+        lines.append(f"#EXT-X-STREAM-INF:{attributes.lstrip(',')}")
+        lines.append(local_name)
+
+    local_program_ids = [
+        new_program_ids[program_id]
+        for program_id in program_ids
+        if program_id in new_program_ids
+    ]
+    return "\n".join(lines) + "\n", playlists, local_program_ids
+
+
+def localize_media_playlist(data, base_url, prefix, /):
+    """Rewrite a media playlist to reference local files.
+
+    Returns the rewritten playlist and the `(url, local_name)` pairs
+    of all segments, keys and initialization sections to download.
+    Segments sharing a file through byte ranges are only listed once.
+    """
+    lines = []
+    downloads = {}
+
+    def get_local_name(uri, default_suffix):
+        url = urljoin(base_url, uri)
+        if url not in downloads:
+            suffix = PurePosixPath(urlparse(url).path).suffix or default_suffix
+            downloads[url] = f"{prefix}_{len(downloads):05}{suffix}"
+        return downloads[url]
+
+    for line in data.splitlines(keepends=False):
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.startswith("#EXT-X-KEY:") or line.startswith("#EXT-X-MAP:"):
+            match = URI_ATTRIBUTE_REGEX.search(line)
+            if match:
+                default_suffix = ".key" if line.startswith("#EXT-X-KEY:") else ".mp4"
+                local_name = get_local_name(match[1], default_suffix)
+                line = _replace_uri(line, match, local_name)
+
+        elif not line.startswith("#"):
+            line = get_local_name(line, ".ts")
+
+        lines.append(line)
+
+    return "\n".join(lines) + "\n", list(downloads.items())
+
+
+def _variant_from_attributes(text, uri, base_url, program_id, /):
+    attributes = parse_attributes(text)
+
+    resolution = None
+    if "RESOLUTION" in attributes:
+        width, _, height = attributes["RESOLUTION"].partition("x")
+        resolution = (int(width), int(height))
+
+    average_bandwidth = attributes.get("AVERAGE-BANDWIDTH")
+    frame_rate = attributes.get("FRAME-RATE")
+
+    return Variant(program_id=program_id, uri=urljoin(base_url, uri),
+        bandwidth=int(attributes.get("BANDWIDTH", 0)),
+        average_bandwidth=int(average_bandwidth) if average_bandwidth else None,
+        codecs=attributes.get("CODECS"), resolution=resolution,
+        frame_rate=float(frame_rate) if frame_rate else None,
+        audio=attributes.get("AUDIO"), raw_attributes=text)
+
+
+def _rendition_from_attributes(text, base_url, /):
+    attributes = parse_attributes(text)
+    uri = attributes.get("URI")
+
+    return Rendition(type=attributes.get("TYPE", ""),
+        group_id=attributes.get("GROUP-ID", ""), name=attributes.get("NAME"),
+        language=attributes.get("LANGUAGE"),
+        default=attributes.get("DEFAULT") == "YES",
+        uri=urljoin(base_url, uri) if uri else None, raw_attributes=text)
+
+
+def _replace_uri(line, match, uri, /):
+    start, end = match.span(1)
+    return line[:start] + uri + line[end:]
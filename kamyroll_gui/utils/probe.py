@@ -0,0 +1,247 @@
+import json
+import time
+import logging
+import sqlite3
+
+from dataclasses import asdict, dataclass, field
+from datetime import timedelta
+from functools import cache
+from pathlib import Path
+
+from PySide6.QtCore import QProcess
+
+
+
+PROBE_ARGS = [
+    "-v", "error",
+    "-print_format", "json",
+    "-show_format",
+    "-show_streams",
+]
+# Entries of files that were not probed for a long time are dropped first
+MAX_CACHE_ENTRIES = 50000
+CACHE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    probed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_by_time ON probes (probed);
+"""
+
+
+_logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProbeStream:
+    #: `video`, `audio`, `subtitle` or `attachment`
+    type: str
+    language: str | None = None
+    #: Cover pictures are video streams as well
+    is_attached_pic: bool = False
+    #: Only set for video streams
+    height: int | None = None
+
+
+@dataclass
+class ProbeResult:
+    duration: timedelta | None
+    streams: list[ProbeStream] = field(default_factory=list)
+
+    def get_streams(self, stream_type, /):
+        return [
+            stream
+            for stream in self.streams
+            if stream.type == stream_type and not stream.is_attached_pic
+        ]
+
+    @classmethod
+    def from_ffprobe(cls, data, /):
+        duration = None
+        try:
+            duration = timedelta(seconds=float(data["format"]["duration"]))
+        except (KeyError, TypeError, ValueError):
+            pass
+
+        streams = []
+        for stream_dict in data.get("streams", []):
+            tags = stream_dict.get("tags") or {}
+            disposition = stream_dict.get("disposition") or {}
+            streams.append(ProbeStream(
+                type=stream_dict.get("codec_type", "unknown"),
+                language=tags.get("language") or tags.get("LANGUAGE"),
+                is_attached_pic=bool(disposition.get("attached_pic")),
+                height=stream_dict.get("height")))
+        return cls(duration=duration, streams=streams)
+
+    def to_dict(self, /):
+        data = asdict(self)
+        if self.duration is not None:
+            data["duration"] = self.duration.total_seconds()
+        return data
+
+    @classmethod
+    def from_dict(cls, data, /):
+        duration = data.get("duration")
+        if duration is not None:
+            duration = timedelta(seconds=duration)
+        return cls(duration=duration, streams=[
+            ProbeStream(**stream)
+            for stream in data.get("streams", [])
+        ])
+
+
+class ProbeCache:
+    """Remembers the probe results of files until they change.
+
+    A file counts as unchanged while its size and modification time
+    are the same, so checking it again does not start ffprobe.
+    Every probe is a single row of a sqlite database.
+    """
+    def __init__(self, path, /):
+        self.path = Path(path)
+        self._connection = None
+
+    @property
+    def connection(self, /):
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode = WAL")
+            with connection:
+                connection.executescript(CACHE_SCHEMA)
+                # Pruning once per run keeps `put` a single insert
+                connection.execute("""
+                    DELETE FROM probes WHERE path IN (
+                        SELECT path FROM probes
+                        ORDER BY probed DESC LIMIT -1 OFFSET ?
+                    )
+                """, [MAX_CACHE_ENTRIES])
+            self._connection = connection
+        return self._connection
+
+    def close(self, /):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def get(self, path, /):
+        key, signature = self._get_key(path)
+        if key is None:
+            return None
+        try:
+            row = self.connection.execute("""
+                SELECT size, mtime, result FROM probes WHERE path = ?
+            """, [key]).fetchone()
+        except (OSError, sqlite3.Error) as error:
+            _logger.warning("Error reading probe cache %s: %s", self.path, error)
+            return None
+        if row is None or list(row[:2]) != signature:
+            return None
+
+        try:
+            return ProbeResult.from_dict(json.loads(row[2]))
+        except (TypeError, ValueError) as error:
+            _logger.warning("Invalid probe cache entry for %s: %s", key, error)
+            return None
+
+    def put(self, path, result, /):
+        key, signature = self._get_key(path)
+        if key is None:
+            return
+
+        try:
+            with self.connection as connection:
+                connection.execute("""
+                    INSERT OR REPLACE INTO probes (path, size, mtime, result, probed)
+                    VALUES (?, ?, ?, ?, ?)
+                """, [key, *signature, json.dumps(result.to_dict()), time.time()])
+        except (OSError, sqlite3.Error) as error:
+            _logger.warning("Could not write probe cache %s: %s", self.path, error)
+
+    @staticmethod
+    def _get_key(path, /):
+        try:
+            path = Path(path).resolve()
+            stat = path.stat()
+        except OSError:
+            return None, None
+        return str(path), [stat.st_size, stat.st_mtime_ns]
+
+
+class Prober:
+    """Runs ffprobe on a file and calls `callback` with a `ProbeResult`.
+
+    `callback` is called with `None` if the file could not be probed.
+    Cached results are passed to `callback` right away.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, /, path, callback):
+        self.path = Path(path)
+        self.callback = callback
+        self.is_stopped = True
+        self.process = None
+
+    def start(self, /):
+        self.is_stopped = False
+        result = get_probe_cache().get(self.path)
+        if result is not None:
+            self._logger.debug("Using cached probe of %s", self.path)
+            self._finish(result)
+            return
+
+        self.process = QProcess()
+        self.process.finished.connect(self._on_finished)
+        self.process.errorOccurred.connect(self._on_error)
+        self._logger.info("Probing %s", self.path)
+        self.process.start("ffprobe", [*PROBE_ARGS, str(self.path)])
+
+    def stop(self, /):
+        self.is_stopped = True
+        if self.process is not None and self.process.state() != QProcess.NotRunning:
+            self.process.kill()
+
+    def _on_error(self, error, /):
+        if error != QProcess.FailedToStart:
+            return
+        self._logger.error("Could not start ffprobe: %s",
+            self.process.errorString())
+        self._finish(None)
+
+    def _on_finished(self, exit_code, status, /):
+        if self.is_stopped:
+            return
+
+        if status != QProcess.NormalExit or exit_code != 0:
+            message = bytes(self.process.readAllStandardError()).decode(
+                errors="replace").strip()
+            self._logger.warning("Could not probe %s: %s", self.path, message)
+            self._finish(None)
+            return
+
+        try:
+            data = json.loads(bytes(self.process.readAllStandardOutput()))
+            result = ProbeResult.from_ffprobe(data)
+        except (ValueError, AttributeError) as error:
+            self._logger.warning("Invalid ffprobe output for %s: %s",
+                self.path, error)
+            self._finish(None)
+            return
+
+        get_probe_cache().put(self.path, result)
+        self._finish(result)
+
+    def _finish(self, result, /):
+        if self.is_stopped:
+            return
+        self.is_stopped = True
+        self.callback(result)
+
+
+@cache
+def get_probe_cache():
+    return ProbeCache("cache/probe.sqlite3")
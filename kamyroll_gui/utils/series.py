@@ -0,0 +1,153 @@
+import logging
+
+from collections import deque
+from dataclasses import dataclass, field
+from functools import partial
+
+from . import api
+
+
+
+DEFAULT_WORKERS = 4
+
+
+@dataclass
+class _Expansion:
+    url: str
+    channel_id: str
+    series_id: str
+    season_id: str | None = None
+    # Episode lists by the position of their season in the series
+    episodes: dict[int, list] = field(default_factory=dict)
+    error: str | None = None
+
+
+class SeriesExpander:
+    """Expands series and season urls into the urls of their episodes.
+
+    The seasons of all series are listed first, then the episode lists
+    of all seasons are requested over up to `workers` parallel api calls.
+    Once everything is listed `success_callback` is called with the
+    urls in the original order and a dict of the urls that failed
+    mapped to the reason. Episode urls are passed through unchanged.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, /, success_callback, progress_callback=None,
+            workers=DEFAULT_WORKERS):
+        self.success_callback = success_callback
+        self.progress_callback = progress_callback
+        self.workers = max(1, workers)
+
+        self.is_stopped = True
+        self.entries = []
+        self.queue = deque()
+        self.active = set()
+        self.total_count = 0
+        self.done_count = 0
+
+    def start(self, urls, /):
+        self.is_stopped = False
+        for url in urls:
+            parsed_data = api.parse_series_url(url)
+            if parsed_data is None:
+                self.entries.append(url)
+                continue
+
+            channel_id, params = parsed_data
+            expansion = _Expansion(url=url, channel_id=channel_id,
+                series_id=params["id"], season_id=params.get("season_id"))
+            self.entries.append(expansion)
+            self.queue.append((
+                partial(api.get_seasons_async, channel_id, expansion.series_id),
+                partial(self._on_seasons, expansion)))
+
+        self.total_count = len(self.queue)
+        self._fill_workers()
+
+    def stop(self, /):
+        self.is_stopped = True
+        self.queue.clear()
+        for request in list(self.active):
+            request.cancel()
+        self.active.clear()
+
+    def _fill_workers(self, /):
+        if self.is_stopped:
+            return
+
+        while self.queue and len(self.active) < self.workers:
+            start_request, on_done = self.queue.popleft()
+            request = start_request()
+            self.active.add(request)
+            request.add_done_callback(partial(self._on_done, on_done))
+
+        if not self.active and not self.queue:
+            self._finish()
+
+    def _on_done(self, on_done, request, /):
+        if self.is_stopped:
+            return
+        self.active.discard(request)
+        on_done(request)
+
+        self.done_count += 1
+        if self.progress_callback is not None:
+            self.progress_callback(self.done_count, self.total_count)
+        self._fill_workers()
+
+    def _on_seasons(self, expansion, request, /):
+        if request.error is not None:
+            expansion.error = f"Could not list the seasons: {request.error}"
+            return
+
+        seasons = request.result
+        if expansion.season_id is not None:
+            seasons = [
+                season
+                for season in seasons
+                if season.id == expansion.season_id
+            ]
+        if not seasons:
+            expansion.error = "No matching seasons found"
+            return
+
+        self._logger.info("Listing %s seasons of %s", len(seasons),
+            expansion.url)
+        for position, season in enumerate(seasons):
+            self.queue.append((
+                partial(api.get_episodes_async, expansion.channel_id,
+                    expansion.series_id, season.id),
+                partial(self._on_episodes, expansion, season, position)))
+        self.total_count += len(seasons)
+
+    def _on_episodes(self, expansion, season, position, request, /):
+        if request.error is not None:
+            expansion.error = (f"Could not list the episodes of season "
+                f"{season.number}: {request.error}")
+            return
+        expansion.episodes[position] = request.result
+
+    def _finish(self, /):
+        if self.is_stopped:
+            return
+        self.is_stopped = True
+
+        urls = []
+        errors = {}
+        for entry in self.entries:
+            if isinstance(entry, str):
+                urls.append(entry)
+                continue
+            if entry.error is not None:
+                errors[entry.url] = entry.error
+                continue
+
+            count = 0
+            for position in sorted(entry.episodes):
+                for episode in entry.episodes[position]:
+                    urls.append(episode.url)
+                    count += 1
+            self._logger.info("Expanded %s into %s episodes", entry.url, count)
+
+        self.success_callback(urls, errors)
@@ -0,0 +1,90 @@
+import logging
+
+from functools import cache
+from pathlib import PurePosixPath
+from urllib.parse import urlparse
+
+from .file_cache import FileCache
+
+
+
+DEFAULT_MAX_SIZE = 50 * 1024 * 1024
+SUBTITLE_SUFFIXES = {".ass", ".ssa", ".vtt", ".srt"}
+# Every supported format contains at least one of these
+SUBTITLE_MARKERS = ["[Script Info]", "[Events]", "WEBVTT", "-->"]
+
+
+_logger = logging.getLogger(__name__)
+
+
+class SubtitleCache(FileCache):
+    """Stores subtitles by url and locale, so retries do not fetch them again."""
+    def __init__(self, path, /, max_size=DEFAULT_MAX_SIZE):
+        super().__init__(path, max_size)
+
+    def is_valid(self, data, /):
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            return False
+        return any(marker in text for marker in SUBTITLE_MARKERS)
+
+    def _get_path(self, url, key, /):
+        path = super()._get_path(url, key)
+        suffix = PurePosixPath(urlparse(url).path).suffix.lower()
+        if suffix not in SUBTITLE_SUFFIXES:
+            suffix = ".ass"
+        return path.with_suffix(suffix)
+
+
+class SubtitleFetch:
+    """Downloads subtitles concurrently into the `SubtitleCache`.
+
+    `sources` are `(locale, url)` pairs. Once all of them are done,
+    `callback` is called with the number of subtitles that could
+    not be cached, those stay remote inputs of ffmpeg.
+    """
+    _logger = logging.getLogger(__name__).getChild(__qualname__)
+
+    def __init__(self, sources, callback, /):
+        self.sources = list(dict.fromkeys(sources))
+        self.callback = callback
+        self.pending = len(self.sources)
+        self.failed = 0
+        self.is_stopped = True
+
+    def start(self, /):
+        self.is_stopped = False
+        if not self.sources:
+            self.callback(0)
+            return
+
+        subtitle_cache = get_subtitle_cache()
+        for locale, url in self.sources:
+            subtitle_cache.fetch(url, self._on_fetched,
+                key=get_subtitle_key(locale, url))
+
+    def stop(self, /):
+        self.is_stopped = True
+
+    def _on_fetched(self, path, /):
+        self.pending -= 1
+        if path is None:
+            self.failed += 1
+        if self.pending or self.is_stopped:
+            return
+
+        self.is_stopped = True
+        if self.failed:
+            self._logger.warning("Could not cache %d of %d subtitles",
+                self.failed, len(self.sources))
+        self.callback(self.failed)
+
+
+def get_subtitle_key(locale, url, /):
+    return f"{locale.value}:{url}"
+
+
+@cache
+def get_subtitle_cache():
+    return SubtitleCache("cache/subtitles")
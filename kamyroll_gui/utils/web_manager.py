@@ -1,20 +1,151 @@
 import json
 import logging
 
-from PySide6.QtCore import QEventLoop, QUrl, QUrlQuery
-from PySide6.QtNetwork import QNetworkAccessManager, QNetworkRequest
+from dataclasses import dataclass
+from functools import cache
+
+from PySide6.QtCore import QUrl, QUrlQuery
+from PySide6.QtNetwork import (
+    QHttp1Configuration,
+    QNetworkAccessManager,
+    QNetworkReply,
+    QNetworkRequest,
+)
 
 from .blocking import wait_for_event
+from .http_cache import HttpCache
+from .log import Truncated
+
 
 
+# Milliseconds without any transferred data until a request is aborted
+DEFAULT_TIMEOUT = 30000
+# Sent by all requests and ffmpeg so the servers see a single client
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/94.0.4606.81 Safari/537.36 Edg/94.0.992.50"
+
 
 _logger = logging.getLogger(__name__)
 
+
+@dataclass
+class TransportProfile:
+    """How the `WebManager` talks to servers."""
+    #: Multiplex all requests to a host over one connection if it supports it
+    http2: bool = True
+    #: Accept compressed responses, Qt decodes them transparently
+    compression: bool = True
+    #: HTTP/1 connections that are opened to a single host at most
+    connections_per_host: int = 6
+    #: Seconds an idle connection is kept open for reuse
+    keep_alive: int = 120
+    user_agent: str = USER_AGENT
+
+    @classmethod
+    def from_settings(cls, settings, /):
+        return cls(http2=settings.http2_enabled,
+            compression=settings.compressed_transfer,
+            connections_per_host=settings.connections_per_host)
+
+
+class WebFuture:
+    """The pending result of a request started by the `WebManager`.
+
+    Callbacks added with `add_done_callback` are called with the future
+    once the request finished, failed, timed out or was cancelled.
+    """
+    def __init__(self, reply, /):
+        self._reply = reply
+        self._callbacks = []
+
+        self.data = b""
+        self.status = None
+        self.headers = {}
+        self.error = None
+        self.is_done = False
+        self.is_cancelled = False
+        self.timed_out = False
+
+        if reply is not None:
+            reply.finished.connect(self._on_finished)
+
+    @classmethod
+    def from_data(cls, data, /):
+        future = cls(None)
+        future.data = data
+        future.status = 200
+        future.is_done = True
+        return future
+
+    def add_done_callback(self, callback, /):
+        if self.is_done:
+            callback(self)
+            return
+        self._callbacks.append(callback)
+
+    def cancel(self, /):
+        if self.is_done:
+            return
+        self.is_cancelled = True
+        self._reply.abort()
+
+    def result(self, /):
+        """Block until the request is done and return the response body."""
+        if not self.is_done:
+            wait_for_event(self._reply.finished)
+        return self.data
+
+    def _on_finished(self, /):
+        if self.is_done:
+            return
+        reply = self._reply
+
+        self.data = bytes(reply.readAll())
+        self.status = reply.attribute(QNetworkRequest.HttpStatusCodeAttribute)
+        self.headers = {
+            bytes(name).decode().lower(): bytes(value).decode()
+            for name, value in reply.rawHeaderPairs()
+        }
+
+        error = reply.error()
+        if error != QNetworkReply.NoError:
+            self.error = reply.errorString()
+            if (error == QNetworkReply.OperationCanceledError
+                    and not self.is_cancelled):
+                self.timed_out = True
+            _logger.error("Request to %s failed: %s",
+                reply.url().toString(), self.error)
+
+        _logger.debug("Web response: %s", Truncated(self.data))
+        self.is_done = True
+        reply.deleteLater()
+
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                _logger.exception("Error in web request callback")
+
+
 class WebManager:
-    def __init__(self, /):
+    def __init__(self, /, cache=None, profile=None):
         self._network_manager = QNetworkAccessManager()
-
-    def _get_request(self, url, /, params=None):
+        self._network_manager.setTransferTimeout(DEFAULT_TIMEOUT)
+        self._cache = cache
+        self._in_flight: dict[str, WebFuture] = {}
+        # Qt does not keep the future of a reply alive, callers may drop it
+        self._pending: set[WebFuture] = set()
+        self.configure(profile or TransportProfile())
+
+    def configure(self, profile, /):
+        """Use `profile` for all requests started from now on."""
+        _logger.debug("Using transport profile: %s", profile)
+        self.profile = profile
+        self._http1_configuration = QHttp1Configuration()
+        self._http1_configuration.setNumberOfConnectionsPerHost(
+            max(1, profile.connections_per_host))
+
+    def _get_request(self, url, /, params=None, timeout=None):
         q_url = QUrl(url)
 
         if params:
@@ -24,31 +155,98 @@ class WebManager:
 
             q_url.setQuery(query.query())
 
-        return QNetworkRequest(q_url)
+        profile = self.profile
+        request = QNetworkRequest(q_url)
+        request.setHeader(QNetworkRequest.UserAgentHeader, profile.user_agent)
+        request.setAttribute(QNetworkRequest.Http2AllowedAttribute,
+            profile.http2)
+        request.setAttribute(
+            QNetworkRequest.ConnectionCacheExpiryTimeoutSecondsAttribute,
+            profile.keep_alive)
+        request.setHttp1Configuration(self._http1_configuration)
+        # Qt only decodes the response if it chose the encodings itself
+        if not profile.compression:
+            request.setRawHeader(b"Accept-Encoding", b"identity")
+        if timeout is not None:
+            request.setTransferTimeout(timeout)
+        return request
+
+    def get_async(self, /, url, params=None, timeout=None, cached=False):
+        """Start a GET request.
+
+        With `cached` set, the response is served from and stored into
+        the http cache, and concurrent requests for the same url share
+        a single future. Cancelling a shared future cancels it for all.
+        """
+        if not cached or self._cache is None:
+            _logger.info("GET %s", url)
+            request = self._get_request(url, params, timeout)
+            return self._track(WebFuture(self._network_manager.get(request)))
+
+        request = self._get_request(url, params, timeout)
+        key = request.url().toString()
+
+        if key in self._in_flight:
+            _logger.info("GET %s (joined in flight request)", url)
+            return self._in_flight[key]
+
+        cached_result = self._cache.get(key)
+        if cached_result is not None:
+            entry, data = cached_result
+            if entry.is_fresh():
+                _logger.info("GET %s (from cache)", url)
+                return WebFuture.from_data(data)
+
+            for name, value in entry.get_validation_headers().items():
+                request.setRawHeader(name.encode(), value.encode())
 
-    def get(self, /, url, params=None):
         _logger.info("GET %s", url)
-        request = self._get_request(url, params)
-
-        reply = self._network_manager.get(request)
-        wait_for_event(reply.finished)
-
-        data = bytes(reply.readAll())
-        _logger.debug("Web response: %s", data)
-        return data
-
-    def post(self, /, url, data=None, params=None):
+        future = self._track(WebFuture(self._network_manager.get(request)))
+        future.add_done_callback(
+            lambda future: self._update_cache(key, cached_result, future))
+        self._in_flight[key] = future
+        return future
+
+    def _update_cache(self, key, cached_result, future, /):
+        self._in_flight.pop(key, None)
+        if future.error is not None and future.status != 304:
+            return
+
+        if future.status == 304 and cached_result is not None:
+            entry, data = cached_result
+            _logger.debug("Revalidated cached response for %s", key)
+            self._cache.refresh(entry, data, future.headers)
+            future.data = data
+            return
+
+        if future.status == 200:
+            entry = self._cache.create_entry(key, future.headers)
+            if entry is not None:
+                self._cache.put(entry, future.data)
+
+    def post_async(self, /, url, data=None, params=None, timeout=None):
         _logger.info("POST %s", url)
         data = data or {}
         bin_data = json.dumps(data).encode()
 
-        request = self._get_request(url, params)
+        request = self._get_request(url, params, timeout)
 
         reply = self._network_manager.post(request, bin_data)
-        wait_for_event(reply.finished)
+        return self._track(WebFuture(reply))
+
+    def _track(self, future, /):
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    def get(self, /, url, params=None, timeout=None, cached=False):
+        return self.get_async(url, params, timeout, cached).result()
+
+    def post(self, /, url, data=None, params=None, timeout=None):
+        return self.post_async(url, data, params, timeout).result()
 
-        data = bytes(reply.readAll())
-        _logger.debug("Web response: %s", data)
-        return data
 
-web_manager = WebManager()
+@cache
+def get_web_manager():
+    """The shared `WebManager`, a `QCoreApplication` has to exist first."""
+    return WebManager(cache=HttpCache("cache/http"))
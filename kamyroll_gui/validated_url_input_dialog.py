@@ -46,7 +46,11 @@ class ValidatedUrlInputDialog(QDialog):
             self.ok_button.setDisabled(True)
             return
 
+        kind = ""
         result = api.parse_url(url)
+        if not result:
+            result = api.parse_series_url(url)
+            kind = "season " if result and "season_id" in result[1] else "series "
         if not result:
             self.ok_button.setDisabled(True)
             self.validity_label.setStyleSheet("color: red;")
@@ -57,7 +61,10 @@ class ValidatedUrlInputDialog(QDialog):
         self.name, self.params = result
 
         self.validity_label.setStyleSheet("color: green;")
-        self.validity_label.setText(f" Valid URL for {self.name}")
+        text = f" Valid {kind}URL for {self.name}"
+        if kind:
+            text += ", all episodes will be added"
+        self.validity_label.setText(text)
 
     def get_text(self, /):
         if self.line_edit.hasAcceptableInput():
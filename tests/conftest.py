@@ -0,0 +1,27 @@
+import os
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from kamyroll_gui.data_types import EpisodeMetadata
+
+
+
+@pytest.fixture
+def application():
+    """A QCoreApplication, skips the test if PySide6 is missing."""
+    pytest.importorskip("PySide6")
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6.QtCore import QCoreApplication
+
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def metadata():
+    return EpisodeMetadata(title="Romance Dawn", duration=timedelta(minutes=24),
+        description="", year=1999, series="One Piece", season=1,
+        season_name="East Blue", episode=1, episode_disp="1",
+        date=datetime(1999, 10, 20))
+
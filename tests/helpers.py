@@ -0,0 +1,10 @@
+import time
+
+
+
+def run_until(application, predicate, /, timeout=5):
+    """Process events until `predicate` is true or `timeout` seconds passed."""
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        application.processEvents()
+    return predicate()
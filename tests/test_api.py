@@ -0,0 +1,93 @@
+import json
+import time
+
+import pytest
+
+from benchmarks import fixtures
+
+pytest.importorskip("PySide6")
+
+from kamyroll_gui.utils import api, api_cache, circuit_breaker
+
+
+
+CHANNEL_ID = "crunchyroll"
+PARAMS = {"media_id": "GRDQPM1ZY"}
+
+
+@pytest.fixture
+def expired_cache(tmp_path, monkeypatch):
+    """A cache holding a response whose streams expired."""
+    cache = api_cache.ApiCache(tmp_path)
+    monkeypatch.setattr(api, "get_api_cache", lambda: cache)
+
+    now = time.time()
+    entry = {
+        "stored": now - 60 * 60,
+        "streams_expire": now - 60,
+        "data": fixtures.read_json("episode.json"),
+    }
+    path = cache._get_path(CHANNEL_ID, PARAMS)
+    path.write_text(json.dumps(entry))
+    return cache
+
+
+@pytest.fixture
+def open_circuit():
+    circuit_breaker.get_circuit_breaker.cache_clear()
+    breaker = circuit_breaker.get_circuit_breaker(CHANNEL_ID)
+    for _ in range(breaker.min_requests):
+        breaker.record_failure()
+    yield breaker
+    circuit_breaker.get_circuit_breaker.cache_clear()
+
+
+def test_open_circuit_skips_cache(application, expired_cache, open_circuit):
+    request = api.get_media_async(CHANNEL_ID, PARAMS)
+
+    assert request.is_done
+    assert request.result is None
+    assert isinstance(request.error, api.ApiCircuitOpenError)
+
+
+def test_expired_streams_are_not_served(application, expired_cache):
+    request = api.ApiRequest(CHANNEL_ID, PARAMS)
+    request._fail(api.ApiUnavailableError("Internet or API not available"))
+
+    assert request.result is None
+    assert isinstance(request.error, api.ApiUnavailableError)
+
+
+def test_expired_streams_serve_subtitles(application, expired_cache):
+    request = api.ApiRequest(CHANNEL_ID, PARAMS, needs_streams=False)
+    request._fail(api.ApiUnavailableError("Internet or API not available"))
+
+    assert request.error is None
+    assert request.result.streams == []
+    assert request.result.subtitles
+
+
+@pytest.mark.parametrize("url, params", [
+    ("https://www.funimation.com/v/one-piece/episode-1",
+        {"slug_show": "one-piece", "slug_episode": "episode-1"}),
+    ("https://www.funimation.com/v/mob-psycho-100/the-kid-42",
+        {"slug_show": "mob-psycho-100", "slug_episode": "the-kid-42"}),
+    ("https://www.funimation.com/v/86-eighty-six/undertaker",
+        {"slug_show": "86-eighty-six", "slug_episode": "undertaker"}),
+])
+def test_parse_funimation_slugs_with_digits(application, url, params):
+    assert api.parse_url(url) == ("funimation", params)
+
+
+def test_parse_episodes_round_trips_urls(application):
+    data = {"items": [
+        {"id": 1, "slug": "episode-1", "episode_number": 1},
+        {"id": 2, "slug": "Not A Slug", "episode_number": 2},
+    ]}
+    episodes = api._parse_episodes(data, "funimation", "86-eighty-six")
+
+    assert [episode.url for episode in episodes] == [
+        "https://www.funimation.com/v/86-eighty-six/episode-1",
+    ]
+    assert api.get_item_key(episodes[0].url) == (
+        "funimation", "86-eighty-six/episode-1")
@@ -0,0 +1,73 @@
+import pytest
+
+from kamyroll_gui.data_types import Locale
+from kamyroll_gui.settings import Settings
+
+pytest.importorskip("PySide6")
+
+from kamyroll_gui.download_dialog import argument_helper
+from kamyroll_gui.download_dialog.download_selector import (
+    DownloadSelection,
+    HardsubInfo,
+)
+
+
+
+@pytest.fixture
+def selection():
+    return DownloadSelection(url="https://example.com/master.m3u8",
+        audio_locale=Locale.JAPANESE_JP, program_ids=[0],
+        hardsub_info=HardsubInfo(is_native=True, locale=Locale.NONE, url=""),
+        subtitles=[], height=1080)
+
+
+def _get_threads(arguments, /):
+    if "-threads" not in arguments:
+        return None
+    return int(arguments[arguments.index("-threads") + 1])
+
+
+@pytest.mark.parametrize("encodes, threads", [(0, 1), (2, 4), (3, 2), (16, 1)])
+def test_encode_threads_share_the_cores(monkeypatch, encodes, threads):
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    settings = Settings(max_parallel_encodes=encodes)
+
+    assert argument_helper.get_encode_threads(settings) == threads
+
+
+def test_only_encodes_are_limited(tmp_path, selection, metadata):
+    settings = Settings(download_path=tmp_path)
+    arguments = argument_helper.get_arguments(settings, selection, metadata,
+        None, False)
+    assert _get_threads(arguments) is None
+
+    settings = Settings(download_path=tmp_path, compress_streams=True)
+    arguments = argument_helper.get_arguments(settings, selection, metadata,
+        None, False)
+    assert _get_threads(arguments) == argument_helper.get_encode_threads(settings)
+    # An output option, in front of the output path
+    assert arguments.index("-threads") == len(arguments) - 3
+
+
+def test_poster_is_linked(tmp_path, selection, metadata):
+    settings = Settings(download_path=tmp_path, write_metadata=True)
+    poster_path = tmp_path.joinpath("poster.jpeg")
+    poster_path.write_bytes(b"poster")
+    temp_directory = tmp_path.joinpath("temp")
+    temp_directory.mkdir()
+
+    arguments = argument_helper.get_arguments(settings, selection, metadata,
+        poster_path, False, temp_directory=temp_directory)
+    linked_path = temp_directory.joinpath("poster.jpeg")
+    assert arguments[arguments.index("-attach") + 1] == str(linked_path)
+    assert linked_path.read_bytes() == b"poster"
+
+
+def test_evicted_poster_is_left_out(tmp_path, selection, metadata):
+    settings = Settings(download_path=tmp_path, write_metadata=True)
+    temp_directory = tmp_path.joinpath("temp")
+    temp_directory.mkdir()
+
+    arguments = argument_helper.get_arguments(settings, selection, metadata,
+        tmp_path.joinpath("evicted.jpeg"), False, temp_directory=temp_directory)
+    assert "-attach" not in arguments
@@ -0,0 +1,62 @@
+import pathlib
+
+import pytest
+
+from .helpers import run_until
+
+pytest.importorskip("PySide6")
+
+from benchmarks.harness.origin import LocalOrigin, OriginConfig
+from kamyroll_gui.utils.hls_downloader import HlsDownloader
+
+
+
+@pytest.fixture
+def origin():
+    origin = LocalOrigin(OriginConfig(segment_count=3)).start()
+    yield origin
+    origin.stop()
+
+
+def _download(application, origin, spool_path, /):
+    results = []
+    errors = []
+    downloader = HlsDownloader(spool_path,
+        lambda *result: results.append(result), errors.append)
+    downloader.start(f"{origin.url}/hls/G1/master.m3u8", [0])
+    assert run_until(application, lambda: results or errors)
+    return results, errors
+
+
+def test_download(application, origin, tmp_path):
+    results, errors = _download(application, origin, tmp_path.joinpath("spool"))
+
+    assert not errors
+    master_path, program_ids = results[0]
+    assert master_path.exists()
+    assert program_ids == [0]
+
+
+def test_unwritable_playlist_fails(application, origin, tmp_path, monkeypatch):
+    write_text = pathlib.Path.write_text
+
+    def fail_playlists(path, *args, **kwargs):
+        if path.suffix == ".m3u8":
+            raise OSError(28, "No space left on device")
+        return write_text(path, *args, **kwargs)
+    monkeypatch.setattr(pathlib.Path, "write_text", fail_playlists)
+
+    results, errors = _download(application, origin, tmp_path.joinpath("spool"))
+
+    assert not results
+    assert "No space left on device" in errors[0]
+
+
+def test_unusable_spool_path_fails(application, origin, tmp_path):
+    spool_parent = tmp_path.joinpath("file")
+    spool_parent.write_text("")
+
+    results, errors = _download(application, origin, spool_parent.joinpath("spool"))
+
+    assert not results
+    assert "spool directory" in errors[0]
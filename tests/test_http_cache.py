@@ -0,0 +1,48 @@
+import os
+
+from kamyroll_gui.utils.http_cache import HttpCache
+
+
+
+def _put(cache, url, /):
+    entry = cache.create_entry(url, {"etag": f'"{url}"'})
+    cache.put(entry, url.encode())
+
+
+def _age(cache, url, seconds, /):
+    meta_path, _ = cache._get_paths(url)
+    mtime = meta_path.stat().st_mtime - seconds
+    os.utime(meta_path, (mtime, mtime))
+
+
+def test_disk_eviction_keeps_recently_used(tmp_path):
+    cache = HttpCache(tmp_path, max_entries=1, max_disk_entries=2)
+    _put(cache, "first")
+    _put(cache, "second")
+    _age(cache, "first", 20)
+    _age(cache, "second", 10)
+
+    # Loaded from disk, the memory cache only holds "second"
+    assert cache.get("first")[1] == b"first"
+    _put(cache, "third")
+
+    assert cache._load("first") is not None
+    assert cache._load("second") is None
+    assert cache._load("third") is not None
+
+
+def test_disk_is_only_scanned_above_limit(tmp_path, monkeypatch):
+    cache = HttpCache(tmp_path, max_disk_entries=2)
+    scans = []
+    evict = cache._evict_disk_entries
+    monkeypatch.setattr(cache, "_evict_disk_entries",
+        lambda: scans.append(None) or evict())
+
+    _put(cache, "first")
+    _put(cache, "second")
+    _put(cache, "second")
+    assert not scans
+
+    _put(cache, "third")
+    assert len(scans) == 1
+    assert len(list(tmp_path.glob("*.json"))) == 2
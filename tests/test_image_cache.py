@@ -0,0 +1,51 @@
+import pytest
+
+from .helpers import run_until
+
+pytest.importorskip("PySide6")
+
+from benchmarks.harness.origin import LocalOrigin
+from kamyroll_gui.utils import image_cache
+
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = image_cache.ImageCache(tmp_path)
+    monkeypatch.setattr(image_cache, "get_image_cache", lambda: cache)
+    return cache
+
+
+def test_poster_fetch(application, cache):
+    origin = LocalOrigin().start()
+    results = []
+    try:
+        image_cache.PosterFetch(f"{origin.url}/subtitles/G1/poster",
+            results.append).start()
+        assert run_until(application, lambda: results)
+    finally:
+        origin.stop()
+
+    assert results[0].parent == cache.path
+    assert results[0].read_bytes()
+
+
+def test_poster_fetch_without_poster(cache):
+    results = []
+    image_cache.PosterFetch(None, results.append).start()
+    assert results == [None]
+
+
+def test_stopped_poster_fetch(application, cache):
+    origin = LocalOrigin().start()
+    results = []
+    fetch = image_cache.PosterFetch(f"{origin.url}/subtitles/G1/poster",
+        results.append)
+    try:
+        fetch.start()
+        fetch.stop()
+        assert run_until(application, lambda: cache.get(fetch.url))
+    finally:
+        origin.stop()
+
+    assert not results
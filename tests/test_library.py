@@ -0,0 +1,64 @@
+import pytest
+
+from kamyroll_gui.utils import library
+from kamyroll_gui.utils.library import LibraryEntry, LibraryIndex
+
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = LibraryIndex(tmp_path.joinpath("library.sqlite3"))
+    yield index
+    index.close()
+
+
+def _entry(tmp_path, /, media=True, item_id="GRDQPM1ZY"):
+    paths = [tmp_path.joinpath(f"{item_id}.ger.ass")]
+    if media:
+        paths.insert(0, tmp_path.joinpath(f"{item_id}.mp4"))
+    return LibraryEntry(channel="crunchyroll", item_id=item_id,
+        audio="ja-JP", hardsub="", subtitles=["de-DE"], height=1080,
+        root=str(tmp_path), output_paths=paths, size=100, duration=1440.0,
+        checksum="checksum", media=media)
+
+
+def test_subtitle_download_keeps_media_row(index, tmp_path):
+    index.record(_entry(tmp_path))
+    index.record(_entry(tmp_path, media=False))
+
+    entries = {entry.media: entry for entry in index.find("crunchyroll", "GRDQPM1ZY")}
+    assert set(entries) == {True, False}
+    assert len(entries[True].output_paths) == 2
+    assert len(entries[False].output_paths) == 1
+
+
+def test_missing_ignores_subtitle_downloads(index, tmp_path):
+    index.record(_entry(tmp_path, media=False, item_id="A"))
+    index.record(_entry(tmp_path, item_id="B"))
+
+    assert index.get_missing("crunchyroll", ["A", "B", "C"]) == ["A", "C"]
+    assert index.get_missing("crunchyroll", ["A", "B", "C"], media=False) == ["C"]
+
+
+def test_find_reports_duplicates(index, tmp_path):
+    # The same selection downloaded into two roots is a duplicate
+    index.record(_entry(tmp_path.joinpath("a")))
+    index.record(_entry(tmp_path.joinpath("b")))
+
+    roots = sorted(entry.root for entry in index.find("crunchyroll", "GRDQPM1ZY"))
+    assert roots == [str(tmp_path.joinpath("a")), str(tmp_path.joinpath("b"))]
+
+
+def test_missing_links_of_a_season(index, tmp_path, monkeypatch):
+    from kamyroll_gui import cli
+
+    monkeypatch.setattr(library, "get_library", lambda: index)
+    links = [
+        f"https://beta.crunchyroll.com/watch/G{number}/episode-{number}"
+        for number in range(1, 5)
+    ]
+    index.record(_entry(tmp_path, item_id="G2"))
+    index.record(_entry(tmp_path, media=False, item_id="G3"))
+
+    assert cli._get_missing_links(links, False) == [links[0], links[2], links[3]]
+    assert cli._get_missing_links(links, True) == [links[0], links[3]]
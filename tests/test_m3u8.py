@@ -0,0 +1,240 @@
+import random
+
+from urllib.parse import urljoin
+
+import pytest
+
+from benchmarks import fixtures
+from kamyroll_gui.utils import m3u8
+
+
+
+BASE_URL = "https://pl.example.com/evs3/assets/master.m3u8"
+# Every property is checked on this many generated playlists
+SEEDS = range(25)
+LANGUAGES = ["ja-JP", "en-US", "de-DE", "fr-FR"]
+
+
+def _random_master(rng, /):
+    """Generate a master playlist and the values it should parse to."""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:6"]
+    groups = [f"audio-{index}" for index in range(rng.randint(0, 3))]
+
+    renditions = []
+    for group in groups:
+        for index, language in enumerate(rng.sample(LANGUAGES, rng.randint(1, 4))):
+            uri = f"audio/{group}/{language}.m3u8" if rng.random() < 0.8 else None
+            renditions.append(("AUDIO", group, language, index == 0, uri))
+    for language in rng.sample(LANGUAGES, rng.randint(0, 2)):
+        renditions.append(("SUBTITLES", "subs", language, False,
+            f"subtitles/{language}.m3u8"))
+    for kind, group, language, default, uri in renditions:
+        line = (f'#EXT-X-MEDIA:TYPE={kind},GROUP-ID="{group}",NAME="{language}",'
+            f'LANGUAGE="{language}",DEFAULT={"YES" if default else "NO"}')
+        if uri is not None:
+            line += f',URI="{uri}"'
+        lines.append(line)
+
+    variants = []
+    for index in range(rng.randint(1, 12)):
+        bandwidth = rng.randint(100000, 9000000)
+        attributes = [f"BANDWIDTH={bandwidth}"]
+        average_bandwidth = None
+        if rng.random() < 0.5:
+            average_bandwidth = bandwidth // 2
+            attributes.append(f"AVERAGE-BANDWIDTH={average_bandwidth}")
+        resolution = None
+        if rng.random() < 0.9:
+            height = rng.choice([240, 360, 480, 720, 1080])
+            resolution = (height * 16 // 9, height)
+            attributes.append(f"RESOLUTION={resolution[0]}x{resolution[1]}")
+        frame_rate = rng.choice([None, 23.974, 29.97])
+        if frame_rate is not None:
+            attributes.append(f"FRAME-RATE={frame_rate}")
+        attributes.append('CODECS="avc1.640028,mp4a.40.2"')
+        audio = rng.choice(groups) if groups and rng.random() < 0.9 else None
+        if audio is not None:
+            attributes.append(f'AUDIO="{audio}"')
+        if any(kind == "SUBTITLES" for kind, *_ in renditions):
+            attributes.append('SUBTITLES="subs"')
+        rng.shuffle(attributes)
+
+        uri = f"video/{index}/index.m3u8?token=abc,def"
+        lines.append("#EXT-X-STREAM-INF:" + ",".join(attributes))
+        lines.append(uri)
+        variants.append((index, urljoin(BASE_URL, uri), bandwidth,
+            average_bandwidth, resolution, frame_rate, audio))
+
+    return "\n".join(lines) + "\n", variants, renditions
+
+
+def _random_media(rng, /):
+    """Generate a media playlist and the segments it should parse to."""
+    lines = ["#EXTM3U", "#EXT-X-TARGETDURATION:6", "#EXT-X-MEDIA-SEQUENCE:7"]
+    segments = []
+    key = None
+    map_uri = None
+    offset = 0
+    for index in range(rng.randint(1, 60)):
+        if rng.random() < 0.1:
+            if rng.random() < 0.3:
+                lines.append("#EXT-X-KEY:METHOD=NONE")
+                key = None
+            else:
+                iv = f"0x{rng.getrandbits(128):032x}"
+                lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="keys/{index}.key",IV={iv}')
+                key = ("AES-128", urljoin(BASE_URL, f"keys/{index}.key"), iv)
+        if rng.random() < 0.05:
+            lines.append(f'#EXT-X-MAP:URI="init_{index}.mp4"')
+            map_uri = urljoin(BASE_URL, f"init_{index}.mp4")
+
+        duration = round(rng.uniform(0.5, 6), 3)
+        lines.append(f"#EXTINF:{duration},")
+        byte_range = None
+        uri = f"segment_{index}.ts"
+        if rng.random() < 0.5:
+            length = rng.randint(1, 100000)
+            if rng.random() < 0.5:
+                byte_range = (length, offset)
+                lines.append(f"#EXT-X-BYTERANGE:{length}@{offset}")
+            else:
+                byte_range = (length, None)
+                lines.append(f"#EXT-X-BYTERANGE:{length}")
+            offset += length
+            uri = "media.mp4"
+        lines.append(uri)
+        segments.append((urljoin(BASE_URL, uri), duration, byte_range, key,
+            map_uri))
+    lines.append("#EXT-X-ENDLIST")
+    return "\n".join(lines) + "\n", segments
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_parse_master(seed):
+    data, expected_variants, expected_renditions = _random_master(random.Random(seed))
+    master = m3u8.parse_master(data, BASE_URL)
+
+    variants = [
+        (variant.program_id, variant.uri, variant.bandwidth,
+            variant.average_bandwidth, variant.resolution, variant.frame_rate,
+            variant.audio)
+        for variant in master.variants
+    ]
+    assert variants == expected_variants
+
+    renditions = [
+        (rendition.type, rendition.group_id, rendition.language,
+            rendition.default,
+            rendition.uri and rendition.uri.removeprefix(urljoin(BASE_URL, ".")))
+        for rendition in master.renditions
+    ]
+    assert renditions == expected_renditions
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_parse_media(seed):
+    data, expected_segments = _random_media(random.Random(seed))
+    playlist = m3u8.parse_media(data, BASE_URL)
+
+    segments = [
+        (segment.uri, segment.duration, segment.byte_range,
+            segment.key and (segment.key.method, segment.key.uri, segment.key.iv),
+            segment.map_uri)
+        for segment in playlist.segments
+    ]
+    assert segments == expected_segments
+    assert playlist.is_endlist
+    assert playlist.media_sequence == 7
+    assert playlist.duration == pytest.approx(sum(
+        duration for _, duration, *_ in expected_segments))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_localize_media_playlist(seed):
+    data, _ = _random_media(random.Random(seed))
+    original = m3u8.parse_media(data, BASE_URL)
+    local_data, downloads = m3u8.localize_media_playlist(data, BASE_URL, "video")
+    local = m3u8.parse_media(local_data, "")
+
+    urls = dict(downloads)
+    # Files shared through byte ranges are downloaded once
+    assert len(urls) == len(downloads)
+    assert len(local.segments) == len(original.segments)
+    for segment, local_segment in zip(original.segments, local.segments):
+        assert urls[segment.uri] == local_segment.uri
+        assert local_segment.duration == segment.duration
+        assert local_segment.byte_range == segment.byte_range
+        if segment.key is None:
+            assert local_segment.key is None
+        else:
+            assert urls[segment.key.uri] == local_segment.key.uri
+            assert local_segment.key.iv == segment.key.iv
+        if segment.map_uri is not None:
+            assert urls[segment.map_uri] == local_segment.map_uri
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_localize_master(seed):
+    rng = random.Random(seed)
+    data, _, _ = _random_master(rng)
+    master = m3u8.parse_master(data, BASE_URL)
+    program_ids = rng.sample(range(len(master.variants)),
+        rng.randint(1, len(master.variants)))
+
+    local_data, playlists, local_program_ids = m3u8.localize_master(data,
+        BASE_URL, program_ids)
+    local = m3u8.parse_master(local_data)
+
+    assert "SUBTITLES" not in local_data
+    assert len(local.variants) == len(program_ids)
+    assert sorted(local_program_ids) == list(range(len(program_ids)))
+    for program_id, local_program_id in zip(program_ids, local_program_ids):
+        variant = master.variants[program_id]
+        local_variant = local.variants[local_program_id]
+        assert local_variant.bandwidth == variant.bandwidth
+        assert local_variant.audio == variant.audio
+        assert (variant.uri, local_variant.uri) in playlists
+        # Every referenced group exists, with one rendition
+        if variant.audio is not None:
+            assert len(local.get_renditions("AUDIO", variant.audio)) == 1
+
+
+def test_localize_master_multi_audio():
+    data = fixtures.get_multi_audio_master(10, LANGUAGES)
+    local_data, playlists, program_ids = m3u8.localize_master(data, BASE_URL, [3])
+    local = m3u8.parse_master(local_data)
+
+    assert program_ids == [0]
+    variant, = local.variants
+    assert variant.audio == "ac3"
+    rendition, = local.renditions
+    assert rendition.group_id == "ac3" and rendition.default
+    assert rendition.uri == "audio_0.m3u8"
+    assert "SUBTITLES=" not in local_data
+    assert len(playlists) == 2
+
+
+def test_get_resolutions_uses_variant_index():
+    # Audio renditions are part of the program of their variant
+    data = fixtures.get_multi_audio_master(10, LANGUAGES)
+    resolutions = m3u8.get_resolutions(data)
+
+    # Of the variants with the same height, the one with the highest bandwidth
+    assert resolutions == {
+        1080: [5],
+        720: [6],
+        480: [7],
+        360: [8],
+        240: [9],
+    }
+
+
+def test_get_resolutions_recorded():
+    resolutions = m3u8.get_resolutions(fixtures.read_text("master.m3u8"))
+    assert resolutions == {
+        1080: [0],
+        720: [1],
+        480: [2],
+        360: [3],
+        240: [4],
+    }
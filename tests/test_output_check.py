@@ -0,0 +1,127 @@
+from dataclasses import replace
+
+import pytest
+
+from kamyroll_gui.data_types import Locale
+from kamyroll_gui.settings import Settings
+
+from .helpers import run_until
+
+pytest.importorskip("PySide6")
+
+from kamyroll_gui.download_dialog import output_check
+from kamyroll_gui.download_dialog.argument_helper import get_output_paths
+from kamyroll_gui.download_dialog.library_entry import create_library_entry
+from kamyroll_gui.download_dialog.download_selector import (
+    DownloadSelection,
+    HardsubInfo,
+)
+from kamyroll_gui.utils import library, probe
+from kamyroll_gui.utils.probe import ProbeResult, ProbeStream
+
+
+
+LINK = "https://beta.crunchyroll.com/watch/GRDQPM1ZY/romance-dawn"
+
+
+@pytest.fixture
+def selection():
+    return DownloadSelection(url="https://example.com/master.m3u8",
+        audio_locale=Locale.JAPANESE_JP, program_ids=[0],
+        hardsub_info=HardsubInfo(is_native=True, locale=Locale.NONE, url=""),
+        subtitles=[], height=1080)
+
+
+def _check(application, settings, selection, metadata, /):
+    results = []
+    check = output_check.OutputCheck(LINK, settings, selection, metadata,
+        False, results.append)
+    check.start()
+    assert run_until(application, lambda: results)
+    return results[0]
+
+
+def test_missing_outputs(application, tmp_path, selection, metadata):
+    settings = Settings(download_path=tmp_path, library_index=False)
+    assert _check(application, settings, selection, metadata) == output_check.MISSING
+
+
+def test_unknown_without_ffprobe(application, tmp_path, monkeypatch,
+        selection, metadata):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PATH", str(tmp_path.joinpath("empty")))
+    probe.get_probe_cache.cache_clear()
+
+    settings = Settings(download_path=tmp_path.joinpath("downloads"),
+        library_index=False)
+    media_path, _ = get_output_paths(settings, selection, metadata, False)
+    media_path.parent.mkdir(parents=True)
+    media_path.write_bytes(b"existing download")
+
+    # Not being able to probe is not a mismatch, the user has to decide
+    assert _check(application, settings, selection, metadata) == output_check.UNKNOWN
+    assert media_path.read_bytes() == b"existing download"
+
+
+@pytest.fixture
+def recorded_output(tmp_path, monkeypatch, selection, metadata):
+    """A download recorded in the library index, without ffprobe."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PATH", str(tmp_path.joinpath("empty")))
+    probe.get_probe_cache.cache_clear()
+    library.get_library.cache_clear()
+
+    settings = Settings(download_path=tmp_path.joinpath("downloads"))
+    media_path, _ = get_output_paths(settings, selection, metadata, False)
+    media_path.parent.mkdir(parents=True)
+    media_path.write_bytes(b"recorded download")
+    library.get_library().record(create_library_entry(LINK, settings,
+        selection, metadata, False))
+    yield settings, media_path
+    library.get_library().close()
+    library.get_library.cache_clear()
+
+
+def test_recorded_output_matches(application, recorded_output, selection,
+        metadata):
+    settings, _ = recorded_output
+    assert _check(application, settings, selection, metadata) == output_check.MATCHING
+
+
+def test_rewritten_output_is_probed(application, recorded_output, selection,
+        metadata):
+    settings, media_path = recorded_output
+    # Same size, different content
+    media_path.write_bytes(b"replaced download")
+
+    assert _check(application, settings, selection, metadata) == output_check.UNKNOWN
+
+
+def _probe_result(metadata, /, height=1080, video_language=None):
+    return ProbeResult(duration=metadata.duration, streams=[
+        ProbeStream("video", language=video_language, height=height),
+        ProbeStream("audio", language="jpn"),
+    ])
+
+
+def test_mismatch_height(tmp_path, selection, metadata):
+    settings = Settings(download_path=tmp_path)
+    result = _probe_result(metadata, height=720)
+
+    assert output_check.get_mismatch(result, settings, selection, metadata) == (
+        "height 720 instead of 1080")
+
+
+def test_mismatch_hardsub(tmp_path, selection, metadata):
+    settings = Settings(download_path=tmp_path, write_metadata=True)
+    assert output_check.get_mismatch(_probe_result(metadata, video_language="und"),
+        settings, selection, metadata) is None
+
+    result = _probe_result(metadata, video_language="ger")
+    assert output_check.get_mismatch(result, settings, selection, metadata) == (
+        "hardsub language ger")
+    # Matroska writes the bibliographic code of german
+    hardsub_selection = replace(selection, hardsub_info=HardsubInfo(
+        is_native=True, locale=Locale.GERMAN_DE, url=""))
+    assert output_check.get_mismatch(result, settings, hardsub_selection,
+        metadata) is None
@@ -0,0 +1,58 @@
+import pytest
+
+pytest.importorskip("PySide6")
+
+from kamyroll_gui.utils import probe
+from kamyroll_gui.utils.probe import ProbeCache, ProbeResult
+
+
+
+FFPROBE_DATA = {
+    "format": {"duration": "1420.03"},
+    "streams": [
+        {"codec_type": "video", "height": 1080, "tags": {"language": "ger"}},
+        {"codec_type": "audio", "tags": {"language": "jpn"}},
+        {"codec_type": "video", "height": 1080,
+            "disposition": {"attached_pic": 1}},
+    ],
+}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ProbeCache(tmp_path.joinpath("probe.sqlite3"))
+    yield cache
+    cache.close()
+
+
+def test_from_ffprobe():
+    result = ProbeResult.from_ffprobe(FFPROBE_DATA)
+
+    video, = result.get_streams("video")
+    assert video.height == 1080
+    assert video.language == "ger"
+    assert result.get_streams("audio")[0].height is None
+
+
+def test_cache_round_trip(cache, tmp_path):
+    path = tmp_path.joinpath("episode.mkv")
+    path.write_bytes(b"media")
+    result = ProbeResult.from_ffprobe(FFPROBE_DATA)
+    cache.put(path, result)
+
+    assert cache.get(path) == result
+    # A changed file has to be probed again
+    path.write_bytes(b"other media")
+    assert cache.get(path) is None
+
+
+def test_cache_drops_oldest_entries(cache, tmp_path, monkeypatch):
+    monkeypatch.setattr(probe, "MAX_CACHE_ENTRIES", 2)
+    paths = [tmp_path.joinpath(f"{index}.mkv") for index in range(3)]
+    for path in paths:
+        path.write_bytes(b"media")
+        cache.put(path, ProbeResult.from_ffprobe(FFPROBE_DATA))
+    cache.close()
+
+    assert cache.get(paths[0]) is None
+    assert cache.get(paths[2]) is not None
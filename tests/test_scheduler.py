@@ -0,0 +1,80 @@
+from datetime import timedelta
+from unittest.mock import Mock
+
+import pytest
+
+from kamyroll_gui.settings import Settings
+
+from .helpers import run_until
+
+pytest.importorskip("PySide6")
+
+from benchmarks.harness.origin import LocalOrigin, OriginConfig
+from kamyroll_gui.utils import api, circuit_breaker
+from kamyroll_gui.download_dialog.download_job import DownloadJob
+from kamyroll_gui.download_dialog.ffmpeg import FFmpegProgress
+from kamyroll_gui.download_dialog.scheduler import DownloadScheduler
+
+
+
+LINK = "https://beta.crunchyroll.com/watch/G00000001/generated-episode-1"
+
+
+@pytest.fixture
+def scheduler(application):
+    return DownloadScheduler(None, ["link"], Settings())
+
+
+def test_ffmpeg_throughput(scheduler, monkeypatch):
+    job = DownloadJob(0, "link", ffmpeg_started=100.0,
+        progress=FFmpegProgress(total_size=1000))
+    monkeypatch.setattr("time.monotonic", lambda: 102.0)
+
+    assert scheduler._get_ffmpeg_throughput(job) == 4000
+    job.cpu_bound = True
+    # An encode is limited by the cpu, not by the network
+    assert scheduler._get_ffmpeg_throughput(job) is None
+
+
+def test_queue_eta_counts_segment_downloads(scheduler, metadata):
+    scheduler.measured_throughput = 8000000
+    job = DownloadJob(0, "link", downloader=object(), bandwidth=4000000)
+    job.stream_response = type("Response", (), {"metadata": metadata})()
+    scheduler.active_jobs[0] = job
+    scheduler.position = 1
+
+    assert scheduler.get_queue_eta() == metadata.duration / 2
+    job.bandwidth = 0
+    assert scheduler.get_queue_eta() is None
+
+
+def test_report_counts_api_retries(application, monkeypatch):
+    origin = LocalOrigin(OriginConfig(error_rate=1.0)).start()
+    monkeypatch.setattr(api, "BASE_URL", origin.url)
+    monkeypatch.setattr(api, "get_retry_delay", lambda attempt: 0)
+    circuit_breaker.get_circuit_breaker.cache_clear()
+    scheduler = DownloadScheduler(Mock(), [LINK],
+        Settings(cache_api_responses=False))
+    reports = []
+    scheduler.telemetry.write_report = lambda: reports.append(
+        scheduler.telemetry.get_report())
+
+    try:
+        scheduler.start()
+        assert run_until(application, lambda: reports)
+    finally:
+        origin.stop()
+        circuit_breaker.get_circuit_breaker.cache_clear()
+
+    item = reports[0]["items"][0]
+    assert item["status"] == "failed"
+    assert item["retries"] == api.DEFAULT_RETRIES - 1
+
+
+def test_report_counts_prefetch_retries(application):
+    scheduler = DownloadScheduler(Mock(), [LINK], Settings())
+    request = api.ApiRequest.from_error("crunchyroll", api.ApiError("Failed"))
+    request.attempts = 3
+    scheduler.prefetcher._resolved(0, request)
+
+    assert scheduler.telemetry.get_report()["items"][0]["retries"] == 2
@@ -0,0 +1,30 @@
+import gc
+
+import pytest
+
+from .helpers import run_until
+
+pytest.importorskip("PySide6")
+
+from benchmarks.harness.origin import LocalOrigin
+from kamyroll_gui.utils.web_manager import WebManager
+
+
+
+@pytest.fixture
+def origin():
+    origin = LocalOrigin().start()
+    yield origin
+    origin.stop()
+
+
+def test_dropped_future_still_calls_back(application, origin):
+    manager = WebManager()
+    results = []
+    manager.get_async(f"{origin.url}/hls/G1/0/index.m3u8").add_done_callback(
+        lambda future: results.append(future.data))
+    gc.collect()
+
+    assert run_until(application, lambda: results)
+    assert results[0].startswith(b"#EXTM3U")
+    assert not manager._pending